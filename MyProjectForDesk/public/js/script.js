@@ -379,10 +379,14 @@ function initAlgorithmInfo() {
     // 静态定义算法列表（与后端算法管理器保持一致）
     const algorithms = [
         { id: 'correlation', name: '相关系数 (Correlation)', description: '计算变量间的相关系数，用于构建关联网络。适用于连续变量的线性关系分析。' },
+        { id: 'spearman', name: 'Spearman秩相关 (Spearman)', description: '对每列做秩变换后计算相关系数，适用于偏态分布或存在单调非线性关系的数据。' },
+        { id: 'kendall', name: 'Kendall秩相关 (Kendall)', description: '基于一致/不一致样本对计算Kendall tau，对异常值稳健，适用于偏态数据。' },
         { id: 'partial_correlation', name: '偏相关系数 (Partial Correlation)', description: '计算变量间的偏相关系数，控制其他变量影响，用于构建更准确的关联网络。' },
         { id: 'ges', name: '贪婪等价搜索算法 (GES)', description: '通过搜索等价类的方式构建因果网络，适用于大型数据集的因果发现。' },
         { id: 'mmhc', name: '最大最小爬山算法 (MMHC)', description: '结合最大最小父母算法和爬山算法，用于高效发现变量间的因果关系。' },
-        { id: 'interiamb', name: '改进的增量关联Markov边界算法 (INTER-IAMB)', description: '通过发现变量的Markov边界来构建因果网络，适用于变量间关系较复杂的数据集。' }
+        { id: 'interiamb', name: '改进的增量关联Markov边界算法 (INTER-IAMB)', description: '通过发现变量的Markov边界来构建因果网络，适用于变量间关系较复杂的数据集。' },
+        { id: 'aracne', name: '互信息网络 (ARACNE)', description: '基于两两互信息构建网络，并用数据处理不等式剪除间接关联，可发现非线性关系。' },
+        { id: 'clr', name: '互信息网络 (CLR)', description: '基于互信息的上下文似然（z分数）构建网络，可抑制背景噪声并发现非线性关系。' }
     ];
     
     // 存储算法信息到全局变量
@@ -466,14 +470,7 @@ function saveAdjacencyMatrix() {
                 // 查找最新的邻接矩阵文件
                 const adjFiles = data.data.filter(f => f.type === 'adjacency_matrix');
                 if (adjFiles.length > 0) {
-                    // 按文件名排序，获取最新的文件
-                    adjFiles.sort((a, b) => {
-                        // 比较文件名中的时间戳
-                        const timeA = parseInt(a.name.match(/\d+/g)[1]);
-                        const timeB = parseInt(b.name.match(/\d+/g)[1]);
-                        return timeB - timeA; // 降序排序，最新的在前面
-                    });
-                    
+                    // 后端按生成时间降序返回，第一个即为最新的文件
                     const latestFile = adjFiles[0];
                     // 触发下载
                     const link = document.createElement('a');
@@ -515,14 +512,7 @@ function savePng() {
                 // 查找最新的网络图像文件
                 const pngFiles = data.data.filter(f => f.type === 'network_graph');
                 if (pngFiles.length > 0) {
-                    // 按文件名排序，获取最新的文件
-                    pngFiles.sort((a, b) => {
-                        // 比较文件名中的时间戳
-                        const timeA = parseInt(a.name.match(/\d+/g)[1]);
-                        const timeB = parseInt(b.name.match(/\d+/g)[1]);
-                        return timeB - timeA; // 降序排序，最新的在前面
-                    });
-                    
+                    // 后端按生成时间降序返回，第一个即为最新的文件
                     const latestFile = pngFiles[0];
                     // 触发下载
                     const link = document.createElement('a');
@@ -1,27 +1,240 @@
 import numpy as np
-import pandas as pd
-from scipy import stats
-from scipy.stats import pearsonr
-from sklearn.covariance import GraphicalLasso
-import networkx as nx
-import matplotlib.pyplot as plt
-# 设置Matplotlib使用非交互式后端，避免线程安全警告
-plt.switch_backend('Agg')
 import io
 import base64
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-class Algorithms:
-    def __init__(self):
+# scipy、sklearn、networkx、matplotlib导入耗时较长（合计约2秒），
+# 在首次用到的算法或绘图函数中再导入；需要预热时调用preload()
+
+
+_plotting = None
+# pyplot不是线程安全的，同一进程内的绘图串行进行
+_plot_lock = threading.Lock()
+
+
+def _plotting_modules():
+    """导入绘图所需的networkx和pyplot（只在第一次调用时导入）"""
+    global _plotting
+    if _plotting is None:
+        import matplotlib
+        # 设置Matplotlib使用非交互式后端，避免线程安全警告（须在导入pyplot之前）
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import networkx as nx
+        _plotting = (nx, plt)
+    return _plotting
+
+
+def preload():
+    """预先导入算法和绘图用到的重量级库（如在预派生的服务进程fork之前调用，由子进程共享）"""
+    import scipy.stats
+    import sklearn.covariance
+    import sklearn.preprocessing
+    _plotting_modules()
+
+
+# 算法名称 -> Algorithms方法名（即/api/analyze和batch.py的algorithm参数）
+ALGORITHM_METHODS = {
+    'correlation': 'correlation_algorithm',
+    'spearman': 'spearman_algorithm',
+    'kendall': 'kendall_algorithm',
+    'partial_correlation': 'partial_correlation_algorithm',
+    'ges': 'ges_algorithm',
+    'mmhc': 'mmhc_algorithm',
+    'interiamb': 'inter_iamb_algorithm',
+    'aracne': 'aracne_algorithm',
+    'clr': 'clr_algorithm'
+}
+
+# 支持成对完整（pairwise-complete）缺失值处理的算法，其余算法删除含缺失值的行
+PAIRWISE_ALGORITHMS = {'correlation', 'spearman', 'kendall'}
+
+# 支持置换检验选边的算法
+SIGNIFICANCE_ALGORITHMS = {'correlation', 'partial_correlation'}
+
+
+def get_result_matrix(result):
+    """取出分析结果中的矩阵（不同算法的矩阵键名不同）"""
+    return result.get('correlation_matrix') or \
+           result.get('partial_correlation_matrix') or \
+           result.get('precision_matrix') or \
+           result.get('mutual_information_matrix') or \
+           result.get('adjacency_matrix')
+
+
+def _process_pool(max_workers, initializer, initargs):
+    """创建进程池（initializer在每个工作进程中执行一次）
+    
+    请求线程中用fork启动会复制其他线程此时持有的锁（数据库、缓存、BLAS），子进程可能因此死锁，
+    所以用forkserver（预先导入本模块和scipy.stats，之后工作进程启动较快），不支持时（Windows）用spawn。
+    initargs会序列化后复制到每个工作进程。
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__, 'scipy.stats'])
+    else:
+        context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                               initializer=initializer, initargs=initargs)
+
+
+# Kendall tau 进程池工作进程共享的数据（通过initializer注入，避免每个任务重复序列化整个矩阵）
+_kendall_data = None
+
+
+def _kendall_init(data):
+    """进程池初始化：保存数据矩阵到工作进程全局变量"""
+    global _kendall_data
+    _kendall_data = data
+
+
+def _kendall_pairs(data, pairs):
+    """计算一批变量对的Kendall tau（scipy基于归并排序，每对O(n log n)）"""
+    from scipy import stats
+    values = []
+    has_missing = np.isnan(data).any()
+    for i, j in pairs:
+        x, y = data[:, i], data[:, j]
+        if has_missing:
+            # 成对完整：只使用两列都不缺失的行
+            mask = ~(np.isnan(x) | np.isnan(y))
+            x, y = x[mask], y[mask]
+        tau, _ = stats.kendalltau(x, y)
+        values.append(0.0 if np.isnan(tau) else tau)
+    return pairs, values
+
+
+def _kendall_worker(pairs):
+    """进程池任务：使用initializer注入的数据矩阵（全局变量只在工作进程中设置）"""
+    return _kendall_pairs(_kendall_data, pairs)
+
+
+# 置换检验进程池工作进程共享的标准化得分矩阵（通过initializer注入）
+_permutation_scores = None
+
+
+def _permutation_init(scores, blas_threads=None):
+    """进程池初始化：保存得分矩阵；多进程时限制每个进程的BLAS线程数，避免超额占用CPU"""
+    global _permutation_scores
+    _permutation_scores = scores
+    if blas_threads:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(blas_threads)
+
+
+def _permutation_chunk(scores, task):
+    """计算一批置换中各边的置换统计量不小于观测值的次数
+    
+    每次置换打乱右侧各列的行顺序（同一置换用于所有列），
+    一批置换拼接成一个 (n, 批大小·列数) 矩阵，与左侧列做一次矩阵乘法。
+    """
+    seed_sequence, n_permutations, rows, cols, observed, tolerance, block_bytes = task
+    n_samples = scores.shape[0]
+    left_t = np.ascontiguousarray(scores[:, rows].T)
+    right = scores[:, cols]
+    rng = np.random.default_rng(seed_sequence)
+    batch = int(max(1, min(n_permutations, block_bytes // (scores.itemsize * n_samples * len(cols)))))
+    exceed = np.zeros((len(rows), len(cols)), dtype=np.int64)
+    for start in range(0, n_permutations, batch):
+        size = min(batch, n_permutations - start)
+        order = np.argsort(rng.random((size, n_samples)), axis=1)
+        permuted = right[order].transpose(1, 0, 2).reshape(n_samples, size * len(cols))
+        null = np.abs(left_t @ permuted).reshape(len(rows), size, len(cols))
+        exceed += (null >= observed[:, None, :] - tolerance).sum(axis=1)
+    return exceed
+
+
+def _permutation_worker(task):
+    """进程池任务：使用initializer注入的得分矩阵（全局变量只在工作进程中设置）"""
+    return _permutation_chunk(_permutation_scores, task)
+
+
+class _NoProgress:
+    """未设置进度跟踪时使用的空实现"""
+    def stage(self, name, **info):
         pass
     
-    def correlation_algorithm(self, data, feature_names):
-        """实现普通相关网络算法"""
+    def step(self, stage, current, total):
+        pass
+    
+    def check(self):
+        pass
+
+
+class Algorithms:
+    def __init__(self, render_graphs=True, max_workers=None):
+        # 进度跟踪按线程保存：同一个实例会被多个请求线程共享
+        self._local = threading.local()
+        # 为False时不绘制网络图（结果中graph_base64为None），如命令行批处理默认不需要图片
+        self.render_graphs = render_graphs
+        # 单次计算的进程池最多使用的工作进程数（服务中多个请求可能同时创建进程池），默认CPU核数
+        self.max_workers = max_workers or os.cpu_count() or 1
+    
+    def set_progress(self, tracker):
+        """为当前线程设置进度跟踪（需提供stage/step/check），传None取消"""
+        self._local.tracker = tracker
+    
+    def _progress(self):
+        return getattr(self._local, 'tracker', None) or _NoProgress()
+    
+    def set_output_mode(self, max_links=None, include_matrix=True, render_graphs=True, blocked=False):
+        """为当前线程设置输出的精简方式（内存不足时由准入控制选择的降级模式），不带参数调用即恢复默认
+        
+        Args:
+            max_links: 只保留|权重|最大的max_links条边（阈值选边的算法在构造边列表之前截取）
+            include_matrix: 为False时结果中的矩阵为None（不生成p×p的嵌套列表）
+            render_graphs: 为False时不绘制网络图
+            blocked: Pearson/Spearman相关按列块计算，不构造完整的相关系数矩阵（同时不输出矩阵）
+        """
+        self._local.output = {'max_links': max_links, 'include_matrix': include_matrix and not blocked,
+                              'render_graphs': render_graphs, 'blocked': blocked}
+    
+    def _output(self, name):
+        output = getattr(self._local, 'output', None)
+        if output is None:
+            return {'max_links': None, 'include_matrix': True, 'render_graphs': True, 'blocked': False}[name]
+        return output[name]
+    
+    def correlation_algorithm(self, data, feature_names, method='pearson', precomputed_matrix=None,
+                              significance=None, **significance_options):
+        """实现普通相关网络算法
+        
+        Args:
+            data: 数据矩阵 (n_samples, n_features)
+            feature_names: 特征名称列表
+            method: 相关系数类型，'pearson'、'spearman' 或 'kendall'
+            precomputed_matrix: 已计算好的相关系数矩阵（如从缓存的整体矩阵切片得到），给定时不再访问data
+            significance: 为'permutation'时用置换检验选边（仅pearson，data不能含缺失值），
+                          不再使用固定阈值；significance_options传给permutation_significance
+        
+        float32输入时全程以float32计算（BLAS单精度），相关系数的绝对误差约为
+        1e-7·sqrt(n_samples)量级（n=1e5时约3e-5），仅会影响恰好落在阈值附近的边。
+        """
+        if significance == 'permutation':
+            if method != 'pearson':
+                raise ValueError('置换检验只支持Pearson相关')
+            scores = self._standardized_columns(data)
+            corr_matrix = scores.T @ scores
+            return self._network_result(corr_matrix, feature_names, 'correlation_matrix', 'Correlation Network',
+                                        significance=self.permutation_significance(
+                                            scores, corr_matrix, **significance_options))
+        
+        # 分块模式：不构造p×p矩阵，逐块提取超过阈值的边
+        if self._output('blocked') and precomputed_matrix is None and method in ('pearson', 'spearman') \
+                and not np.isnan(data).any():
+            corr_matrix = None
+            links = self._blocked_correlation_links(data, method, 0.1, self._output('max_links'))
         # 计算相关系数矩阵
-        corr_matrix = np.corrcoef(data, rowvar=False)
+        elif precomputed_matrix is not None:
+            corr_matrix = precomputed_matrix
+        else:
+            corr_matrix = self._correlation_matrix(data, method)
         
         # 构建网络
         nodes = []
-        links = []
         
         # 创建节点
         for i, name in enumerate(feature_names):
@@ -32,98 +245,669 @@ class Algorithms:
             })
         
         # 创建连接
-        n = len(feature_names)
-        for i in range(n):
-            for j in range(i + 1, n):
-                correlation = corr_matrix[i, j]
-                if abs(correlation) > 0.1:  # 设置相关系数阈值
-                    links.append({
-                        'source': i,
-                        'target': j,
-                        'value': abs(correlation),
-                        'correlation': correlation
-                    })
+        if corr_matrix is not None:
+            links = self._threshold_links(corr_matrix, 0.1)  # 设置相关系数阈值
         
         # 生成网络图
-        graph_base64 = self._generate_graph(nodes, links, feature_names, 'Correlation Network')
+        titles = {
+            'pearson': 'Correlation Network',
+            'spearman': 'Spearman Correlation Network',
+            'kendall': 'Kendall Correlation Network'
+        }
+        graph_base64 = self._generate_graph(nodes, links, feature_names, titles[method])
         
         return {
             'nodes': nodes,
             'links': links,
-            'correlation_matrix': corr_matrix.tolist(),
+            'correlation_matrix': self._matrix_to_list(corr_matrix),
             'graph_base64': graph_base64
         }
     
-    def partial_correlation_algorithm(self, data, feature_names):
-        """实现偏相关网络算法"""
-        # 计算偏相关系数矩阵
-        n = len(feature_names)
-        partial_corr_matrix = np.zeros((n, n))
+    def spearman_algorithm(self, data, feature_names, precomputed_matrix=None):
+        """实现Spearman秩相关网络算法"""
+        return self.correlation_algorithm(data, feature_names, method='spearman',
+                                          precomputed_matrix=precomputed_matrix)
+    
+    def kendall_algorithm(self, data, feature_names, precomputed_matrix=None):
+        """实现Kendall秩相关网络算法"""
+        return self.correlation_algorithm(data, feature_names, method='kendall',
+                                          precomputed_matrix=precomputed_matrix)
+    
+    def association_matrix(self, data, kind):
+        """计算可按特征子集切片复用的两两关联矩阵
         
-        # 计算每对变量之间的偏相关
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    partial_corr_matrix[i, j] = 1.0
-                else:
-                    # 计算控制其他变量后的偏相关
-                    rest_vars = [k for k in range(n) if k != i and k != j]
-                    if rest_vars:
-                        # 使用最小二乘法计算偏相关
-                        X = data[:, rest_vars]
-                        y_i = data[:, i]
-                        y_j = data[:, j]
-                        
-                        # 回归系数
-                        beta_i = np.linalg.lstsq(X, y_i, rcond=None)[0]
-                        beta_j = np.linalg.lstsq(X, y_j, rcond=None)[0]
-                        
-                        # 残差
-                        res_i = y_i - X.dot(beta_i)
-                        res_j = y_j - X.dot(beta_j)
-                        
-                        # 残差的相关系数即为偏相关系数
-                        if len(res_i) > 1:
-                            partial_corr, _ = pearsonr(res_i, res_j)
-                            partial_corr_matrix[i, j] = partial_corr
-                    else:
-                        # 没有其他变量，偏相关等于普通相关
-                        corr, _ = pearsonr(data[:, i], data[:, j])
-                        partial_corr_matrix[i, j] = corr
+        Args:
+            kind: 'pearson'、'spearman'、'kendall' 或 'mutual_information'
+        """
+        if kind == 'mutual_information':
+            return self._mutual_information_matrix(data)
+        return self._correlation_matrix(data, kind)
+    
+    def _correlation_matrix(self, data, method='pearson'):
+        """按指定方法计算相关系数矩阵
         
-        # 构建网络
-        nodes = []
-        links = []
+        数据中含有缺失值(NaN)时按成对完整方式计算：每对变量使用两列都不缺失的全部行。
+        """
+        from scipy import stats
+        has_missing = np.isnan(data).any()
+        dtype = self._compute_dtype(data)
+        if method == 'pearson':
+            if has_missing:
+                return self._pairwise_complete_corrcoef(data)
+            return np.corrcoef(data, rowvar=False, dtype=dtype)
+        if method == 'spearman':
+            # 每列只做一次秩变换，之后复用BLAS实现的Pearson相关
+            if has_missing:
+                # 每对变量在两列共同不缺失的行上重新排秩
+                return self._pairwise_complete_spearman(data).astype(dtype, copy=False)
+            ranks = stats.rankdata(data, axis=0).astype(dtype, copy=False)
+            return np.corrcoef(ranks, rowvar=False, dtype=dtype)
+        if method == 'kendall':
+            return self._kendall_matrix(data).astype(dtype, copy=False)
+        raise ValueError(f"不支持的相关系数类型: {method}")
+    
+    def sliding_window_networks(self, data, window, stride, method='pearson', threshold=0.1, refresh_every=64):
+        """按时间顺序的滑动窗口逐个生成相关或偏相关网络
         
-        # 创建节点
-        for i, name in enumerate(feature_names):
-            nodes.append({
-                'id': i,
-                'name': name,
-                'group': 1
-            })
+        维护窗口内各列的和与叉积矩阵（共同矩），窗口每前移stride行只加上新进入的行、
+        减去移出的行，每步开销为O(stride·p²)，而不是重新计算整个窗口的O(window·p²)。
+        数据先按第一个窗口的均值平移以减小相减时的舍入误差，并每refresh_every步
+        精确重算一次，避免误差累积。
         
-        # 创建连接
-        for i in range(n):
-            for j in range(i + 1, n):
-                partial_corr = partial_corr_matrix[i, j]
-                if abs(partial_corr) > 0.1:  # 设置偏相关系数阈值
-                    links.append({
-                        'source': i,
-                        'target': j,
-                        'value': abs(partial_corr),
-                        'correlation': partial_corr
-                    })
+        Args:
+            data: 按时间排序且不含缺失值的数值矩阵
+            window: 窗口行数
+            stride: 相邻窗口的起始行间隔
+            method: 'pearson'（相关）或 'partial'（由窗口协方差矩阵求逆得到的偏相关）
+            threshold: 边的绝对值阈值
         
-        # 生成网络图
-        graph_base64 = self._generate_graph(nodes, links, feature_names, 'Partial Correlation Network')
+        Yields:
+            每个窗口一个字典：window（序号）、start/end（行范围）、
+            按列存放的边 source/target/weight（weight为带符号的系数）
+        """
+        n_rows, n_features = data.shape
+        total = 1 + (n_rows - window) // stride
+        shift = np.asarray(data[:window], dtype=np.float64).mean(axis=0)
+        progress = self._progress()
         
-        return {
+        def rows(start, end):
+            return np.asarray(data[start:end], dtype=np.float64) - shift
+        
+        sums = cross = None
+        for k in range(total):
+            progress.check()
+            start = k * stride
+            if k % refresh_every == 0 or stride >= window:
+                block = rows(start, start + window)
+                sums, cross = block.sum(axis=0), block.T @ block
+            else:
+                removed = rows(start - stride, start)
+                added = rows(start + window - stride, start + window)
+                sums += added.sum(axis=0) - removed.sum(axis=0)
+                cross += added.T @ added - removed.T @ removed
+            
+            covariance = (cross - np.outer(sums, sums) / window) / (window - 1)
+            if method == 'partial':
+                matrix = self._partial_correlation_from_covariance(covariance)
+            else:
+                matrix = self._correlation_from_covariance(covariance)
+            
+            sources, targets = np.nonzero(np.triu(np.abs(matrix) > threshold, k=1))
+            yield {
+                'window': k,
+                'start': start,
+                'end': start + window,
+                'source': sources.tolist(),
+                'target': targets.tolist(),
+                'weight': matrix[sources, targets].tolist()
+            }
+            progress.step('windows', k + 1, total)
+    
+    def group_networks(self, data, labels, method='pearson', threshold=0.1, contrast=None,
+                       n_permutations=1000, alpha=0.05, seed=0, n_jobs=None, block_bytes=64 * 1024 * 1024):
+        """按分组分别构建网络，并用置换检验找出两组间差异显著的边
+        
+        每组只需计算一次充分统计量（样本数、列和、叉积矩阵），各组并行计算。
+        差异网络的统计量为两组系数之差的绝对值；置换检验每批同时打乱多次分组标签，
+        用批量矩阵乘法得到置换后一组的列和与叉积（另一组由总量相减得到），
+        不重复运行整个分析流程。p值为(1 + 置换统计量不小于观测值的次数) / (1 + 置换次数)，
+        q值为Benjamini-Hochberg校正后的p值。
+        
+        Args:
+            data: 不含缺失值的数值矩阵
+            labels: 每行的分组标签
+            method: 'pearson'（相关）或 'partial'（偏相关）
+            threshold: 各组网络中边的绝对值阈值
+            contrast: 做差异检验的两个组，默认为标签排序后的前两个组
+            n_permutations: 置换次数，为0时不做检验
+            alpha: 差异网络中保留的边的q值上限
+        """
+        labels = np.asarray(labels)
+        groups = sorted(set(labels.tolist()), key=str)
+        contrast = list(contrast) if contrast is not None else groups[:2]
+        n_features = data.shape[1]
+        n_jobs = n_jobs or os.cpu_count() or 1
+        progress = self._progress()
+        to_network = self._partial_correlation_from_covariance if method == 'partial' \
+            else self._correlation_from_covariance
+        
+        # 以总体均值平移后计算各组充分统计量，减小叉积相减时的舍入误差
+        shift = data.mean(axis=0)
+        
+        def sufficient_statistics(label):
+            block = np.asarray(data[labels == label], dtype=np.float64) - shift
+            return label, len(block), block.sum(axis=0), block.T @ block
+        
+        def covariance(count, sums, cross):
+            outer = sums[..., :, None] * sums[..., None, :]
+            return (cross - outer / count) / (count - 1)
+        
+        with ThreadPoolExecutor(max_workers=max(1, min(n_jobs, len(groups)))) as executor:
+            statistics = {label: stats for label, *stats in executor.map(sufficient_statistics, groups)}
+        
+        matrices = {label: to_network(covariance(*statistics[label])) for label in groups}
+        group_results = [{
+            'label': label,
+            'samples': statistics[label][0],
+            'links': self._threshold_links(matrices[label], threshold)
+        } for label in groups]
+        
+        a, b = contrast
+        difference = matrices[a] - matrices[b]
+        rows, cols = np.triu_indices(n_features, k=1)
+        observed = np.abs(difference[rows, cols])
+        differential = {'groups': [a, b], 'statistic': 'abs_difference', 'permutations': n_permutations,
+                        'alpha': alpha, 'links': []}
+        if n_permutations <= 0:
+            return {'groups': group_results, 'differential': differential}
+        
+        # 置换检验只涉及对比的两个组
+        count_a = statistics[a][0]
+        pooled = np.asarray(data[(labels == a) | (labels == b)], dtype=np.float64) - shift
+        n_pooled = len(pooled)
+        total_sums = statistics[a][1] + statistics[b][1]
+        total_cross = statistics[a][2] + statistics[b][2]
+        pooled_t = np.ascontiguousarray(pooled.T)
+        
+        batch_size = int(max(1, min(n_permutations,
+                                    block_bytes // (8 * n_features * (n_pooled + 4 * n_features)))))
+        batches = [min(batch_size, n_permutations - start) for start in range(0, n_permutations, batch_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(batches))
+        tolerance = 1e-12
+        
+        def permutation_batch(args):
+            size, seed_sequence = args
+            rng = np.random.default_rng(seed_sequence)
+            # 每行为一次置换：随机选出count_a行作为第一组
+            chosen = np.argsort(rng.random((size, n_pooled)), axis=1)[:, :count_a]
+            membership = np.zeros((size, n_pooled))
+            membership[np.arange(size)[:, None], chosen] = 1
+            sums_a = membership @ pooled
+            cross_a = (pooled_t[None, :, :] * membership[:, None, :]) @ pooled
+            matrix_a = to_network(covariance(count_a, sums_a, cross_a))
+            matrix_b = to_network(covariance(n_pooled - count_a, total_sums - sums_a, total_cross - cross_a))
+            permuted = np.abs(matrix_a[:, rows, cols] - matrix_b[:, rows, cols])
+            return (permuted >= observed - tolerance).sum(axis=0)
+        
+        exceed = np.zeros(len(rows), dtype=np.int64)
+        executor = None
+        if n_jobs == 1 or len(batches) == 1:
+            results = map(permutation_batch, zip(batches, seeds))
+        else:
+            executor = ThreadPoolExecutor(max_workers=min(n_jobs, len(batches)))
+            results = executor.map(permutation_batch, zip(batches, seeds))
+        try:
+            for k, counts in enumerate(results):
+                exceed += counts
+                progress.step('permutations', k + 1, len(batches))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        p_values = (1 + exceed) / (1 + n_permutations)
+        q_values = self._benjamini_hochberg(p_values)
+        significant = np.flatnonzero(q_values <= alpha)
+        differential['links'] = [{
+            'source': int(rows[k]),
+            'target': int(cols[k]),
+            'value': float(observed[k]),
+            'difference': float(difference[rows[k], cols[k]]),
+            'p_value': float(p_values[k]),
+            'q_value': float(q_values[k])
+        } for k in significant]
+        return {'groups': group_results, 'differential': differential}
+    
+    def _benjamini_hochberg(self, p_values):
+        """Benjamini-Hochberg错误发现率校正"""
+        m = len(p_values)
+        if m == 0:
+            return p_values
+        order = np.argsort(p_values)
+        ranked = p_values[order] * m / np.arange(1, m + 1)
+        # 从大到小取累计最小值，保证q值随p值单调
+        ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+        q_values = np.empty(m)
+        q_values[order] = np.minimum(ranked, 1.0)
+        return q_values
+    
+    def _correlation_from_covariance(self, covariance):
+        """协方差矩阵 -> 相关系数矩阵（方差为0的变量与其他变量的相关记为0）
+        
+        支持前面带批次维度的一组矩阵，形状为(..., p, p)。
+        """
+        std = np.sqrt(np.clip(np.diagonal(covariance, axis1=-2, axis2=-1), 0, None))
+        return self._scale_to_unit_diagonal(covariance, std, 1)
+    
+    def _partial_correlation_from_covariance(self, covariance):
+        """协方差矩阵 -> 偏相关矩阵：精度矩阵P = Σ⁻¹，ρij = -Pij / sqrt(Pii·Pjj)
+        
+        协方差矩阵奇异（如样本数不超过特征数）时使用伪逆；支持(..., p, p)形状的一组矩阵。
+        """
+        precision = np.linalg.pinv(covariance, hermitian=True)
+        diag = np.sqrt(np.clip(np.diagonal(precision, axis1=-2, axis2=-1), 0, None))
+        return self._scale_to_unit_diagonal(precision, diag, -1)
+    
+    def _scale_to_unit_diagonal(self, matrix, diag, sign):
+        scale = np.where(diag > 0, 1 / np.where(diag > 0, diag, 1), 0)
+        result = np.clip(sign * matrix * scale[..., :, None] * scale[..., None, :], -1, 1)
+        index = np.arange(matrix.shape[-1])
+        result[..., index, index] = 1.0
+        return result
+    
+    def _compute_dtype(self, data):
+        """计算精度：float32输入保持float32，其余一律使用float64"""
+        return np.float32 if data.dtype == np.float32 else np.float64
+    
+    def _threshold_links(self, matrix, threshold):
+        """向量化提取上三角中绝对值超过阈值的无向边"""
+        rows, cols = np.nonzero(np.triu(np.abs(matrix) > threshold, k=1))
+        rows, cols = self._limit_links(rows, cols, np.abs(matrix[rows, cols]))
+        return self._links_from_values(rows, cols, matrix[rows, cols])
+    
+    def _limit_links(self, rows, cols, strength, max_links=None):
+        """边数超过max_links（默认取当前线程的输出设置）时只保留strength最大的边，保持原有顺序"""
+        max_links = self._output('max_links') if max_links is None else max_links
+        if max_links is None or len(rows) <= max_links:
+            return rows, cols
+        keep = np.sort(np.argpartition(-strength, max_links - 1)[:max_links])
+        return rows[keep], cols[keep]
+    
+    def _links_from_values(self, rows, cols, values):
+        """由边的行号、列号和系数构建边列表"""
+        # tolist()将numpy标量转换为Python float，float32结果也可直接JSON序列化
+        if values.dtype == np.float32:
+            values = np.round(values.astype(np.float64), 7)
+        values = values.tolist()
+        return [{
+            'source': i,
+            'target': j,
+            'value': abs(value),
+            'correlation': value
+        } for i, j, value in zip(rows.tolist(), cols.tolist(), values)]
+    
+    def _blocked_correlation_links(self, data, method, threshold, max_links=None, block_bytes=64 * 1024 * 1024):
+        """按列块计算相关系数并提取超过阈值的边，不构造完整的p×p矩阵
+        
+        每次计算一个列块与其后全部列的相关 (块大小 × p)，峰值内存为标准化数据加一个块；
+        给定max_links时每块之后只保留目前|r|最大的max_links条候选边。
+        """
+        from scipy import stats
+        if method == 'spearman':
+            data = stats.rankdata(data, axis=0).astype(self._compute_dtype(data), copy=False)
+        scores = self._standardized_columns(data)
+        n_features = scores.shape[1]
+        block = int(max(1, min(n_features, block_bytes // (scores.itemsize * max(n_features, 1)))))
+        rows, cols, values = [], [], []
+        kept = 0
+        progress = self._progress()
+        for start in range(0, n_features, block):
+            progress.check()
+            stop = min(start + block, n_features)
+            corr = scores[:, start:stop].T @ scores[:, start:]
+            local_rows, local_cols = np.nonzero(np.abs(corr) > threshold)
+            upper = local_cols > local_rows
+            local_rows, local_cols = local_rows[upper], local_cols[upper]
+            rows.append(local_rows + start)
+            cols.append(local_cols + start)
+            values.append(np.clip(corr[local_rows, local_cols], -1, 1))
+            kept += len(local_rows)
+            if max_links is not None and kept > 2 * max_links:
+                rows, cols, values = [np.concatenate(part) for part in (rows, cols, values)]
+                keep = np.argpartition(-np.abs(values), max_links - 1)[:max_links]
+                rows, cols, values = [rows[keep]], [cols[keep]], [values[keep]]
+                kept = max_links
+            progress.step('blocks', stop, n_features)
+        rows, cols, values = [np.concatenate(part) for part in (rows, cols, values)]
+        if max_links is not None and len(values) > max_links:
+            keep = np.argpartition(-np.abs(values), max_links - 1)[:max_links]
+            rows, cols, values = rows[keep], cols[keep], values[keep]
+        # 与_threshold_links相同的顺序（按行、列）
+        order = np.lexsort((cols, rows))
+        return self._links_from_values(rows[order], cols[order], values[order])
+    
+    def _matrix_to_list(self, matrix):
+        """将矩阵转换为可JSON序列化的嵌套列表（当前线程设置为不输出矩阵时返回None）
+        
+        float32矩阵先舍入到7位小数再输出：相关系数类取值在[-1, 1]内，
+        舍入误差(5e-8)不超过float32自身的精度(~6e-8)，而JSON中每个数只需约10个字符。
+        """
+        if not self._output('include_matrix'):
+            return None
+        if matrix.dtype == np.float32:
+            return np.round(matrix.astype(np.float64), 7).tolist()
+        return matrix.tolist()
+    
+    def _pairwise_complete_corrcoef(self, data, min_periods=3):
+        """成对完整的Pearson相关系数矩阵
+        
+        用掩码矩阵乘法一次性得到所有变量对的共同样本数、和、平方和与交叉积，
+        计算量与普通的np.corrcoef相当。共同样本数少于min_periods的变量对相关系数记为0。
+        """
+        mask = ~np.isnan(data)
+        weights = mask.astype(data.dtype)
+        # 先按列均值中心化，减小大数相减带来的精度损失
+        centered = np.where(mask, data - np.nanmean(data, axis=0), 0)
+        
+        counts = weights.T @ weights               # 共同样本数 N_ij
+        sums = centered.T @ weights                # 在共同样本上x_i的和
+        squares = (centered ** 2).T @ weights      # 在共同样本上x_i的平方和
+        cross = centered.T @ centered              # 交叉积和
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = cross - sums * sums.T / counts
+            var_i = squares - sums ** 2 / counts
+            var_j = var_i.T
+            corr_matrix = cov / np.sqrt(var_i * var_j)
+        
+        corr_matrix[(counts < min_periods) | ~np.isfinite(corr_matrix)] = 0
+        np.clip(corr_matrix, -1, 1, out=corr_matrix)
+        np.fill_diagonal(corr_matrix, 1)
+        return corr_matrix
+    
+    def _pairwise_complete_spearman(self, data, min_periods=3):
+        """成对完整的Spearman相关系数矩阵
+        
+        每对变量都在两列共同不缺失的行上重新排秩，结果与逐对计算一致。
+        不含缺失值的列之间直接用整体秩做一次Pearson相关；含缺失值的列逐列处理，
+        各列的排序顺序只计算一次，列j在共同行上的秩由共同行掩码沿列j排序顺序的
+        累计计数得到（并列取平均秩），因此每列只需O(n·p)的向量运算而不必逐对排序。
+        共同样本数少于min_periods的变量对相关系数记为0。
+        """
+        from scipy import stats
+        n, p = data.shape
+        mask = ~np.isnan(data)
+        complete = mask.all(axis=0)
+        # 含缺失值的列排在前面，第k列只需与其后的列计算
+        permutation = np.concatenate([np.flatnonzero(~complete), np.flatnonzero(complete)])
+        n_partial = int((~complete).sum())
+        data = data[:, permutation]
+        mask = mask[:, permutation]
+        corr_matrix = np.zeros((p, p))
+        
+        if p - n_partial > 1:
+            ranks = stats.rankdata(data[:, n_partial:], axis=0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                corr_matrix[n_partial:, n_partial:] = np.corrcoef(ranks, rowvar=False)
+        
+        if n_partial:
+            # 缺失值排在最后；用展平下标记录各列的排序顺序，以及排序后每个位置所在并列组的首尾位置
+            order = np.argsort(data, axis=0, kind='stable')
+            columns = np.arange(p)
+            sorted_index = order * p + columns
+            sorted_values = data.ravel()[sorted_index]
+            positions = np.broadcast_to(np.arange(n)[:, None], (n, p))
+            group_start = np.ones((n, p), dtype=bool)
+            group_start[1:] = sorted_values[1:] != sorted_values[:-1]
+            group_end = np.ones((n, p), dtype=bool)
+            group_end[:-1] = group_start[1:]
+            starts = np.maximum.accumulate(np.where(group_start, positions, 0), axis=0)
+            ends = np.minimum.accumulate(np.where(group_end, positions, n - 1)[::-1], axis=0)[::-1] + 1
+            start_index = starts * p + columns
+            end_index = ends * p + columns
+            # 首行补0的累计计数：并列组平均秩的两倍 = 组前计数 + 组末计数 + 1，
+            # 减去平均秩的两倍(共同样本数+1)后即为中心化的两倍秩
+            counts = np.zeros((n + 1, p), dtype=np.int32)
+            flat_counts = counts.ravel()
+            
+            for i in range(n_partial):
+                rest = slice(i + 1, p)
+                common = mask & mask[:, [i]]
+                n_common = np.count_nonzero(common[:, rest], axis=0)
+                offset = n_common.astype(np.float64)
+                sorted_common = common.ravel()[sorted_index[:, rest]]
+                
+                # 其后各列j在与列i共同行上的秩（按列j的排序顺序）
+                np.cumsum(sorted_common, axis=0, out=counts[1:, rest])
+                ranks_j = (flat_counts[start_index[:, rest]] + flat_counts[end_index[:, rest]]) - offset
+                ranks_j *= sorted_common
+                
+                # 列i在与各列j共同行上的秩，再换到列j的排序顺序
+                order_i = order[:, i]
+                np.cumsum(common[order_i, rest], axis=0, out=counts[1:, rest])
+                ranks_i = np.empty((n, p))
+                ranks_i[order_i, rest] = counts[starts[:, i], rest] + counts[ends[:, i], rest]
+                ranks_i = ranks_i.ravel()[sorted_index[:, rest]] - offset
+                ranks_i *= sorted_common
+                
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    row = np.einsum('ij,ij->j', ranks_i, ranks_j) / np.sqrt(
+                        np.einsum('ij,ij->j', ranks_i, ranks_i) * np.einsum('ij,ij->j', ranks_j, ranks_j))
+                row[n_common < min_periods] = 0
+                corr_matrix[i, rest] = row
+                corr_matrix[rest, i] = row
+        
+        corr_matrix[~np.isfinite(corr_matrix)] = 0
+        np.clip(corr_matrix, -1, 1, out=corr_matrix)
+        np.fill_diagonal(corr_matrix, 1)
+        # 恢复原来的列顺序
+        inverse = np.argsort(permutation)
+        return corr_matrix[np.ix_(inverse, inverse)]
+    
+    def _kendall_matrix(self, data, n_jobs=None, chunk_size=64):
+        """计算Kendall tau矩阵，变量对分批分发到进程池并行计算"""
+        n = data.shape[1]
+        corr_matrix = np.eye(n)
+        pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        if not pairs:
+            return corr_matrix
+        
+        chunks = [pairs[k:k + chunk_size] for k in range(0, len(pairs), chunk_size)]
+        n_jobs = n_jobs or self.max_workers
+        
+        progress = self._progress()
+        results = []
+        if n_jobs == 1 or len(chunks) == 1:
+            # 任务量小时直接在当前线程计算，省去进程启动开销；数据显式传入，不写全局变量（多个请求线程可能同时计算）
+            for k, chunk in enumerate(chunks):
+                results.append(_kendall_pairs(data, chunk))
+                progress.step('kendall', k + 1, len(chunks))
+        else:
+            executor = _process_pool(min(n_jobs, len(chunks)), _kendall_init, (data,))
+            try:
+                for k, result in enumerate(executor.map(_kendall_worker, chunks)):
+                    results.append(result)
+                    progress.step('kendall', k + 1, len(chunks))
+            finally:
+                # 取消时丢弃尚未开始的批次
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        for chunk, values in results:
+            for (i, j), tau in zip(chunk, values):
+                corr_matrix[i, j] = tau
+                corr_matrix[j, i] = tau
+        
+        return corr_matrix
+    
+    def partial_correlation_algorithm(self, data, feature_names, significance=None, **significance_options):
+        """实现偏相关网络算法
+        
+        偏相关由协方差矩阵的逆（精度矩阵）得到：ρij = -Pij / sqrt(Pii·Pjj)，
+        即控制其余全部变量后两变量的相关，计算量为O(n·p² + p³)。
+        
+        Args:
+            significance: 为'permutation'时用置换检验选边（data不能含缺失值）：
+                          置换每个变量关于其余变量的回归残差，零分布为残差与置换后残差的相关
+        """
+        dtype = self._compute_dtype(data)
+        if significance == 'permutation':
+            scores = self._partial_residual_scores(data)
+            partial_corr_matrix = -(scores.T @ scores)
+            np.fill_diagonal(partial_corr_matrix, 1.0)
+            # 控制p-2个变量的偏相关相当于n-p+2个样本的相关，而置换残差得到的零分布对应n个样本；
+            # 经Fisher z变换把观测值换算到n个样本的等效相关，p与n接近时置换检验才不会过于宽松
+            n_samples, n_features = data.shape
+            fisher_z = np.arctanh(np.clip(partial_corr_matrix, -1 + 1e-12, 1 - 1e-12))
+            statistic = np.tanh(fisher_z * np.sqrt(max(n_samples - n_features - 1, 1) / max(n_samples - 3, 1)))
+            return self._network_result(partial_corr_matrix, feature_names, 'partial_correlation_matrix',
+                                        'Partial Correlation Network',
+                                        significance=self.permutation_significance(
+                                            scores, statistic, **significance_options))
+        
+        covariance = np.cov(np.asarray(data, dtype=np.float64), rowvar=False)
+        partial_corr_matrix = self._partial_correlation_from_covariance(covariance).astype(dtype, copy=False)
+        return self._network_result(partial_corr_matrix, feature_names, 'partial_correlation_matrix',
+                                    'Partial Correlation Network')
+    
+    def _network_result(self, matrix, feature_names, matrix_key, title, threshold=0.1, significance=None):
+        """由系数矩阵构建无向网络结果；给定置换检验结果时按q值选边并附上p值和q值"""
+        nodes = [{'id': i, 'name': name, 'group': 1} for i, name in enumerate(feature_names)]
+        if significance is None:
+            links = self._threshold_links(matrix, threshold)
+        else:
+            rows, cols = np.triu_indices(len(feature_names), k=1)
+            p_values = significance.pop('p_values')
+            q_values = significance.pop('q_values')
+            selected = np.flatnonzero(q_values <= significance['alpha'])
+            links = [{
+                'source': int(rows[k]),
+                'target': int(cols[k]),
+                'value': abs(float(matrix[rows[k], cols[k]])),
+                'correlation': float(matrix[rows[k], cols[k]]),
+                'p_value': float(p_values[k]),
+                'q_value': float(q_values[k])
+            } for k in selected]
+        graph_base64 = self._generate_graph(nodes, links, feature_names, title)
+        result = {
             'nodes': nodes,
             'links': links,
-            'partial_correlation_matrix': partial_corr_matrix.tolist(),
+            matrix_key: self._matrix_to_list(matrix),
             'graph_base64': graph_base64
         }
+        if significance is not None:
+            result['significance'] = significance
+        return result
+    
+    def _standardized_columns(self, data):
+        """中心化并按列范数缩放，使 scores.T @ scores 即为相关系数矩阵（方差为0的列记为0）"""
+        centered = np.asarray(data, dtype=self._compute_dtype(data))
+        centered = centered - centered.mean(axis=0)
+        norms = np.sqrt((centered ** 2).sum(axis=0))
+        return centered * np.where(norms > 0, 1 / np.where(norms > 0, norms, 1), 0)
+    
+    def _partial_residual_scores(self, data):
+        """各变量关于其余全部变量的回归残差（标准化后）
+        
+        中心化数据乘以精度矩阵即得各列的残差（相差一个列缩放），
+        残差两两相关的相反数就是偏相关：ρij = -corr(ei, ej)。
+        """
+        centered = np.asarray(data, dtype=np.float64)
+        centered = centered - centered.mean(axis=0)
+        precision = np.linalg.pinv(np.cov(centered, rowvar=False), hermitian=True)
+        return self._standardized_columns((centered @ precision).astype(self._compute_dtype(data), copy=False))
+    
+    def permutation_significance(self, scores, observed, permutations=10000, alpha=0.05, seed=0,
+                                 n_jobs=None, chunk_permutations=100, max_round_permutations=2000,
+                                 confidence_z=3.29, block_bytes=64 * 1024 * 1024):
+        """边显著性的置换检验（统计量为 |scores.T @ scores| 的上三角元素）
+        
+        每次置换打乱一侧变量的行顺序，置换统计量由批量矩阵乘法得到；置换按固定大小的块
+        分发到进程池，每块使用由seed派生的独立随机流，结果与进程数无关。
+        检验分轮进行（每轮置换数加倍），每轮结束后对每条边计算经验p值的Wilson置信区间：
+        下界高于alpha（明显不显著）或上界低于alpha/边数（任何多重校正下都显著）的边
+        停止检验，之后只对仍未确定的边所在的行列做矩阵乘法。
+        
+        Args:
+            scores: (n_samples, p) 标准化得分矩阵
+            observed: 观测的系数矩阵
+            permutations: 每条边的最大置换次数
+            alpha: 显著性水平（边按Benjamini-Hochberg q值不超过alpha选取）
+            n_jobs: 进程数，默认max_workers
+        
+        Returns:
+            字典：p_values/q_values（按上三角顺序，调用方取出）及检验统计信息
+        """
+        n_features = scores.shape[1]
+        rows, cols = np.triu_indices(n_features, k=1)
+        n_tests = len(rows)
+        abs_observed = np.abs(observed)
+        exceed = np.zeros((n_features, n_features), dtype=np.int64)
+        done = np.zeros((n_features, n_features), dtype=np.int64)
+        active = np.zeros((n_features, n_features), dtype=bool)
+        active[rows, cols] = True
+        tolerance = 1e-10 if scores.dtype == np.float64 else 1e-5
+        
+        n_jobs = n_jobs or self.max_workers
+        progress = self._progress()
+        executor = None
+        if n_jobs > 1:
+            executor = _process_pool(n_jobs, _permutation_init, (scores, 1))
+        
+        seeds = np.random.SeedSequence(seed)
+        total = 0
+        round_permutations = chunk_permutations
+        try:
+            while total < permutations and active.any():
+                progress.check()
+                size = min(round_permutations, permutations - total)
+                active_rows = np.flatnonzero(active.any(axis=1))
+                active_cols = np.flatnonzero(active.any(axis=0))
+                sub_observed = abs_observed[np.ix_(active_rows, active_cols)]
+                chunks = [min(chunk_permutations, size - start) for start in range(0, size, chunk_permutations)]
+                tasks = [(child, count, active_rows, active_cols, sub_observed, tolerance, block_bytes)
+                         for child, count in zip(seeds.spawn(len(chunks)), chunks)]
+                if executor is not None:
+                    results = executor.map(_permutation_worker, tasks)
+                else:
+                    # 单进程时在当前线程计算，得分矩阵显式传入（不写全局变量）
+                    results = (_permutation_chunk(scores, task) for task in tasks)
+                counts = sum(results)
+                
+                sub_active = active[np.ix_(active_rows, active_cols)]
+                exceed[np.ix_(active_rows, active_cols)] += counts * sub_active
+                done[np.ix_(active_rows, active_cols)] += size * sub_active
+                total += size
+                
+                # 提前停止：经验p值的置信区间已完全落在判定阈值的一侧
+                lower, upper = self._wilson_interval(exceed + 1, done + 1, confidence_z)
+                active &= ~((lower > alpha) | (upper < alpha / n_tests))
+                round_permutations = min(round_permutations * 2, max_round_permutations)
+                progress.step('permutations', total, permutations)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        p_values = (exceed[rows, cols] + 1) / (done[rows, cols] + 1)
+        return {
+            'method': 'permutation',
+            'permutations': permutations,
+            'alpha': alpha,
+            'seed': seed,
+            'edges_tested': n_tests,
+            'stopped_early': int((done[rows, cols] < total).sum()) if total else 0,
+            'permutations_evaluated': int(done[rows, cols].sum()),
+            # 可能得到的最小p值；边数很多时需要足够的置换次数，BH校正后才可能有边显著
+            'min_p_value': 1 / (total + 1),
+            'p_values': p_values,
+            'q_values': self._benjamini_hochberg(p_values)
+        }
+    
+    def _wilson_interval(self, successes, trials, z):
+        """二项比例的Wilson置信区间（向量化）"""
+        proportion = successes / trials
+        denominator = 1 + z ** 2 / trials
+        center = (proportion + z ** 2 / (2 * trials)) / denominator
+        half_width = z * np.sqrt(proportion * (1 - proportion) / trials + z ** 2 / (4 * trials ** 2)) / denominator
+        return center - half_width, center + half_width
     
     def _generate_graph(self, nodes, links, feature_names, title, is_directed=False):
         """生成网络图并返回base64编码
@@ -135,6 +919,12 @@ class Algorithms:
             title: 图标题
             is_directed: 是否为有向图
         """
+        if not (self.render_graphs and self._output('render_graphs')):
+            return None
+        progress = self._progress()
+        progress.stage('layout', nodes=len(nodes), links=len(links))
+        nx, plt = _plotting_modules()
+        
         # 创建NetworkX图
         G = nx.DiGraph() if is_directed else nx.Graph()
         
@@ -148,47 +938,50 @@ class Algorithms:
                       weight=link['value'], 
                       correlation=link['correlation'])
         
-        # 绘制图形
-        plt.figure(figsize=(12, 8))
-        
         # 使用spring布局
         pos = nx.spring_layout(G, k=0.5, iterations=50)
+        progress.stage('draw')
         
-        # 绘制节点
-        nx.draw_networkx_nodes(G, pos, node_size=500, node_color='lightblue')
-        
-        # 绘制边
-        edges = G.edges(data=True)
-        weights = [edge[2]['weight'] * 5 for edge in edges]
-        
-        # 根据权重调整边的颜色深浅
-        edge_colors = [edge[2]['weight'] for edge in edges]
-        cmap = plt.cm.YlOrRd
-        
-        nx.draw_networkx_edges(G, pos, edgelist=edges, width=weights, 
-                               edge_color=edge_colors, edge_cmap=cmap, 
-                               arrowstyle='->', arrowsize=20)
-        
-        # 添加节点标签
-        labels = {node[0]: node[1]['name'] for node in G.nodes(data=True)}
-        nx.draw_networkx_labels(G, pos, labels, font_size=10)
-        
-
-        
-        # 添加颜色条
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(vmin=0, vmax=1))
-        sm.set_array([])
-        plt.colorbar(sm, label='Edge Weight')
-        
-        plt.title(title)
-        plt.axis('off')
-        
-        # 将图形转换为base64编码
-        buffer = io.BytesIO()
-        plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-        plt.close()
+        # pyplot的当前图形是全局状态，多线程服务（如gunicorn的gthread工作进程）中
+        # 同时绘图会互相干扰，绘制和编码期间持有锁（布局计算不需要）
+        with _plot_lock:
+            # 绘制图形
+            plt.figure(figsize=(12, 8))
+            try:
+                # 绘制节点
+                nx.draw_networkx_nodes(G, pos, node_size=500, node_color='lightblue')
+                
+                # 绘制边
+                edges = G.edges(data=True)
+                weights = [edge[2]['weight'] * 5 for edge in edges]
+                
+                # 根据权重调整边的颜色深浅
+                edge_colors = [edge[2]['weight'] for edge in edges]
+                cmap = plt.cm.YlOrRd
+                
+                nx.draw_networkx_edges(G, pos, edgelist=edges, width=weights, 
+                                       edge_color=edge_colors, edge_cmap=cmap, 
+                                       arrowstyle='->', arrowsize=20)
+                
+                # 添加节点标签
+                labels = {node[0]: node[1]['name'] for node in G.nodes(data=True)}
+                nx.draw_networkx_labels(G, pos, labels, font_size=10)
+                
+                # 添加颜色条
+                sm = plt.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(vmin=0, vmax=1))
+                sm.set_array([])
+                plt.colorbar(sm, ax=plt.gca(), label='Edge Weight')
+                
+                plt.title(title)
+                plt.axis('off')
+                
+                # 将图形转换为base64编码
+                progress.stage('png_encode')
+                buffer = io.BytesIO()
+                plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+            finally:
+                plt.close()
+        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
         
         return f"data:image/png;base64,{image_base64}"
     
@@ -247,7 +1040,7 @@ class Algorithms:
         return {
             'nodes': nodes,
             'links': links,
-            'adjacency_matrix': adjacency_matrix.tolist(),
+            'adjacency_matrix': self._matrix_to_list(adjacency_matrix),
             'graph_base64': graph_base64
         }
     
@@ -260,8 +1053,12 @@ class Algorithms:
             data_scaled = scaler.fit_transform(data)
             
             # 使用更合适的参数设置Graphical Lasso
+            from sklearn.covariance import GraphicalLasso
+            progress = self._progress()
+            progress.stage('graphical_lasso', max_iter=200)
             model = GraphicalLasso(alpha=0.05, max_iter=200, tol=1e-4)
             model.fit(data_scaled)
+            progress.step('graphical_lasso', model.n_iter_, model.n_iter_)
             
             # 获取精度矩阵（逆协方差矩阵）
             precision_matrix = model.precision_
@@ -321,7 +1118,7 @@ class Algorithms:
         return {
             'nodes': nodes,
             'links': links,
-            'precision_matrix': precision_matrix.tolist(),
+            'precision_matrix': self._matrix_to_list(precision_matrix),
             'graph_base64': graph_base64
         }
     
@@ -380,6 +1177,447 @@ class Algorithms:
         return {
             'nodes': nodes,
             'links': links,
-            'adjacency_matrix': adjacency_matrix.tolist(),
+            'adjacency_matrix': self._matrix_to_list(adjacency_matrix),
+            'graph_base64': graph_base64
+        }
+    
+    def mutual_information_algorithm(self, data, feature_names, method='aracne',
+                                     mi_threshold=0.05, dpi_tolerance=0.1, clr_threshold=2.0,
+                                     precomputed_matrix=None):
+        """实现基于互信息的网络算法（ARACNE / CLR）
+        
+        Args:
+            data: 数据矩阵 (n_samples, n_features)
+            feature_names: 特征名称列表
+            method: 'aracne'（数据处理不等式剪枝）或 'clr'（上下文z分数）
+            mi_threshold: ARACNE候选边的互信息阈值（nats）
+            dpi_tolerance: ARACNE数据处理不等式的容差
+            clr_threshold: CLR得分阈值
+            precomputed_matrix: 已计算好的互信息矩阵，给定时不再访问data
+        """
+        if precomputed_matrix is not None:
+            mi_matrix = precomputed_matrix
+        else:
+            mi_matrix = self._mutual_information_matrix(data)
+        
+        if method == 'aracne':
+            weight_matrix = self._aracne_prune(mi_matrix, mi_threshold, dpi_tolerance)
+            # 将互信息换算为[0, 1]区间的信息相关系数，便于绘图
+            value_matrix = np.sqrt(1 - np.exp(-2 * weight_matrix))
+            threshold = 0
+            title = 'ARACNE Mutual Information Network'
+        elif method == 'clr':
+            weight_matrix = self._clr_scores(mi_matrix)
+            max_score = weight_matrix.max()
+            value_matrix = weight_matrix / max_score if max_score > 0 else weight_matrix
+            threshold = clr_threshold
+            title = 'CLR Mutual Information Network'
+        else:
+            raise ValueError(f"不支持的互信息网络类型: {method}")
+        
+        # 创建节点
+        nodes = []
+        for i, name in enumerate(feature_names):
+            nodes.append({
+                'id': i,
+                'name': name,
+                'group': 1
+            })
+        
+        # 创建连接（互信息网络为无向图）
+        links = []
+        rows, cols = np.nonzero(np.triu(weight_matrix > threshold, k=1))
+        rows, cols = self._limit_links(rows, cols, value_matrix[rows, cols])
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            links.append({
+                'source': i,
+                'target': j,
+                'value': float(value_matrix[i, j]),
+                'correlation': float(weight_matrix[i, j])
+            })
+        
+        # 生成网络图
+        graph_base64 = self._generate_graph(nodes, links, feature_names, title)
+        
+        return {
+            'nodes': nodes,
+            'links': links,
+            'mutual_information_matrix': self._matrix_to_list(weight_matrix),
             'graph_base64': graph_base64
-        }
\ No newline at end of file
+        }
+    
+    def aracne_algorithm(self, data, feature_names, precomputed_matrix=None):
+        """实现ARACNE互信息网络算法"""
+        return self.mutual_information_algorithm(data, feature_names, method='aracne',
+                                                 precomputed_matrix=precomputed_matrix)
+    
+    def clr_algorithm(self, data, feature_names, precomputed_matrix=None):
+        """实现CLR互信息网络算法"""
+        return self.mutual_information_algorithm(data, feature_names, method='clr',
+                                                 precomputed_matrix=precomputed_matrix)
+    
+    def _discretize(self, data, n_bins=None):
+        """对每列做一次等频离散化，返回整数编码矩阵和分箱数"""
+        from scipy import stats
+        n_samples = data.shape[0]
+        if n_bins is None:
+            n_bins = int(max(2, min(16, round(n_samples ** (1 / 3)))))
+        ranks = stats.rankdata(data, axis=0, method='min') - 1
+        codes = (ranks * n_bins // n_samples).astype(np.intp)
+        return codes, n_bins
+    
+    def _mutual_information_matrix(self, data, n_bins=None, n_jobs=None, block_bytes=64 * 1024 * 1024):
+        """向量化计算两两互信息矩阵
+        
+        每个列块的独热编码矩阵相乘即得到块内所有变量对的联合直方图，
+        变量对块分发到线程池并行计算（矩阵乘法释放GIL）。
+        """
+        codes, n_bins = self._discretize(data, n_bins)
+        n_samples, n = codes.shape
+        mi_matrix = np.zeros((n, n))
+        if n < 2:
+            return mi_matrix
+        
+        # 计数超过float32可精确表示的范围时改用float64
+        dtype = np.float32 if n_samples < 2 ** 24 else np.float64
+        block = int(max(1, min(n, block_bytes // (n_samples * n_bins * np.dtype(dtype).itemsize))))
+        starts = list(range(0, n, block))
+        
+        # 边缘熵
+        marginal = np.zeros(n)
+        for k in range(n):
+            p = np.bincount(codes[:, k], minlength=n_bins) / n_samples
+            p = p[p > 0]
+            marginal[k] = -(p * np.log(p)).sum()
+        
+        def one_hot(start):
+            cols = codes[:, start:start + block]
+            width = cols.shape[1]
+            encoded = np.zeros((n_samples, width * n_bins), dtype=dtype)
+            encoded[np.arange(n_samples)[:, None], cols + np.arange(width) * n_bins] = 1
+            return encoded
+        
+        def block_pair(args):
+            start_i, start_j = args
+            left = one_hot(start_i)
+            right = left if start_i == start_j else one_hot(start_j)
+            counts = (left.T @ right).astype(np.float64)
+            width_i = left.shape[1] // n_bins
+            width_j = right.shape[1] // n_bins
+            joint = counts.reshape(width_i, n_bins, width_j, n_bins) / n_samples
+            with np.errstate(divide='ignore', invalid='ignore'):
+                joint_entropy = -np.where(joint > 0, joint * np.log(joint), 0).sum(axis=(1, 3))
+            mi = (marginal[start_i:start_i + width_i, None]
+                  + marginal[None, start_j:start_j + width_j] - joint_entropy)
+            return start_i, start_j, np.maximum(mi, 0)
+        
+        tasks = [(si, sj) for a, si in enumerate(starts) for sj in starts[a:]]
+        n_jobs = n_jobs or os.cpu_count() or 1
+        progress = self._progress()
+        executor = None
+        if n_jobs == 1 or len(tasks) == 1:
+            results = map(block_pair, tasks)
+        else:
+            executor = ThreadPoolExecutor(max_workers=min(n_jobs, len(tasks)))
+            results = executor.map(block_pair, tasks)
+        
+        try:
+            for k, (start_i, start_j, mi) in enumerate(results):
+                rows, cols = mi.shape
+                mi_matrix[start_i:start_i + rows, start_j:start_j + cols] = mi
+                mi_matrix[start_j:start_j + cols, start_i:start_i + rows] = mi.T
+                progress.step('mutual_information', k + 1, len(tasks))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        np.fill_diagonal(mi_matrix, 0)
+        return mi_matrix
+    
+    def _aracne_prune(self, mi_matrix, mi_threshold=0.05, dpi_tolerance=0.1):
+        """ARACNE数据处理不等式剪枝，只遍历稀疏候选图中的三角形"""
+        candidate = np.where(mi_matrix > mi_threshold, mi_matrix, 0)
+        neighbors = [np.flatnonzero(row) for row in candidate]
+        neighbor_sets = [set(nb.tolist()) for nb in neighbors]
+        
+        rows, cols = np.nonzero(np.triu(candidate, k=1))
+        pruned = candidate.copy()
+        progress = self._progress()
+        for k, (i, j) in enumerate(zip(rows.tolist(), cols.tolist())):
+            if k % 1024 == 0:
+                progress.step('aracne', k, len(rows))
+            # 从度数较小的端点出发查找公共邻居
+            a, b = (i, j) if len(neighbors[i]) <= len(neighbors[j]) else (j, i)
+            common = [k for k in neighbors[a].tolist() if k in neighbor_sets[b]]
+            if not common:
+                continue
+            common = np.asarray(common)
+            weakest_other = np.minimum(candidate[i, common], candidate[j, common])
+            # 若边(i, j)是某个三角形中最弱的一条，则视为间接作用并移除
+            if np.any(candidate[i, j] < weakest_other * (1 - dpi_tolerance)):
+                pruned[i, j] = 0
+                pruned[j, i] = 0
+        progress.step('aracne', len(rows), len(rows))
+        
+        return pruned
+    
+    def _clr_scores(self, mi_matrix):
+        """CLR：以每个变量的互信息分布为背景计算z分数并合并"""
+        n = mi_matrix.shape[0]
+        off_diagonal = ~np.eye(n, dtype=bool)
+        counts = max(n - 1, 1)
+        mean = (mi_matrix * off_diagonal).sum(axis=1) / counts
+        var = (((mi_matrix - mean[:, None]) ** 2) * off_diagonal).sum(axis=1) / counts
+        std = np.sqrt(var)
+        std = np.where(std == 0, 1, std)
+        z = np.maximum(0, (mi_matrix - mean[:, None]) / std[:, None])
+        scores = np.sqrt(z ** 2 + z.T ** 2)
+        np.fill_diagonal(scores, 0)
+        return scores
+    
+    def network_metrics(self, nodes, links, directed=False, betweenness='auto', exact_betweenness_nodes=500,
+                        betweenness_samples=256, communities=True, seed=0):
+        """根据分析结果的节点和边计算网络指标
+        
+        边数组直接构造稀疏邻接矩阵，度、强度（边权绝对值之和）和聚类系数都用稀疏矩阵运算得到。
+        介数中心性（按跳数的最短路径）在节点数不超过exact_betweenness_nodes时精确计算，
+        更大的图随机抽取betweenness_samples个源节点近似；社区用Louvain算法在无向加权图上检测。
+        
+        Args:
+            directed: 是否为有向图（因果算法的结果）
+            betweenness: 'auto'、'exact'、'sampled' 或 'none'
+            communities: 是否检测社区
+            seed: 抽样和社区检测的随机种子，相同输入得到相同结果
+        """
+        from scipy import sparse
+        import networkx as nx
+        
+        n = len(nodes)
+        index = {node['id']: i for i, node in enumerate(nodes)}
+        sources = np.fromiter((index[link['source']] for link in links), dtype=np.int64, count=len(links))
+        targets = np.fromiter((index[link['target']] for link in links), dtype=np.int64, count=len(links))
+        weights = np.abs(np.fromiter((link['value'] for link in links), dtype=np.float64, count=len(links)))
+        
+        # 忽略自环和权重为0的边
+        keep = (sources != targets) & (weights > 0)
+        weighted = sparse.csr_matrix((weights[keep], (sources[keep], targets[keep])), shape=(n, n))
+        if not directed:
+            weighted = (weighted + weighted.T).tocsr()
+        binary = weighted.copy()
+        binary.data[:] = 1
+        
+        out_degree = np.asarray(binary.sum(axis=1)).ravel()
+        out_strength = np.asarray(weighted.sum(axis=1)).ravel()
+        if directed:
+            in_degree = np.asarray(binary.sum(axis=0)).ravel()
+            in_strength = np.asarray(weighted.sum(axis=0)).ravel()
+            degree, strength = out_degree + in_degree, out_strength + in_strength
+            # 聚类系数和社区在忽略方向的骨架上计算
+            skeleton = (binary + binary.T).tocsr()
+            skeleton.data[:] = 1
+            undirected_weights = (weighted + weighted.T).tocsr()
+        else:
+            degree, strength = out_degree, out_strength
+            skeleton, undirected_weights = binary, weighted
+        
+        # 局部聚类系数：经过节点的三角形数 / 可能的三角形数
+        neighbors = np.asarray(skeleton.sum(axis=1)).ravel()
+        triangles = np.asarray((skeleton @ skeleton).multiply(skeleton).sum(axis=1)).ravel() / 2
+        possible = neighbors * (neighbors - 1) / 2
+        clustering = np.divide(triangles, possible, out=np.zeros(n), where=possible > 0)
+        
+        betweenness_info = {'method': betweenness, 'samples': None}
+        centrality = None
+        if betweenness != 'none' and n:
+            if betweenness == 'exact' or (betweenness == 'auto' and n <= exact_betweenness_nodes):
+                sources = np.arange(n)
+                betweenness_info['method'] = 'exact'
+            else:
+                sources = np.sort(np.random.default_rng(seed).choice(n, min(betweenness_samples, n), replace=False))
+                betweenness_info.update(method='sampled', samples=len(sources))
+            # 与networkx的归一化一致：按抽样比例放大，再除以(n-1)(n-2)
+            centrality = self._betweenness(binary, sources) * (n / len(sources))
+            if n > 2:
+                centrality /= (n - 1) * (n - 2)
+        
+        community_info = None
+        labels = None
+        if communities and n:
+            graph = nx.from_scipy_sparse_array(undirected_weights)
+            groups = nx.community.louvain_communities(graph, weight='weight', seed=seed)
+            # 社区编号按规模从大到小
+            groups = sorted(groups, key=lambda group: (-len(group), min(group)))
+            labels = np.empty(n, dtype=np.int64)
+            for label, group in enumerate(groups):
+                labels[list(group)] = label
+            community_info = {
+                'count': len(groups),
+                'sizes': [len(group) for group in groups],
+                'modularity': float(nx.community.modularity(graph, groups, weight='weight'))
+                if graph.number_of_edges() else 0.0
+            }
+        
+        node_metrics = []
+        for i, node in enumerate(nodes):
+            item = {
+                'id': node['id'],
+                'name': node.get('name'),
+                'degree': int(degree[i]),
+                'strength': float(strength[i]),
+                'clustering': float(clustering[i])
+            }
+            if directed:
+                item.update(in_degree=int(in_degree[i]), out_degree=int(out_degree[i]),
+                            in_strength=float(in_strength[i]), out_strength=float(out_strength[i]))
+            if centrality is not None:
+                item['betweenness'] = float(centrality[i])
+            if labels is not None:
+                item['community'] = int(labels[i])
+            node_metrics.append(item)
+        
+        edge_count = int(binary.nnz) if directed else int(binary.nnz // 2)
+        possible_edges = n * (n - 1) if directed else n * (n - 1) / 2
+        return {
+            'directed': directed,
+            'node_count': n,
+            'edge_count': edge_count,
+            'density': edge_count / possible_edges if possible_edges else 0.0,
+            'nodes': node_metrics,
+            'betweenness': betweenness_info,
+            'communities': community_info
+        }
+    
+    def _betweenness(self, adjacency, sources, block_bytes=64 * 1024 * 1024):
+        """Brandes算法的矩阵形式：一批源节点同时做广度优先搜索
+        
+        正向逐层用稀疏矩阵乘法累计最短路径条数sigma，反向逐层累计依赖度delta，
+        每批源节点的中间数组为 批大小 x 节点数，按block_bytes控制批大小。
+        返回各节点作为中间节点的依赖度之和（未归一化）。
+        
+        Args:
+            adjacency: 0/1稀疏邻接矩阵（CSR），adjacency[v, w]表示边v->w
+            sources: 作为最短路径起点的节点编号
+        """
+        n = adjacency.shape[0]
+        adjacency_t = adjacency.T.tocsr()
+        totals = np.zeros(n)
+        batch_size = max(1, block_bytes // (8 * 3 * max(n, 1)))
+        progress = self._progress()
+        for start in range(0, len(sources), batch_size):
+            progress.check()
+            batch = sources[start:start + batch_size]
+            rows = np.arange(len(batch))
+            sigma = np.zeros((len(batch), n))
+            sigma[rows, batch] = 1
+            depth = np.full((len(batch), n), -1, dtype=np.int32)
+            depth[rows, batch] = 0
+            
+            # 正向：frontier为当前层各节点的路径条数，乘邻接矩阵得到下一层
+            frontier = sigma.copy()
+            level = 0
+            while frontier.any():
+                reached = np.asarray(adjacency_t @ frontier.T).T
+                new = (reached > 0) & (depth < 0)
+                level += 1
+                depth[new] = level
+                sigma[new] = reached[new]
+                frontier = np.where(new, reached, 0)
+            
+            # 反向：delta[v] += sigma[v] / sigma[w] * (1 + delta[w])，w为v在下一层的后继
+            delta = np.zeros_like(sigma)
+            for d in range(level, 0, -1):
+                coefficient = np.where(depth == d, (1 + delta) / np.where(sigma > 0, sigma, 1), 0)
+                contribution = np.asarray(adjacency @ coefficient.T).T
+                delta += np.where(depth == d - 1, sigma * contribution, 0)
+            delta[rows, batch] = 0
+            totals += delta.sum(axis=0)
+            progress.step('betweenness', min(start + batch_size, len(sources)), len(sources))
+        return totals
+    
+    def consensus_network(self, networks, min_support=None, aggregate='mean'):
+        """合并多个已有分析结果的网络，保留至少被min_support个结果支持的边
+        
+        各结果的边权量纲不同（相关系数、互信息、因果图的0/1），先按各自最大的|权重|缩放到[0, 1]；
+        有向结果按无向边计算（同一对节点的两个方向取较大权重）。节点按名称对齐（取并集）。
+        所有结果的边拼接为一个数组后，用np.unique按节点对编号分组，支持数、聚合权重和
+        支持该边的结果都由分组后的向量化运算得到。
+        
+        Args:
+            networks: 分析结果列表，每项包含nodes和links
+            min_support: 最少支持的结果数，默认为过半数
+            aggregate: 支持结果的缩放权重的聚合方式：'mean'、'max' 或 'min'
+        
+        Returns:
+            字典：nodes、links（附support和methods，methods为支持该边的结果在networks中的序号）
+            及support_counts（支持数为1..m的边数）
+        """
+        m = len(networks)
+        if min_support is None:
+            min_support = m // 2 + 1
+        
+        # 节点名称的并集（按首次出现的顺序）
+        name_index = {}
+        for network in networks:
+            for node in network['nodes']:
+                name_index.setdefault(str(node['name']), len(name_index))
+        n = len(name_index)
+        
+        keys, weights, signed, owners = [], [], [], []
+        for r, network in enumerate(networks):
+            links = network['links']
+            if not links:
+                continue
+            node_map = {node['id']: name_index[str(node['name'])] for node in network['nodes']}
+            source = np.fromiter((node_map[link['source']] for link in links), dtype=np.int64, count=len(links))
+            target = np.fromiter((node_map[link['target']] for link in links), dtype=np.int64, count=len(links))
+            value = np.abs(np.fromiter((link['value'] for link in links), dtype=np.float64, count=len(links)))
+            sign = np.fromiter((link.get('correlation', link['value']) for link in links),
+                               dtype=np.float64, count=len(links))
+            keep = source != target
+            source, target, value, sign = source[keep], target[keep], value[keep], sign[keep]
+            scale = value.max() if len(value) and value.max() > 0 else 1.0
+            key = np.minimum(source, target) * n + np.maximum(source, target)
+            # 同一结果中同一对节点只计一次（有向图的双向边），保留权重较大的一条
+            order = np.lexsort((-value, key))
+            key, value, sign = key[order], value[order], sign[order]
+            first = np.concatenate(([True], key[1:] != key[:-1]))
+            keys.append(key[first])
+            weights.append(value[first] / scale)
+            signed.append(sign[first] / scale)
+            owners.append(np.full(int(first.sum()), r, dtype=np.int64))
+        
+        if keys:
+            keys, weights, signed, owners = (np.concatenate(parts) for parts in (keys, weights, signed, owners))
+        else:
+            keys, weights, signed, owners = (np.zeros(0, dtype=dtype) for dtype in
+                                             (np.int64, np.float64, np.float64, np.int64))
+        pairs, inverse = np.unique(keys, return_inverse=True)
+        support = np.bincount(inverse, minlength=len(pairs))
+        if aggregate == 'max':
+            aggregated = np.zeros(len(pairs))
+            np.maximum.at(aggregated, inverse, weights)
+        elif aggregate == 'min':
+            aggregated = np.full(len(pairs), np.inf)
+            np.minimum.at(aggregated, inverse, weights)
+        else:
+            aggregated = np.bincount(inverse, weights, minlength=len(pairs)) / np.maximum(support, 1)
+        signed_mean = np.bincount(inverse, signed, minlength=len(pairs)) / np.maximum(support, 1)
+        
+        # 每条边的支持结果：按边分组排列结果序号，只为选中的边取出各自的一段
+        grouped_owners = owners[np.argsort(inverse, kind='stable')]
+        offsets = np.concatenate(([0], np.cumsum(support)))
+        
+        selected = np.flatnonzero(support >= min_support)
+        names = list(name_index)
+        return {
+            'nodes': [{'id': i, 'name': name, 'group': 1} for i, name in enumerate(names)],
+            'links': [{
+                'source': int(pairs[k] // n),
+                'target': int(pairs[k] % n),
+                'value': float(aggregated[k]),
+                'correlation': float(signed_mean[k]),
+                'support': int(support[k]),
+                'methods': grouped_owners[offsets[k]:offsets[k + 1]].tolist()
+            } for k in selected],
+            'support_counts': np.bincount(support, minlength=m + 1)[1:].tolist()
+        }
@@ -1,15 +1,27 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, stream_with_context, g, send_from_directory
 from flask_cors import CORS
 import os
 import sys
-import pandas as pd
+import json
+import io
+import time
+import uuid
+import pstats
+import cProfile
+import hashlib
+import threading
+import warnings
+import numpy as np
+from collections import OrderedDict
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from db import Database
-from algorithms import Algorithms
-from utils import FileUtils, DataUtils
+from algorithms import Algorithms, ALGORITHM_METHODS, PAIRWISE_ALGORITHMS, SIGNIFICANCE_ALGORITHMS, get_result_matrix, \
+    preload as preload_algorithms
+from utils import FileUtils, DataUtils, EncodingUtils, ProgressTracker, AnalysisCancelled, MetricsRegistry, ArtifactWriter, \
+    CostEstimator, AdmissionController, physical_memory_bytes
 
 # 创建应用实例
 app = Flask(__name__, 
@@ -20,58 +32,278 @@ CORS(app)  # 启用CORS
 # 配置文件上传
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), '../uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
+# 结果文件保留策略：每个数据集/算法保留最新的N份，总大小上限（字节），后台清理间隔（秒）
+app.config['ARTIFACT_KEEP_LAST'] = int(os.environ.get('ARTIFACT_KEEP_LAST', 5))
+app.config['ARTIFACT_MAX_BYTES'] = int(os.environ.get('ARTIFACT_MAX_BYTES', 1024 * 1024 * 1024))
+app.config['ARTIFACT_GC_INTERVAL'] = float(os.environ.get('ARTIFACT_GC_INTERVAL', 60))
+# 单次分析的cProfile结果保存目录
+app.config['PROFILE_FOLDER'] = os.path.join(os.path.dirname(__file__), '../profiles')
+# 网络指标：节点数不超过该值时精确计算介数中心性，否则按抽样的源节点数近似
+app.config['EXACT_BETWEENNESS_NODES'] = int(os.environ.get('EXACT_BETWEENNESS_NODES', 500))
+app.config['BETWEENNESS_SAMPLES'] = int(os.environ.get('BETWEENNESS_SAMPLES', 256))
+# 分析的准入控制：同时运行的分析预估峰值内存之和的上限（字节，默认物理内存的一半；
+# 多进程部署时为每个进程的上限，见gunicorn.conf.py），排队等待的最长秒数和排队请求数，
+# 预估耗时的上限（秒，可选），以及sparse/blocked模式保留的最大边数
+app.config['ANALYSIS_MEMORY_BUDGET'] = int(os.environ.get('ANALYSIS_MEMORY_BUDGET', physical_memory_bytes() // 2))
+app.config['ANALYSIS_QUEUE_TIMEOUT'] = float(os.environ.get('ANALYSIS_QUEUE_TIMEOUT', 30))
+app.config['ANALYSIS_QUEUE_SIZE'] = int(os.environ.get('ANALYSIS_QUEUE_SIZE', 16))
+app.config['ANALYSIS_MAX_SECONDS'] = float(os.environ['ANALYSIS_MAX_SECONDS']) \
+    if os.environ.get('ANALYSIS_MAX_SECONDS') else None
+app.config['SPARSE_MAX_LINKS'] = int(os.environ.get('SPARSE_MAX_LINKS', 100000))
+# 单次分析的进程池（Kendall tau、置换检验）最多使用的工作进程数；多个请求可能同时各建一个进程池，
+# 每个工作进程都持有一份数据矩阵
+app.config['ANALYSIS_MAX_WORKERS'] = int(os.environ.get('ANALYSIS_MAX_WORKERS', min(4, os.cpu_count() or 1)))
 
 # 初始化工具类
 db = Database()
-algos = Algorithms()
+algos = Algorithms(max_workers=app.config['ANALYSIS_MAX_WORKERS'])
 file_utils = FileUtils()
 data_utils = DataUtils()
+encoding_utils = EncodingUtils()
+metrics = MetricsRegistry()
+
+# 监控指标（/metrics以Prometheus文本格式输出）
+metrics.histogram('analysis_stage_seconds', '分析各阶段耗时（解析、预处理、计算、布局、PNG编码、写数据库、写文件）')
+metrics.histogram('analysis_seconds', '单次分析总耗时')
+metrics.histogram('http_request_seconds', 'HTTP请求处理耗时')
+metrics.counter('cache_requests_total', '各级缓存的命中与未命中次数')
+metrics.counter('artifacts_total', '结果文件写入、因内容相同跳过和失败的次数')
+metrics.histogram('artifact_write_seconds', '后台写入单个结果文件的耗时')
+metrics.counter('admission_total', '分析请求的准入决定（直接运行、排队、降级、拒绝）及最终的输出方式')
+
+# 结果文件（邻接矩阵、网络图）的后台写入器
+artifact_writer = ArtifactWriter(catalog=db, metrics=metrics,
+                                 keep_last=app.config['ARTIFACT_KEEP_LAST'],
+                                 max_bytes=app.config['ARTIFACT_MAX_BYTES'],
+                                 gc_interval=app.config['ARTIFACT_GC_INTERVAL'])
+
+# 分析请求的内存与耗时估算和准入控制
+cost_estimator = CostEstimator(max_workers=app.config['ANALYSIS_MAX_WORKERS'])
+admission = AdmissionController(app.config['ANALYSIS_MEMORY_BUDGET'], app.config['ANALYSIS_QUEUE_SIZE'])
+
+# 特征统计结果缓存：键包含数据集版本，文件变化后自动失效
+statistics_cache = OrderedDict()
+statistics_cache_lock = threading.Lock()
+STATISTICS_CACHE_SIZE = 64
+# 行数超过该值时默认使用近似分位数
+APPROXIMATE_STATISTICS_ROWS = 1000000
+
+# 整个数据集的两两关联矩阵缓存，特征子集的网络直接从中切片得到
+association_cache = OrderedDict()
+association_cache_lock = threading.Lock()
+ASSOCIATION_CACHE_SIZE = 8
+
+# 基于两两关联矩阵的算法及其矩阵类型，这些算法的特征子集结果可由整体矩阵切片得到
+ASSOCIATION_ALGORITHMS = {
+    'correlation': 'pearson',
+    'spearman': 'spearman',
+    'kendall': 'kendall',
+    'aracne': 'mutual_information',
+    'clr': 'mutual_information'
+}
+
+# 分组分析：分组数和置换次数的上限
+MAX_GROUPS = 50
+MAX_PERMUTATIONS = 100000
+
+# 输出有向图的因果算法
+DIRECTED_ALGORITHMS = {'ges', 'mmhc', 'interiamb'}
+
+# 支持的全部算法名称（监控指标的标签只使用这些取值）
+ALGORITHM_NAMES = ('correlation', 'spearman', 'kendall', 'partial_correlation',
+                   'ges', 'mmhc', 'interiamb', 'aracne', 'clr')
+
+# 后台分析任务（任务id -> 进度跟踪器），只保留最近的若干个
+analysis_jobs = OrderedDict()
+analysis_jobs_lock = threading.Lock()
+ANALYSIS_JOBS_SIZE = 32
+
+# 在预派生服务器fork出的子进程中调用（见gunicorn.conf.py）：
+# 重建不能跨进程共享的数据库连接和后台写入线程
+def reset_after_fork():
+    db.reset_after_fork()
+    artifact_writer.reset_after_fork()
+    admission.reset_after_fork()
+
+# 预热：导入算法、绘图和pandas等重量级库，并绘制一张小图加载字体缓存
+# 预派生的服务器（如gunicorn的preload_app）在fork前调用，子进程共享已导入的模块；
+# 这里不打开数据库连接，连接由各子进程在第一次使用时建立
+def preload():
+    import pandas
+    preload_algorithms()
+    nodes = [{'id': 0, 'name': 'a', 'group': 1}, {'id': 1, 'name': 'b', 'group': 1}]
+    links = [{'source': 0, 'target': 1, 'value': 0.5, 'correlation': 0.5}]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        algos._generate_graph(nodes, links, ['a', 'b'], 'warm-up')
 
 # 辅助函数：确保目录存在
 def ensure_directory_exists(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
+# 辅助函数：按数据集记录的格式选项解析文件
+def parse_dataset(dataset, **kwargs):
+    parsed_data = file_utils.parse_file(dataset['path'], os.path.basename(dataset['path']),
+                                        sheet_name=dataset.get('sheet_name'),
+                                        header_row=dataset.get('header_row') or 0,
+                                        **kwargs)
+    metrics.inc('cache_requests_total', cache='parsed',
+                result='hit' if parsed_data['memory_footprint']['cache_hit'] else 'miss')
+    return parsed_data
+
+# 辅助函数：不解析文件估算数据集规模(行数, 列数)，供准入控制在解析之前使用：
+# 优先读取解析缓存的文件头；没有缓存时列数取登记的特征数，行数按文件大小取上界
+# （CSV每个单元格至少一个字符加一个分隔符，xlsx压缩后每个单元格也不少于约两个字节）
+def estimate_dataset_shape(dataset):
+    shape = file_utils.parsed_shape(dataset['path'], dataset.get('sheet_name'), dataset.get('header_row') or 0)
+    if shape is not None:
+        return shape
+    n_features = max(len(db.get_features_by_dataset_id(dataset['id'])), 1)
+    return os.path.getsize(dataset['path']) // (2 * n_features) + 1, n_features
+
+# 辅助函数：确保数据集的特征已登记到features表（兼容早于特征登记功能上传的数据集）
+def ensure_dataset_features(dataset):
+    features = db.get_features_by_dataset_id(dataset['id'])
+    if not features:
+        db.add_features(dataset['id'], parse_dataset(dataset)['feature_names'])
+        features = db.get_features_by_dataset_id(dataset['id'])
+    return features
+
+# 辅助函数：读取缓存的整体关联矩阵
+# 先查本进程的LRU缓存，再查磁盘上的共享缓存（内存映射读取，多个服务进程共享同一份）
+def get_cached_association(key, file_path):
+    with association_cache_lock:
+        entry = association_cache.get(key)
+        if entry is not None:
+            association_cache.move_to_end(key)
+    metrics.inc('cache_requests_total', cache='association', result='miss' if entry is None else 'hit')
+    if entry is None:
+        shared = file_utils.load_shared_matrix(file_path, key)
+        metrics.inc('cache_requests_total', cache='association_shared', result='miss' if shared is None else 'hit')
+        if shared is not None:
+            entry = remember_association(key, *shared)
+    return entry
+
+# 辅助函数：放入本进程的关联矩阵缓存（LRU淘汰）
+def remember_association(key, matrix, feature_names):
+    entry = {'matrix': matrix, 'feature_names': list(feature_names)}
+    with association_cache_lock:
+        association_cache[key] = entry
+        if len(association_cache) > ASSOCIATION_CACHE_SIZE:
+            association_cache.popitem(last=False)
+    return entry
+
+# 辅助函数：缓存整体关联矩阵，同时写入磁盘供其他服务进程使用
+def store_cached_association(key, matrix, feature_names, file_path):
+    remember_association(key, matrix, feature_names)
+    file_utils.store_shared_matrix(file_path, key, matrix, feature_names)
+
+# 辅助函数：数据集内容哈希（早期上传的数据集没有记录时补算并保存）
+def get_dataset_hash(dataset):
+    if not dataset.get('content_hash'):
+        dataset['content_hash'] = file_utils.file_content_hash(dataset['path'])
+        db.update_dataset_hash(dataset['id'], dataset['content_hash'])
+    return dataset['content_hash']
+
+# 辅助函数：If-None-Match与ETag匹配（压缩后的ETag带有编码后缀，同样视为匹配）
+def etag_matches(etag):
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    return any(if_none_match.contains_weak(tag) for tag in (etag, f'{etag}-gzip', f'{etag}-deflate'))
+
+# 辅助函数：返回304响应
+def not_modified(etag):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# 辅助函数：为响应设置ETag，要求客户端每次重新验证
+def with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# 辅助函数：按编码选项构建网络结果的响应数据
+def encode_network_result(result, options):
+    matrix = get_result_matrix(result)
+    return {
+        'encoding': options['encoding'],
+        'network': {
+            'nodes': encoding_utils.encode_nodes(result['nodes'], options),
+            'links': encoding_utils.encode_links(result['links'], options)
+        },
+        'correlationMatrix': encoding_utils.encode_matrix(matrix, options),
+        'graph_base64': result.get('graph_base64') if options['include_image'] else None
+    }
+
 # 辅助函数：保存分析结果
 
-def save_analysis_results(adjacency_matrix, graph_base64, feature_names, dataset_id, algorithm, save_path=None):
+def save_analysis_results(adjacency_matrix, graph_base64, feature_names, dataset_id, algorithm, save_path=None,
+                          matrix_format='csv'):
     try:
         # 确定保存目录
         if save_path:
             testdata_dir = os.path.abspath(save_path)
         else:
             testdata_dir = os.path.join(os.path.dirname(__file__), 'testdata')
-        ensure_directory_exists(testdata_dir)
         
         # 获取数据集名称
         dataset = db.get_dataset(dataset_id)
         dataset_name = dataset['name'].replace(' ', '_') if dataset else f'dataset_{dataset_id}'
+        timestamp = time.strftime('%Y%m%d_%H%M%S')
+        
+        # 邻接矩阵和PNG网络图交给后台线程写入，不占用请求时间
+        def write_artifacts():
+            artifact_writer.write_matrix(testdata_dir, f'{dataset_name}_{algorithm}_adj_matrix_{timestamp}',
+                                         adjacency_matrix, feature_names, matrix_format,
+                                         dataset_id=dataset_id, algorithm=algorithm)
+            if graph_base64:
+                artifact_writer.write_png(testdata_dir, f'{dataset_name}_{algorithm}_network_{timestamp}',
+                                          graph_base64, dataset_id=dataset_id, algorithm=algorithm)
         
-        # 保存邻接矩阵为CSV
-        import csv
-        timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-        adj_path = os.path.join(testdata_dir, f'{dataset_name}_{algorithm}_adj_matrix_{timestamp}.csv')
-        
-        with open(adj_path, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow([''] + feature_names)  # 表头
-            for i, row in enumerate(adjacency_matrix):
-                writer.writerow([feature_names[i]] + [round(val, 6) for val in row])
-        
-        # 保存PNG网络图
-        if graph_base64:
-            import base64
-            if ',' in graph_base64:
-                graph_base64 = graph_base64.split(',')[1]
-            image_bytes = base64.b64decode(graph_base64)
-            png_path = os.path.join(testdata_dir, f'{dataset_name}_{algorithm}_network_{timestamp}.png')
-            with open(png_path, 'wb') as f:
-                f.write(image_bytes)
-        
-        return True, adj_path, png_path if graph_base64 else None
+        artifact_writer.submit(write_artifacts)
+        return True
     except Exception as e:
         print(f"保存分析结果失败: {str(e)}")
-        return False, None, None
+        return False
+
+# 记录每个请求的处理耗时（该钩子最先注册、最后执行，耗时包含响应压缩）
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request_time(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request_seconds', time.perf_counter() - start,
+                        endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+# 按Accept-Encoding压缩较大的JSON响应
+@app.after_request
+def compress_response(response):
+    if (response.direct_passthrough or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers or not 200 <= response.status_code < 300):
+        return response
+    content_encoding = encoding_utils.choose_content_encoding(request.headers.get('Accept-Encoding'))
+    if content_encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < encoding_utils.compress_min_bytes:
+        return response
+    response.set_data(encoding_utils.compress(body, content_encoding))
+    response.headers['Content-Encoding'] = content_encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # 压缩后的表示与原表示字节不同，强ETag需要区分
+        response.set_etag(f'{etag}-{content_encoding}', weak)
+    response.headers.add('Vary', 'Accept-Encoding')
+    return response
 
 # 主页路由
 @app.route('/')
@@ -87,6 +319,11 @@ def upload_file():
         
         file = request.files['dataFile']
         dataset_name = request.form.get('datasetName', file.filename)
+        sheet_name = request.form.get('sheetName') or None  # Excel工作表名称，默认第一个
+        try:
+            header_row = int(request.form.get('headerRow', 0))  # 表头所在行（从0开始）
+        except ValueError:
+            return jsonify({'error': '表头行必须是整数', 'success': False, 'message': '表头行必须是整数'}), 400
         
         if file.filename == '':
             return jsonify({'error': '没有选择文件'}), 400
@@ -104,10 +341,12 @@ def upload_file():
         
         try:
             # 解析文件
-            parsed_data = file_utils.parse_file(file_path, filename)
+            parsed_data = file_utils.parse_file(file_path, filename, sheet_name=sheet_name, header_row=header_row)
             
             # 保存数据集信息到数据库
-            dataset_id = db.save_dataset(dataset_name, file_path)
+            dataset_id = db.save_dataset(dataset_name, file_path, sheet_name, header_row,
+                                         file_utils.file_content_hash(file_path))
+            db.add_features(dataset_id, parsed_data['feature_names'])
             
             return jsonify({
                 'success': True,
@@ -117,7 +356,10 @@ def upload_file():
                     'filename': filename,
                     'path': file_path,
                     'upload_time': db.get_dataset(dataset_id)['upload_time'],
-                    'size': os.path.getsize(file_path)
+                    'size': os.path.getsize(file_path),
+                    'num_samples': parsed_data['num_samples'],
+                    'num_features': parsed_data['num_features'],
+                    'memory_footprint': parsed_data['memory_footprint']
                 },
                 'message': '数据集上传成功'
             }), 200
@@ -125,6 +367,7 @@ def upload_file():
             # 解析失败，删除已保存的文件
             if os.path.exists(file_path):
                 os.remove(file_path)
+            file_utils.clear_parsed_cache(file_path)
             return jsonify({'error': f'文件解析失败：{str(parse_error)}', 'success': False, 'message': f'文件解析失败：{str(parse_error)}'}), 400
         
     except Exception as e:
@@ -134,11 +377,25 @@ def upload_file():
 @app.route('/api/datasets', methods=['GET'])
 def get_datasets():
     try:
+        # 只用元数据（id、名称、上传时间、内容哈希和文件版本）生成ETag，未变化时直接返回304；
+        # 同名文件重新上传会原地覆盖旧数据集的文件，记录的哈希不再对应，因此同时包含文件的修改时间和大小
+        versions = db.get_dataset_versions()
+        for version in versions:
+            exists = os.path.exists(version['path'])
+            if not version['content_hash'] and exists:
+                get_dataset_hash(version)
+            version['file_version'] = file_utils.dataset_version(version['path']) if exists else None
+        fingerprint = json.dumps([[v['id'], v['name'], v['upload_time'], v['content_hash'], v['file_version']]
+                                  for v in versions])
+        etag = 'datasets-' + hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+        if etag_matches(etag):
+            return not_modified(etag)
+        
         datasets = db.get_all_datasets()
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
             'data': datasets
-        }), 200
+        }), etag), 200
     except Exception as e:
         return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
 
@@ -169,10 +426,14 @@ def delete_dataset(dataset_id):
         # 保存文件路径用于后续删除
         file_path = dataset['path']
         
+        # 删除该数据集的结果文件
+        artifact_writer.delete_artifacts(db.get_artifacts(dataset_id))
+        
         # 先从数据库中删除记录
         db.delete_dataset(dataset_id)
         
-        # 再删除文件
+        # 再删除文件及其解析缓存
+        file_utils.clear_parsed_cache(file_path)
         if os.path.exists(file_path):
             try:
                 os.remove(file_path)
@@ -196,87 +457,481 @@ def get_dataset_features(dataset_id):
         if not dataset:
             return jsonify({'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}), 404
         
+        # 特征名只取决于文件内容和表头设置（文件版本用于识别同名上传对文件的原地覆盖）
+        etag = (f"features-{dataset_id}-{get_dataset_hash(dataset)[:32]}-{file_utils.dataset_version(dataset['path'])}"
+                f"-{dataset.get('sheet_name') or ''}-{dataset.get('header_row') or 0}")
+        if etag_matches(etag):
+            return not_modified(etag)
+        
         # 解析文件内容
-        parsed_data = file_utils.parse_file(dataset['path'], dataset['name'])
+        parsed_data = parse_dataset(dataset)
         
-        return jsonify({
+        return with_etag(jsonify({
             'success': True,
             'data': parsed_data['feature_names']
-        }), 200
+        }), etag), 200
     except Exception as e:
         import traceback
         error_msg = f"Error in get_dataset_features: {str(e)}\nTraceback: {traceback.format_exc()}"
         print(error_msg)
         return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
 
-# 运行算法分析
-@app.route('/api/analyze', methods=['POST'])
-def analyze():
+# 获取数据集的特征分类
+@app.route('/api/datasets/<int:dataset_id>/classifications', methods=['GET'])
+def get_classifications(dataset_id):
     try:
-        data = request.json
-        dataset_id = data.get('datasetId')
-        algorithm = data.get('algorithm')
-        save_path = data.get('savePath')  # 获取保存路径参数
+        dataset = db.get_dataset(dataset_id)
+        if not dataset:
+            return jsonify({'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}), 404
         
-        if not dataset_id or not algorithm:
-            return jsonify({'error': '缺少必要参数', 'success': False, 'message': '缺少必要参数'}), 400
+        return jsonify({
+            'success': True,
+            'data': db.get_classifications_by_dataset_id(dataset_id)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 创建特征分类（命名的特征组）
+@app.route('/api/datasets/<int:dataset_id>/classifications', methods=['POST'])
+def create_classification(dataset_id):
+    try:
+        data = request.json or {}
+        name = data.get('name')
+        feature_names = data.get('features')
+        
+        if not name or not isinstance(feature_names, list) or not feature_names:
+            return jsonify({'error': '缺少分类名称或特征列表', 'success': False, 'message': '缺少分类名称或特征列表'}), 400
         
-        # 获取数据集信息
         dataset = db.get_dataset(dataset_id)
         if not dataset:
             return jsonify({'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}), 404
         
-        # 解析文件内容
-        parsed_data = file_utils.parse_file(dataset['path'], dataset['name'])
-        data_matrix = parsed_data['data']
-        feature_names = parsed_data['feature_names']
+        feature_ids = {feature['name']: feature['id'] for feature in ensure_dataset_features(dataset)}
+        unknown = [str(feature) for feature in feature_names if str(feature) not in feature_ids]
+        if unknown:
+            return jsonify({'error': f'特征不存在: {", ".join(unknown)}', 'success': False,
+                            'message': f'特征不存在: {", ".join(unknown)}'}), 400
         
-        # 选择算法
-        result = None
-        algorithm_mapping = {
-            'correlation': algos.correlation_algorithm,
-            'partial_correlation': algos.partial_correlation_algorithm,
-            'ges': algos.ges_algorithm,
-            'mmhc': algos.mmhc_algorithm,
-            'interiamb': algos.inter_iamb_algorithm
-        }
+        classification_id = db.add_classification(dataset_id, name, [feature_ids[str(feature)] for feature in feature_names])
+        
+        return jsonify({
+            'success': True,
+            'data': db.get_classification(classification_id),
+            'message': '特征分类创建成功'
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 删除特征分类
+@app.route('/api/classifications/<int:classification_id>', methods=['DELETE'])
+def delete_classification(classification_id):
+    try:
+        if not db.get_classification(classification_id):
+            return jsonify({'error': '特征分类不存在', 'success': False, 'message': '特征分类不存在'}), 404
         
-        if algorithm in algorithm_mapping:
-            result = algorithm_mapping[algorithm](data_matrix, feature_names)
+        db.delete_classification(classification_id)
+        return jsonify({
+            'success': True,
+            'message': '特征分类删除成功'
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 分析流程本身：返回(响应体, 状态码)，同步接口和后台任务共用
+# progress为进度跟踪器，各阶段切换和算法内部循环处都是取消检查点
+def run_analysis(data, accept=None, progress=None):
+    progress = progress or ProgressTracker()
+    dataset_id = data.get('datasetId')
+    algorithm = data.get('algorithm')
+    save_path = data.get('savePath')  # 获取保存路径参数
+    missing = data.get('missing', 'listwise')  # 缺失值处理方式：listwise 或 pairwise
+    precision = data.get('precision', 'float64')  # 计算精度：float64 或 float32
+    redundancy_threshold = data.get('redundancyThreshold')  # 冗余特征合并阈值（可选）
+    classification_id = data.get('classificationId')  # 只分析某个特征分类（可选）
+    requested_features = data.get('features')  # 只分析指定的特征子集（可选）
+    artifact_format = data.get('artifactFormat', 'csv')  # 邻接矩阵文件格式：csv、npz（二进制）或 none（不保存）
+    significance = data.get('significance')  # 边的选取方式：默认固定阈值，permutation为置换检验
+    mode = data.get('mode', 'auto')  # 输出方式：auto（由准入控制选择）、full、no_image、sparse 或 blocked
+    max_links = data.get('maxLinks', app.config['SPARSE_MAX_LINKS'])  # sparse/blocked模式保留的最大边数
+    
+    if not dataset_id or not algorithm:
+        return {'error': '缺少必要参数', 'success': False, 'message': '缺少必要参数'}, 400
+    
+    if missing not in ('listwise', 'pairwise'):
+        return {'error': '不支持的缺失值处理方式', 'success': False, 'message': '不支持的缺失值处理方式'}, 400
+    
+    if precision not in ('float64', 'float32'):
+        return {'error': '不支持的计算精度', 'success': False, 'message': '不支持的计算精度'}, 400
+    
+    if artifact_format not in ArtifactWriter.MATRIX_FORMATS + ('none',):
+        return {'error': '不支持的结果文件格式', 'success': False, 'message': '不支持的结果文件格式'}, 400
+    
+    if mode != 'auto' and mode not in CostEstimator.MODES:
+        return {'error': '不支持的输出方式', 'success': False, 'message': '不支持的输出方式'}, 400
+    try:
+        max_links = int(max_links)
+    except (TypeError, ValueError):
+        max_links = 0
+    if max_links < 1:
+        return {'error': 'maxLinks必须是正整数', 'success': False, 'message': 'maxLinks必须是正整数'}, 400
+    
+    try:
+        encoding_options = encoding_utils.options_from_request(data, accept)
+    except ValueError as encoding_error:
+        return {'error': str(encoding_error), 'success': False, 'message': str(encoding_error)}, 400
+    
+    if requested_features is not None and not isinstance(requested_features, list):
+        return {'error': '特征子集必须是特征名列表', 'success': False, 'message': '特征子集必须是特征名列表'}, 400
+    
+    significance_options = {}
+    if significance is not None:
+        if significance != 'permutation' or algorithm not in SIGNIFICANCE_ALGORITHMS:
+            return {'error': '置换检验只支持correlation和partial_correlation', 'success': False,
+                    'message': '置换检验只支持correlation和partial_correlation'}, 400
+        try:
+            significance_options = {
+                'permutations': int(data.get('permutations', 10000)),
+                'alpha': float(data.get('alpha', 0.05)),
+                'seed': int(data.get('seed', 0))
+            }
+        except (TypeError, ValueError):
+            return {'error': '置换检验参数无效', 'success': False, 'message': '置换检验参数无效'}, 400
+        if not 1 <= significance_options['permutations'] <= MAX_PERMUTATIONS:
+            message = f'置换次数必须在1到{MAX_PERMUTATIONS}之间'
+            return {'error': message, 'success': False, 'message': message}, 400
+    
+    if redundancy_threshold is not None:
+        try:
+            redundancy_threshold = float(redundancy_threshold)
+        except (TypeError, ValueError):
+            redundancy_threshold = -1
+        if not 0 < redundancy_threshold < 1:
+            return {'error': '冗余特征阈值必须在0和1之间', 'success': False, 'message': '冗余特征阈值必须在0和1之间'}, 400
+    
+    # 获取数据集信息
+    dataset = db.get_dataset(dataset_id)
+    if not dataset:
+        return {'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}, 404
+    
+    # 分析目标：命名的特征分类或显式的特征子集（默认全部特征）
+    subset_names = None
+    result_key = algorithm
+    if classification_id is not None:
+        classification = db.get_classification(classification_id)
+        if not classification or classification['dataset_id'] != dataset['id']:
+            return {'error': '特征分类不存在', 'success': False, 'message': '特征分类不存在'}, 404
+        subset_names = classification['features']
+        result_key = f"{algorithm}:classification_{classification_id}"
+    elif requested_features is not None:
+        subset_names = [str(name) for name in requested_features]
+        result_key = f"{algorithm}:features_{hashlib.sha1(json.dumps(subset_names).encode('utf-8')).hexdigest()[:12]}"
+    if significance is not None:
+        # 置换检验的结果与阈值选边的结果分开保存
+        result_key = f"{result_key}:{significance}"
+    if subset_names is not None and len(subset_names) < 2:
+        return {'error': '特征子集至少需要两个特征', 'success': False, 'message': '特征子集至少需要两个特征'}, 400
+    
+    # 关联矩阵类算法：整个数据集的矩阵已缓存时直接切片，无需重新解析和计算
+    association_kind = ASSOCIATION_ALGORITHMS.get(algorithm)
+    association_key = (dataset['id'], file_utils.dataset_version(dataset['path']),
+                       missing, precision, association_kind)
+    cached_association = get_cached_association(association_key, dataset['path']) if association_kind else None
+    
+    # 准入控制：按数据规模估算各输出方式的峰值内存，选择预算内最完整的一种；
+    # 当前空闲内存不够时排队等待，完整结果放不下时自动降级为更省内存的方式
+    precomputed = cached_association is not None and redundancy_threshold is None and significance is None
+    candidates = cost_estimator.modes_for(algorithm, precomputed, significance, missing)
+    if mode != 'auto':
+        if mode not in candidates:
+            message = f'该请求不支持{mode}输出方式'
+            return {'error': message, 'success': False, 'message': message}, 400
+        candidates = [mode]
+    elif not encoding_options['include_image'] and artifact_format == 'none':
+        # 既不返回也不保存网络图时无需绘制
+        candidates = candidates[1:]
+    # 在解析文件之前按存储的规模估算（解析本身也计入），删除缺失值和合并冗余特征只会使规模变小
+    n_samples, file_features = estimate_dataset_shape(dataset)
+    n_features = len(subset_names) if subset_names is not None else file_features
+    estimates = [cost_estimator.estimate(n_samples, n_features, algorithm, candidate,
+                                         itemsize=4 if precision == 'float32' else 8, precomputed=precomputed,
+                                         permutations=significance_options.get('permutations', 0),
+                                         max_links=max_links, file_features=file_features)
+                 for candidate in candidates]
+    budget = admission.budget_bytes
+    max_seconds = app.config['ANALYSIS_MAX_SECONDS']
+    chosen = next((estimate for estimate in estimates if estimate['peak_bytes'] <= budget
+                   and (max_seconds is None or estimate['seconds'] <= max_seconds)), None)
+    admission_info = {
+        'requestedMode': mode,
+        'budgetBytes': budget,
+        'estimates': {estimate['mode']: {'peakBytes': estimate['peak_bytes'], 'seconds': estimate['seconds']}
+                      for estimate in estimates}
+    }
+    if chosen is None:
+        metrics.inc('admission_total', decision='rejected', mode='none')
+        cheapest = estimates[-1]
+        message = (f"预估峰值内存{cheapest['peak_bytes'] / 2 ** 20:.0f}MB、耗时{cheapest['seconds']:.0f}秒，"
+                   f"超过服务器上限（内存{budget / 2 ** 20:.0f}MB）")
+        return {'error': message, 'success': False, 'message': message,
+                'admission': dict(admission_info, decision='rejected')}, 413
+    
+    progress.stage('admission', mode=chosen['mode'], peak_bytes=chosen['peak_bytes'])
+    waited = admission.acquire(chosen['peak_bytes'], app.config['ANALYSIS_QUEUE_TIMEOUT'], progress.check)
+    if waited is None:
+        metrics.inc('admission_total', decision='busy', mode=chosen['mode'])
+        message = '服务器正在运行其他分析，内存不足，请稍后重试'
+        return {'error': message, 'success': False, 'message': message,
+                'retryAfter': int(app.config['ANALYSIS_QUEUE_TIMEOUT']) or 1,
+                'admission': dict(admission_info, decision='busy', mode=chosen['mode'],
+                                  queued=admission.queued)}, 503
+    
+    output_mode = chosen['mode']
+    degraded = chosen is not estimates[0]
+    decision = 'degraded' if degraded else ('queued' if waited > 0 else 'admitted')
+    metrics.inc('admission_total', decision=decision, mode=output_mode)
+    admission_info.update({
+        'decision': decision,
+        'mode': output_mode,
+        'queued': waited > 0,
+        'waitedSeconds': waited,
+        'estimate': {'peakBytes': chosen['peak_bytes'], 'seconds': chosen['seconds'], 'links': chosen['links'],
+                     'breakdown': chosen['breakdown']}
+    })
+    if degraded:
+        admission_info['reason'] = (f"{estimates[0]['mode']}方式预估需要{estimates[0]['peak_bytes'] / 2 ** 20:.0f}MB内存、"
+                                    f"{estimates[0]['seconds']:.0f}秒，超过上限")
+    if output_mode in ('sparse', 'blocked'):
+        admission_info['maxLinks'] = max_links
+    algos.set_output_mode(max_links=max_links if output_mode in ('sparse', 'blocked') else None,
+                          include_matrix=output_mode in ('full', 'no_image'),
+                          render_graphs=output_mode == 'full', blocked=output_mode == 'blocked')
+    try:
+        if cached_association is not None and redundancy_threshold is None and significance is None:
+            data_matrix = None
+            all_feature_names = cached_association['feature_names']
+        else:
+            # 解析文件内容
+            progress.stage('parse')
+            parsed_data = parse_dataset(dataset, missing=missing, dtype=precision, progress=progress)
+            data_matrix = parsed_data['data']
+            all_feature_names = parsed_data['feature_names']
+        
+            # 只有相关系数类算法支持成对完整计算，其余算法（及置换检验）仍删除含缺失值的行
+            if missing == 'pairwise' and (algorithm not in PAIRWISE_ALGORITHMS or significance is not None):
+                data_matrix = file_utils.drop_incomplete_rows(data_matrix)
+            
+            # 删除缺失值后样本太少（如文件含文本列，整行都被删除）时无法计算任何关联
+            if data_matrix.shape[0] < 3:
+                message = f'删除缺失值后只剩{data_matrix.shape[0]}个完整样本，至少需要3个（请检查文件是否包含文本列）'
+                return {'error': message, 'success': False, 'message': message}, 400
+    
+        # 特征子集对应的列号
+        if subset_names is not None:
+            name_index = {str(name): i for i, name in enumerate(all_feature_names)}
+            unknown = [name for name in subset_names if name not in name_index]
+            if unknown:
+                return {'error': f'特征不存在: {", ".join(unknown)}', 'success': False,
+                                'message': f'特征不存在: {", ".join(unknown)}'}, 400
+            columns = [name_index[name] for name in subset_names]
+        else:
+            columns = list(range(len(all_feature_names)))
+        feature_names = [all_feature_names[i] for i in columns]
+        if data_matrix is not None and subset_names is not None:
+            data_matrix = data_matrix[:, columns]
+    
+        # 可选的预处理阶段：合并近似重复的特征，缩小后续（尤其是因果）算法的规模
+        feature_reduction = None
+        if redundancy_threshold is not None:
+            original_count = len(feature_names)
+            data_matrix, reduced_names, merged = data_utils.reduce_redundant_features(
+                data_matrix, feature_names, redundancy_threshold)
+            kept = set(reduced_names)
+            columns = [col for col, name in zip(columns, feature_names) if name in kept]
+            feature_names = reduced_names
+            feature_reduction = {
+                'threshold': redundancy_threshold,
+                'original_features': original_count,
+                'kept_features': len(feature_names),
+                'merged': merged
+            }
+    
+        algorithm_kwargs = {}
+        if significance is not None:
+            algorithm_kwargs = dict(significance_options, significance=significance)
+        elif association_kind:
+            if cached_association is not None:
+                algorithm_kwargs['precomputed_matrix'] = cached_association['matrix'][np.ix_(columns, columns)]
+            elif subset_names is None and feature_reduction is None and output_mode != 'blocked':
+                # 整个数据集的分析：计算并缓存整体矩阵，供之后的特征子集分析切片
+                progress.stage('association', kind=association_kind)
+                full_matrix = algos.association_matrix(data_matrix, association_kind)
+                store_cached_association(association_key, full_matrix, all_feature_names, dataset['path'])
+                algorithm_kwargs['precomputed_matrix'] = full_matrix
+    
+        # 选择算法
+        if algorithm in ALGORITHM_METHODS:
+            progress.stage('algorithm', algorithm=algorithm, features=len(feature_names))
+            result = getattr(algos, ALGORITHM_METHODS[algorithm])(data_matrix, feature_names, **algorithm_kwargs)
         else:
-            return jsonify({'error': '不支持的算法', 'success': False, 'message': '不支持的算法'}), 400
+            return {'error': '不支持的算法', 'success': False, 'message': '不支持的算法'}, 400
+    
+        if feature_reduction is not None:
+            result['feature_reduction'] = feature_reduction
         
+        # 精简模式下，先构造全部边的算法（如因果算法）在这里截取最强的max_links条
+        if output_mode in ('sparse', 'blocked') and len(result['links']) > max_links:
+            strength = np.fromiter((abs(link['value']) for link in result['links']), dtype=np.float64,
+                                   count=len(result['links']))
+            keep = np.sort(np.argpartition(-strength, max_links - 1)[:max_links])
+            result['links'] = [result['links'][k] for k in keep]
+    
         # 保存分析结果到数据库
-        # 保存分析结果到数据库（忽略返回值）
-        db.save_analysis_result(dataset_id, algorithm, result)
-        
-        # 构建返回结果 - 支持所有算法的矩阵类型
-        # 检查所有可能的矩阵类型
-        correlation_matrix = result.get('correlation_matrix') or \
-                           result.get('partial_correlation_matrix') or \
-                           result.get('precision_matrix') or \
-                           result.get('adjacency_matrix')
+        progress.stage('save_result')
+        result_id = db.save_analysis_result(dataset_id, result_key, result)
+    
+        # 构建返回结果 - 支持所有算法的矩阵类型，并按请求的编码选项输出
+        correlation_matrix = get_result_matrix(result)
         graph_base64 = result.get('graph_base64')
-        
+    
+        progress.stage('encode_response')
+        response_data = encode_network_result(result, encoding_options)
+        response_data['featureNames'] = feature_names
+        response_data['featureReduction'] = feature_reduction
+        response_data['resultId'] = result_id
+        if 'significance' in result:
+            response_data['significance'] = result['significance']
+        response_data['admission'] = admission_info
         return_result = {
             'success': True,
-            'data': {
-                'network': {
-                    'nodes': result['nodes'],
-                    'links': result['links']
-                },
-                'featureNames': feature_names,
-                'correlationMatrix': correlation_matrix,
-                'graph_base64': graph_base64
-            },
+            'data': response_data,
             'message': '数据分析完成'
         }
-        
+    
         # 自动保存分析结果
-        if correlation_matrix:
-            save_analysis_results(correlation_matrix, graph_base64, feature_names, dataset_id, algorithm, save_path)
+        if correlation_matrix and artifact_format != 'none':
+            progress.stage('save_artifacts')
+            save_analysis_results(correlation_matrix, graph_base64, feature_names, dataset_id,
+                                  result_key.replace(':', '_'), save_path, artifact_format)
+    
+        progress.result = {
+            'datasetId': dataset['id'],
+            'algorithm': result_key,
+            'resultId': result_id,
+            'resultUrl': f"/api/result/{dataset['id']}/{result_key}"
+        }
+        return return_result, 200
+    finally:
+        algos.set_output_mode()
+        admission.release(chosen['peak_bytes'])
+
+# 保存cProfile结果，返回下载地址和按累计耗时排序的摘要
+def store_profile(profiler, result_key, top=30):
+    ensure_directory_exists(app.config['PROFILE_FOLDER'])
+    filename = f"{time.strftime('%Y%m%d_%H%M%S')}_{result_key.replace(':', '_')}_{uuid.uuid4().hex[:6]}.prof"
+    profiler.dump_stats(os.path.join(app.config['PROFILE_FOLDER'], filename))
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(top)
+    return {
+        'file': filename,
+        'url': f'/api/profiles/{filename}',
+        'summary': summary.getvalue()
+    }
+
+# 在当前线程执行分析，期间为算法设置进度跟踪，并记录各阶段耗时
+# 请求参数profile为true时用cProfile剖析本次分析，结果保存到PROFILE_FOLDER
+def run_tracked_analysis(data, accept, progress=None):
+    progress = progress or ProgressTracker()
+    algorithm = data.get('algorithm') if data else None
+    algorithm_label = algorithm if algorithm in ALGORITHM_NAMES else 'unknown'
+    profiler = cProfile.Profile() if data and data.get('profile') else None
+    outcome = 'error'
+    algos.set_progress(progress)
+    try:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            payload, code = run_analysis(data, accept, progress)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        outcome = 'success' if code == 200 else 'rejected'
+        
+        if progress.result is not None:
+            if profiler is not None:
+                progress.stage('profile')
+                payload['profile'] = store_profile(profiler, progress.result['algorithm'])
+                progress.result['profileUrl'] = payload['profile']['url']
+            progress.emit('done', **progress.result)
+        return payload, code
+    except AnalysisCancelled:
+        outcome = 'cancelled'
+        raise
+    finally:
+        algos.set_progress(None)
+        progress.close_stage()
+        for stage, seconds in progress.stage_durations.items():
+            metrics.observe('analysis_stage_seconds', seconds, stage=stage, algorithm=algorithm_label)
+        metrics.observe('analysis_seconds', progress.elapsed(), algorithm=algorithm_label, outcome=outcome)
+
+# 后台分析任务的线程入口，结果和错误都以事件形式推送
+def run_analysis_job(data, accept, progress):
+    try:
+        payload, code = run_tracked_analysis(data, accept, progress)
+        if not payload.get('success'):
+            progress.emit('error', status=code, message=payload.get('message'))
+    except AnalysisCancelled:
+        progress.emit('cancelled', stage=progress.current_stage)
+    except Exception as e:
+        import traceback
+        print(f"Error: {str(e)}\nTraceback: {traceback.format_exc()}")
+        progress.emit('error', status=500, message=str(e))
+
+# 创建后台分析任务并登记，只保留最近的若干个任务
+def start_analysis_job(data, accept):
+    job_id = uuid.uuid4().hex
+    progress = ProgressTracker(job_id)
+    with analysis_jobs_lock:
+        analysis_jobs[job_id] = progress
+        while len(analysis_jobs) > ANALYSIS_JOBS_SIZE:
+            oldest = next((key for key, job in analysis_jobs.items() if job.finished), None)
+            if oldest is None:
+                break
+            analysis_jobs.pop(oldest)
+    progress.emit('queued', jobId=job_id)
+    threading.Thread(target=run_analysis_job, args=(data, accept, progress), daemon=True).start()
+    return progress
+
+# 以SSE推送任务事件；客户端断开时取消尚未完成的任务
+def stream_job_events(progress, start=0, cancel_on_disconnect=False):
+    def generate():
+        try:
+            for item in progress.iter_events(start):
+                if item is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield progress.format_sse(*item)
+        finally:
+            if cancel_on_disconnect and not progress.finished:
+                progress.cancel()
+    response = app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# 运行算法分析
+# 请求头Accept为text/event-stream时以SSE推送进度，最后一条done事件给出结果地址
+@app.route('/api/analyze', methods=['POST'])
+def analyze():
+    try:
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            progress = start_analysis_job(request.json, None)
+            return stream_job_events(progress, cancel_on_disconnect=True)
         
-        return jsonify(return_result), 200
+        payload, code = run_tracked_analysis(request.json, request.headers.get('Accept'))
+        response = jsonify(payload)
+        if code == 503 and 'retryAfter' in payload:
+            response.headers['Retry-After'] = str(payload['retryAfter'])
+        return response, code
         
     except Exception as e:
         import traceback
@@ -284,18 +939,432 @@ def analyze():
         print(error_msg)
         return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
 
+# 创建后台分析任务，返回任务id（可用EventSource订阅进度）
+@app.route('/api/analyze/jobs', methods=['POST'])
+def create_analysis_job():
+    try:
+        progress = start_analysis_job(request.json, request.headers.get('Accept'))
+        job_id = progress.job_id
+        return jsonify({
+            'success': True,
+            'data': {
+                'jobId': job_id,
+                'eventsUrl': f'/api/analyze/jobs/{job_id}/events',
+                'cancelUrl': f'/api/analyze/jobs/{job_id}'
+            },
+            'message': '分析任务已创建'
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 查询分析任务的当前状态
+@app.route('/api/analyze/jobs/<string:job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    progress = analysis_jobs.get(job_id)
+    if progress is None:
+        return jsonify({'error': '分析任务不存在', 'success': False, 'message': '分析任务不存在'}), 404
+    last_event = progress.events[-1] if progress.events else None
+    return jsonify({
+        'success': True,
+        'data': {
+            'jobId': job_id,
+            'stage': progress.current_stage,
+            'elapsed': progress.elapsed(),
+            'finished': progress.finished,
+            'cancelRequested': progress.cancelled,
+            'lastEvent': last_event
+        }
+    }), 200
+
+# 订阅分析任务的进度事件（SSE），支持Last-Event-ID断线续传
+@app.route('/api/analyze/jobs/<string:job_id>/events', methods=['GET'])
+def get_analysis_job_events(job_id):
+    progress = analysis_jobs.get(job_id)
+    if progress is None:
+        return jsonify({'error': '分析任务不存在', 'success': False, 'message': '分析任务不存在'}), 404
+    last_event_id = request.headers.get('Last-Event-ID')
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    return stream_job_events(progress, start)
+
+# 取消分析任务：在算法下一个检查点处停止
+@app.route('/api/analyze/jobs/<string:job_id>', methods=['DELETE'])
+def cancel_analysis_job(job_id):
+    progress = analysis_jobs.get(job_id)
+    if progress is None:
+        return jsonify({'error': '分析任务不存在', 'success': False, 'message': '分析任务不存在'}), 404
+    if not progress.finished:
+        progress.cancel()
+    return jsonify({'success': True, 'message': '已请求取消分析任务'}), 200
+
+# 滑动窗口的动态网络：按行顺序（时间顺序）每个窗口输出一帧网络
+# 请求体：datasetId、algorithm（correlation或partial_correlation）、windowSize、stride，
+# 可选threshold（默认0.1）、features（特征子集）、round（权重保留的小数位数）
+# 默认以NDJSON逐行输出：meta一行、每个窗口一行frame、最后一行done；
+# 请求头Accept为text/event-stream时以同样的事件名按SSE输出
+@app.route('/api/analyze/windows', methods=['POST'])
+def analyze_windows():
+    try:
+        data = request.get_json(silent=True) or {}
+        dataset = db.get_dataset(data.get('datasetId'))
+        if not dataset:
+            return jsonify({'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}), 404
+        
+        algorithm = data.get('algorithm', 'correlation')
+        methods = {'correlation': 'pearson', 'partial_correlation': 'partial'}
+        if algorithm not in methods:
+            return jsonify({'error': '滑动窗口只支持correlation和partial_correlation',
+                            'success': False, 'message': '滑动窗口只支持correlation和partial_correlation'}), 400
+        try:
+            window = int(data.get('windowSize'))
+            stride = int(data.get('stride', 1))
+            threshold = float(data.get('threshold', 0.1))
+            digits = int(data['round']) if data.get('round') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': '窗口参数无效', 'success': False, 'message': '窗口参数无效'}), 400
+        if window < 3 or stride < 1:
+            return jsonify({'error': '窗口至少3行，步长至少1行', 'success': False,
+                            'message': '窗口至少3行，步长至少1行'}), 400
+        
+        parsed_data = parse_dataset(dataset)
+        data_matrix = parsed_data['data']
+        feature_names = parsed_data['feature_names']
+        if data.get('features') is not None:
+            subset_names = [str(name) for name in data['features']]
+            name_index = {str(name): i for i, name in enumerate(feature_names)}
+            unknown = [name for name in subset_names if name not in name_index]
+            if unknown:
+                return jsonify({'error': f'特征不存在: {", ".join(unknown)}', 'success': False,
+                                'message': f'特征不存在: {", ".join(unknown)}'}), 400
+            if len(subset_names) < 2:
+                return jsonify({'error': '特征子集至少需要两个特征', 'success': False,
+                                'message': '特征子集至少需要两个特征'}), 400
+            columns = [name_index[name] for name in subset_names]
+            data_matrix = data_matrix[:, columns]
+            feature_names = subset_names
+        if window > data_matrix.shape[0]:
+            return jsonify({'error': '窗口大于数据行数', 'success': False, 'message': '窗口大于数据行数'}), 400
+        
+        total = 1 + (data_matrix.shape[0] - window) // stride
+        meta = {
+            'datasetId': dataset['id'],
+            'algorithm': algorithm,
+            'featureNames': [str(name) for name in feature_names],
+            'windowSize': window,
+            'stride': stride,
+            'threshold': threshold,
+            'windows': total,
+            'rows': int(data_matrix.shape[0]),
+            'droppedRows': parsed_data['memory_footprint']['dropped_rows']
+        }
+        sse = 'text/event-stream' in request.headers.get('Accept', '')
+        
+        def format_event(index, event, payload):
+            if sse:
+                return ProgressTracker.format_sse(index, {'event': event, 'data': payload})
+            return json.dumps(dict(payload, type=event), ensure_ascii=False) + '\n'
+        
+        def generate():
+            start = time.perf_counter()
+            yield format_event(0, 'meta', meta)
+            frames = algos.sliding_window_networks(data_matrix, window, stride, methods[algorithm], threshold)
+            for frame in frames:
+                if digits is not None:
+                    frame['weight'] = np.round(frame['weight'], digits).tolist()
+                yield format_event(frame['window'] + 1, 'frame', frame)
+            seconds = time.perf_counter() - start
+            metrics.observe('analysis_stage_seconds', seconds, stage='windows', algorithm=algorithm)
+            yield format_event(total + 1, 'done', {'windows': total, 'seconds': seconds})
+        
+        response = app.response_class(stream_with_context(generate()),
+                                      mimetype='text/event-stream' if sse else 'application/x-ndjson')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 分组网络与差异网络：按分类列把数据集分成若干组，分别构建网络，
+# 并对两组之间的系数差异做置换检验
+# 请求体：datasetId、groupColumn，可选algorithm（correlation或partial_correlation）、
+# threshold、features、contrast（做差异检验的两个组，默认排序后的前两个组）、
+# permutations（默认1000，为0时不检验）、alpha（差异边的q值上限，默认0.05）、seed
+@app.route('/api/analyze/groups', methods=['POST'])
+def analyze_groups():
+    try:
+        data = request.get_json(silent=True) or {}
+        dataset = db.get_dataset(data.get('datasetId'))
+        if not dataset:
+            return jsonify({'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}), 404
+        
+        algorithm = data.get('algorithm', 'correlation')
+        methods = {'correlation': 'pearson', 'partial_correlation': 'partial'}
+        if algorithm not in methods:
+            return jsonify({'error': '分组分析只支持correlation和partial_correlation',
+                            'success': False, 'message': '分组分析只支持correlation和partial_correlation'}), 400
+        group_column = data.get('groupColumn')
+        if not group_column:
+            return jsonify({'error': '缺少分组列', 'success': False, 'message': '缺少分组列'}), 400
+        try:
+            threshold = float(data.get('threshold', 0.1))
+            permutations = int(data.get('permutations', 1000))
+            alpha = float(data.get('alpha', 0.05))
+            seed = int(data.get('seed', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': '参数无效', 'success': False, 'message': '参数无效'}), 400
+        if not 0 <= permutations <= MAX_PERMUTATIONS:
+            message = f'置换次数必须在0到{MAX_PERMUTATIONS}之间'
+            return jsonify({'error': message, 'success': False, 'message': message}), 400
+        
+        # 分组列按原始文本读取，数值矩阵不删除任何行，两者逐行对齐
+        try:
+            labels = file_utils.read_column(dataset['path'], os.path.basename(dataset['path']), group_column,
+                                            sheet_name=dataset.get('sheet_name'),
+                                            header_row=dataset.get('header_row') or 0)
+        except ValueError as column_error:
+            return jsonify({'error': str(column_error), 'success': False, 'message': str(column_error)}), 400
+        parsed_data = parse_dataset(dataset, missing='keep')
+        all_feature_names = [str(name) for name in parsed_data['feature_names']]
+        if data.get('features') is not None:
+            feature_names = [str(name) for name in data['features']]
+        else:
+            # 默认使用除分组列以外的全部数值列（整列都不是数值的列不参与）
+            numeric = ~np.isnan(parsed_data['data']).all(axis=0)
+            feature_names = [name for name, is_numeric in zip(all_feature_names, numeric)
+                             if is_numeric and name != str(group_column)]
+        name_index = {name: i for i, name in enumerate(all_feature_names)}
+        unknown = [name for name in feature_names if name not in name_index]
+        if unknown:
+            return jsonify({'error': f'特征不存在: {", ".join(unknown)}', 'success': False,
+                            'message': f'特征不存在: {", ".join(unknown)}'}), 400
+        if len(feature_names) < 2:
+            return jsonify({'error': '至少需要两个特征', 'success': False, 'message': '至少需要两个特征'}), 400
+        data_matrix = parsed_data['data'][:, [name_index[name] for name in feature_names]]
+        
+        # 删除分组标签缺失或特征含缺失值的行
+        complete = ~np.isnan(data_matrix).any(axis=1) & np.array([label is not None for label in labels])
+        data_matrix, labels = data_matrix[complete], labels[complete]
+        
+        group_sizes = OrderedDict((str(label), int(count)) for label, count in
+                                  zip(*np.unique(labels.astype(str), return_counts=True)))
+        if len(group_sizes) < 2:
+            return jsonify({'error': '分组列至少需要两个组', 'success': False, 'message': '分组列至少需要两个组'}), 400
+        if len(group_sizes) > MAX_GROUPS:
+            message = f'分组数超过上限{MAX_GROUPS}'
+            return jsonify({'error': message, 'success': False, 'message': message}), 400
+        small = [label for label, count in group_sizes.items() if count < 3]
+        if small:
+            message = f'每组至少需要3行完整数据: {", ".join(small)}'
+            return jsonify({'error': message, 'success': False, 'message': message}), 400
+        contrast = data.get('contrast')
+        if contrast is not None:
+            contrast = [str(label) for label in contrast]
+            if len(contrast) != 2 or contrast[0] == contrast[1] or any(label not in group_sizes for label in contrast):
+                return jsonify({'error': 'contrast必须是两个不同的已有分组', 'success': False,
+                                'message': 'contrast必须是两个不同的已有分组'}), 400
+        
+        start = time.perf_counter()
+        result = algos.group_networks(data_matrix, labels.astype(str), methods[algorithm], threshold,
+                                      contrast=contrast, n_permutations=permutations, alpha=alpha, seed=seed)
+        metrics.observe('analysis_stage_seconds', time.perf_counter() - start, stage='groups', algorithm=algorithm)
+        
+        return jsonify({'success': True, 'data': {
+            'datasetId': dataset['id'],
+            'algorithm': algorithm,
+            'groupColumn': str(group_column),
+            'featureNames': feature_names,
+            'droppedRows': int((~complete).sum()),
+            'groups': result['groups'],
+            'differential': result['differential']
+        }, 'message': '分组分析完成'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
 # 获取分析结果
 @app.route('/api/result/<int:dataset_id>/<string:algorithm>', methods=['GET'])
 def get_result(dataset_id, algorithm):
     try:
+        try:
+            encoding_options = encoding_utils.options_from_request(request.args, request.headers.get('Accept'))
+        except ValueError as encoding_error:
+            return jsonify({'error': str(encoding_error), 'success': False, 'message': str(encoding_error)}), 400
+        
+        # 先只查询结果id：每次保存结果都会生成新id，可直接作为强ETag
+        meta = db.get_analysis_result_meta(dataset_id, algorithm)
+        if not meta:
+            return jsonify({'error': '分析结果不存在', 'success': False, 'message': '分析结果不存在'}), 404
+        
+        options_key = hashlib.sha1(json.dumps(encoding_options, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        etag = f"result-{meta['id']}-{options_key}"
+        if etag_matches(etag):
+            return not_modified(etag)
+        
         result = db.get_analysis_result(dataset_id, algorithm)
         if not result:
             return jsonify({'error': '分析结果不存在', 'success': False, 'message': '分析结果不存在'}), 404
         
-        return jsonify({
+        result_json = result['result_json']
+        if not encoding_utils.is_default(encoding_options):
+            result_json = encode_network_result(result_json, encoding_options)
+        
+        return with_etag(jsonify({
             'success': True,
-            'data': result['result_json']
-        }), 200
+            'data': result_json
+        }), f"result-{result['id']}-{options_key}"), 200
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 获取分析结果的网络指标（度、强度、聚类系数、介数中心性、社区）
+# 参数：betweenness=auto|exact|sampled|none，samples为近似时抽样的源节点数，
+# communities=false跳过社区检测，seed为随机种子；每个结果和参数组合只计算一次
+@app.route('/api/results/<int:result_id>/metrics', methods=['GET'])
+def get_network_metrics(result_id):
+    try:
+        betweenness = request.args.get('betweenness', 'auto')
+        if betweenness not in ('auto', 'exact', 'sampled', 'none'):
+            return jsonify({'error': '不支持的介数计算方式', 'success': False, 'message': '不支持的介数计算方式'}), 400
+        try:
+            samples = int(request.args.get('samples', app.config['BETWEENNESS_SAMPLES']))
+            seed = int(request.args.get('seed', 0))
+        except ValueError:
+            return jsonify({'error': '参数必须是整数', 'success': False, 'message': '参数必须是整数'}), 400
+        if samples < 1:
+            return jsonify({'error': '抽样数必须大于0', 'success': False, 'message': '抽样数必须大于0'}), 400
+        communities = request.args.get('communities', 'true').lower() not in ('false', '0', 'no')
+        
+        options = json.dumps({'betweenness': betweenness, 'samples': samples, 'seed': seed,
+                              'communities': communities,
+                              'exact_nodes': app.config['EXACT_BETWEENNESS_NODES']}, sort_keys=True)
+        # 结果id每次保存都会变化，结果id和参数即可作为强ETag
+        etag = f"metrics-{result_id}-{hashlib.sha1(options.encode('utf-8')).hexdigest()[:12]}"
+        if etag_matches(etag):
+            return not_modified(etag)
+        
+        network = db.get_network_metrics(result_id, options)
+        metrics.inc('cache_requests_total', cache='network_metrics', result='miss' if network is None else 'hit')
+        if network is None:
+            result = db.get_analysis_result_by_id(result_id)
+            if not result:
+                return jsonify({'error': '分析结果不存在', 'success': False, 'message': '分析结果不存在'}), 404
+            algorithm = result['algorithm'].split(':')[0]
+            with metrics.timer('analysis_stage_seconds', stage='network_metrics',
+                               algorithm=algorithm if algorithm in ALGORITHM_NAMES else 'unknown'):
+                network = algos.network_metrics(result['result_json']['nodes'], result['result_json']['links'],
+                                                directed=algorithm in DIRECTED_ALGORITHMS,
+                                                betweenness=betweenness,
+                                                exact_betweenness_nodes=app.config['EXACT_BETWEENNESS_NODES'],
+                                                betweenness_samples=samples, communities=communities, seed=seed)
+            network['result_id'] = result_id
+            db.save_network_metrics(result_id, options, network)
+        
+        return with_etag(jsonify({'success': True, 'data': network}), etag), 200
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 按数据集和算法获取最新分析结果的网络指标（参数同上）
+@app.route('/api/result/<int:dataset_id>/<string:algorithm>/metrics', methods=['GET'])
+def get_result_network_metrics(dataset_id, algorithm):
+    try:
+        meta = db.get_analysis_result_meta(dataset_id, algorithm)
+        if not meta:
+            return jsonify({'error': '分析结果不存在', 'success': False, 'message': '分析结果不存在'}), 404
+        return get_network_metrics(meta['id'])
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 多个已有分析结果的共识网络（不重新运行任何算法）
+# 参数：resultIds（逗号分隔的结果id）或algorithms（逗号分隔的算法/结果名，取各自的最新结果），
+# 每种算法只能投一票（同一算法的置换检验、特征子集等结果不能同时选入）；
+# 默认使用每种算法在全部特征上的最新结果；minSupport为边至少需要的支持算法数（默认过半数），
+# aggregate为权重聚合方式mean|max|min，includeImage=true时绘制网络图。
+# 按输入结果id的集合和参数缓存，结果重新计算后id变化，自动得到新的共识网络
+@app.route('/api/datasets/<int:dataset_id>/consensus', methods=['GET'])
+def get_consensus_network(dataset_id):
+    try:
+        dataset = db.get_dataset(dataset_id)
+        if not dataset:
+            return jsonify({'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}), 404
+        
+        stored = db.get_analysis_results_meta(dataset_id)
+        if request.args.get('resultIds'):
+            try:
+                result_ids = [int(value) for value in request.args['resultIds'].split(',') if value.strip()]
+            except ValueError:
+                return jsonify({'error': '结果id必须是整数', 'success': False, 'message': '结果id必须是整数'}), 400
+            unknown = sorted(set(result_ids) - {item['id'] for item in stored})
+            if unknown:
+                message = f'分析结果不存在: {", ".join(map(str, unknown))}'
+                return jsonify({'error': message, 'success': False, 'message': message}), 404
+        elif request.args.get('algorithms'):
+            by_algorithm = {item['algorithm']: item['id'] for item in stored}
+            algorithms = [name.strip() for name in request.args['algorithms'].split(',') if name.strip()]
+            unknown = [name for name in algorithms if name not in by_algorithm]
+            if unknown:
+                message = f'分析结果不存在: {", ".join(unknown)}'
+                return jsonify({'error': message, 'success': False, 'message': message}), 404
+            result_ids = [by_algorithm[name] for name in algorithms]
+        else:
+            # 每种算法取全部特征上的最新结果（阈值选边或置换检验），特征子集和特征分类的结果不参与
+            latest = {}
+            for item in stored:
+                parts = item['algorithm'].split(':')
+                if any(part.startswith(('features_', 'classification_')) for part in parts[1:]):
+                    continue
+                if parts[0] not in latest or item['id'] > latest[parts[0]]:
+                    latest[parts[0]] = item['id']
+            result_ids = list(latest.values())
+        result_ids = sorted(set(result_ids))
+        algorithm_of = {item['id']: item['algorithm'].split(':')[0] for item in stored}
+        selected = [algorithm_of[result_id] for result_id in result_ids]
+        repeated = sorted({name for name in selected if selected.count(name) > 1})
+        if repeated:
+            message = f'每种算法只能选择一个结果: {", ".join(repeated)}'
+            return jsonify({'error': message, 'success': False, 'message': message}), 400
+        if len(result_ids) < 2:
+            return jsonify({'error': '至少需要两个分析结果', 'success': False, 'message': '至少需要两个分析结果'}), 400
+        
+        aggregate = request.args.get('aggregate', 'mean')
+        if aggregate not in ('mean', 'max', 'min'):
+            return jsonify({'error': '不支持的聚合方式', 'success': False, 'message': '不支持的聚合方式'}), 400
+        try:
+            min_support = int(request.args.get('minSupport', len(result_ids) // 2 + 1))
+        except ValueError:
+            return jsonify({'error': '参数必须是整数', 'success': False, 'message': '参数必须是整数'}), 400
+        if not 1 <= min_support <= len(result_ids):
+            message = f'minSupport必须在1到{len(result_ids)}之间'
+            return jsonify({'error': message, 'success': False, 'message': message}), 400
+        include_image = request.args.get('includeImage', 'false').lower() in ('1', 'true', 'yes')
+        
+        ids_key = ','.join(map(str, result_ids))
+        options = json.dumps({'min_support': min_support, 'aggregate': aggregate, 'image': include_image},
+                             sort_keys=True)
+        etag = f"consensus-{hashlib.sha1((ids_key + options).encode('utf-8')).hexdigest()[:16]}"
+        if etag_matches(etag):
+            return not_modified(etag)
+        
+        consensus = db.get_consensus(ids_key, options)
+        metrics.inc('cache_requests_total', cache='consensus', result='miss' if consensus is None else 'hit')
+        if consensus is None:
+            networks = db.get_result_networks(result_ids)
+            with metrics.timer('analysis_stage_seconds', stage='consensus', algorithm='consensus'):
+                merged = algos.consensus_network(networks, min_support=min_support, aggregate=aggregate)
+            graph_base64 = None
+            if include_image:
+                graph_base64 = algos._generate_graph(merged['nodes'], merged['links'],
+                                                     [node['name'] for node in merged['nodes']],
+                                                     'Consensus Network')
+            consensus = {
+                'datasetId': dataset_id,
+                'results': [{'id': network['id'], 'algorithm': network['algorithm'],
+                             'edges': len(network['links'])} for network in networks],
+                'minSupport': min_support,
+                'aggregate': aggregate,
+                'network': {'nodes': merged['nodes'], 'links': merged['links']},
+                'supportCounts': merged['support_counts'],
+                'graph_base64': graph_base64
+            }
+            db.save_consensus(dataset_id, ids_key, options, consensus)
+        
+        return with_etag(jsonify({'success': True, 'data': consensus}), etag), 200
     except Exception as e:
         return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
 
@@ -308,13 +1377,45 @@ def get_statistics(dataset_id):
         if not dataset:
             return jsonify({'error': '数据集不存在', 'success': False, 'message': '数据集不存在'}), 404
         
-        # 解析文件内容
-        parsed_data = file_utils.parse_file(dataset['path'], dataset['name'])
+        # 查询参数：approximate=auto|true|false, bins, quantiles（逗号分隔）
+        try:
+            bins = int(request.args.get('bins', 10))
+            quantiles = tuple(float(q) for q in request.args.get('quantiles', '0.25,0.5,0.75').split(',') if q)
+        except ValueError:
+            return jsonify({'error': '统计参数格式错误', 'success': False, 'message': '统计参数格式错误'}), 400
+        if bins < 1 or any(q < 0 or q > 1 for q in quantiles):
+            return jsonify({'error': '统计参数超出范围', 'success': False, 'message': '统计参数超出范围'}), 400
+        approximate = request.args.get('approximate', 'auto').lower()
+        
+        cache_key = (dataset_id, file_utils.dataset_version(dataset['path']), approximate, bins, quantiles)
+        with statistics_cache_lock:
+            cached_statistics = statistics_cache.get(cache_key)
+            if cached_statistics is not None:
+                statistics_cache.move_to_end(cache_key)
+        if cached_statistics is not None:
+            metrics.inc('cache_requests_total', cache='statistics', result='hit')
+            return jsonify({'success': True, 'data': cached_statistics}), 200
+        
+        metrics.inc('cache_requests_total', cache='statistics', result='miss')
+        
+        # 解析文件内容（保留缺失值以统计缺失数）
+        parsed_data = parse_dataset(dataset, missing='pairwise')
         data_matrix = parsed_data['data']
         feature_names = parsed_data['feature_names']
         
+        if approximate == 'auto':
+            use_approximate = data_matrix.shape[0] > APPROXIMATE_STATISTICS_ROWS
+        else:
+            use_approximate = approximate in ('1', 'true', 'yes')
+        
         # 计算统计信息
-        statistics = data_utils.get_feature_statistics(data_matrix, feature_names)
+        statistics = data_utils.get_feature_statistics(data_matrix, feature_names, quantiles=quantiles,
+                                                       bins=bins, approximate=use_approximate)
+        
+        with statistics_cache_lock:
+            statistics_cache[cache_key] = statistics
+            if len(statistics_cache) > STATISTICS_CACHE_SIZE:
+                statistics_cache.popitem(last=False)
         
         return jsonify({
             'success': True,
@@ -376,24 +1477,14 @@ def save_adjacency_matrix():
         if not adjacency_matrix or not feature_names:
             return jsonify({'error': '缺少邻接矩阵数据或特征名称', 'success': False, 'message': '缺少邻接矩阵数据或特征名称'}), 400
         
-        # 创建CSV内容
-        import csv
-        
         # 确保上传目录存在
         ensure_directory_exists(app.config['UPLOAD_FOLDER'])
         
-        # 保存邻接矩阵
+        # 保存邻接矩阵（整体格式化后一次写入）
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], f'{filename}.csv')
         
-        with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            
-            # 写入表头
-            writer.writerow([''] + feature_names)
-            
-            # 写入矩阵数据
-            for i, row in enumerate(adjacency_matrix):
-                writer.writerow([feature_names[i]] + [round(val, 6) for val in row])
+        with open(file_path, 'wb') as f:
+            f.write(artifact_writer.matrix_bytes(np.asarray(adjacency_matrix, dtype=np.float64), feature_names, 'csv'))
         
         return jsonify({
             'success': True,
@@ -409,54 +1500,78 @@ def save_adjacency_matrix():
 def health_check():
     return jsonify({'status': 'healthy'}), 200
 
+# Prometheus监控指标
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# 下载单次分析的cProfile结果（可用pstats或snakeviz查看）
+@app.route('/api/profiles/<path:filename>', methods=['GET'])
+def download_profile(filename):
+    try:
+        return send_from_directory(app.config['PROFILE_FOLDER'], filename, as_attachment=True)
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': '文件不存在'}), 404
+
 # 获取testdata文件夹中的文件列表
 @app.route('/api/testdata/files/<int:dataset_id>', methods=['GET'])
 def get_testdata_files(dataset_id):
     try:
-        testdata_dir = os.path.join(os.path.dirname(__file__), 'testdata')
-        if not os.path.exists(testdata_dir):
-            return jsonify({'success': False, 'message': 'testdata文件夹不存在'}), 404
-        
-        # 获取所有与指定dataset_id相关的文件
-        import glob
+        # 从结果文件目录表按索引查询（最新的在前），可用algorithm参数过滤
+        artifacts = db.get_artifacts(dataset_id, algorithm=request.args.get('algorithm'))
         files = []
-        
-        # 查找邻接矩阵文件
-        adj_files = glob.glob(os.path.join(testdata_dir, f'adj_matrix_{dataset_id}_*.csv'))
-        for file_path in adj_files:
+        for artifact in artifacts:
             files.append({
-                'type': 'adjacency_matrix',
-                'name': os.path.basename(file_path),
-                'path': file_path
-            })
-        
-        # 查找网络图文件
-        png_files = glob.glob(os.path.join(testdata_dir, f'network_{dataset_id}_*.png'))
-        for file_path in png_files:
-            files.append({
-                'type': 'network_graph',
-                'name': os.path.basename(file_path),
-                'path': file_path
+                'id': artifact['id'],
+                'type': artifact['kind'],
+                'name': artifact['filename'],
+                'path': os.path.join(artifact['directory'], artifact['filename']),
+                'algorithm': artifact['algorithm'],
+                'format': artifact['format'],
+                'size': artifact['size_bytes'],
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(artifact['created_at']))
             })
         
         return jsonify({'success': True, 'data': files}), 200
     except Exception as e:
         return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
 
-# 下载testdata文件
+# 下载testdata文件（也可下载保存到自定义目录中的结果文件）
 @app.route('/api/testdata/download/<path:filename>', methods=['GET'])
 def download_testdata_file(filename):
     try:
-        testdata_dir = os.path.join(os.path.dirname(__file__), 'testdata')
-        file_path = os.path.join(testdata_dir, filename)
+        artifact = db.get_artifact_by_filename(filename)
+        if artifact:
+            directory = artifact['directory']
+        else:
+            directory = os.path.join(os.path.dirname(__file__), 'testdata')
         
-        if not os.path.exists(file_path):
+        if not os.path.exists(os.path.join(directory, filename)):
             return jsonify({'success': False, 'message': '文件不存在'}), 404
         
-        return app.send_from_directory(testdata_dir, filename, as_attachment=True)
+        return send_from_directory(directory, filename, as_attachment=True)
+    except Exception as e:
+        return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
+
+# 按保留策略立即清理结果文件（参数keepLast、maxBytes可覆盖默认配置）
+@app.route('/api/artifacts/gc', methods=['POST'])
+def collect_artifacts():
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            keep_last = int(data['keepLast']) if data.get('keepLast') is not None else None
+            max_bytes = int(data['maxBytes']) if data.get('maxBytes') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': '参数必须是整数', 'success': False, 'message': '参数必须是整数'}), 400
+        
+        stats = artifact_writer.collect_garbage(keep_last, max_bytes)
+        return jsonify({'success': True, 'data': stats, 'message': '结果文件清理完成'}), 200
     except Exception as e:
         return jsonify({'error': str(e), 'success': False, 'message': str(e)}), 500
 
 if __name__ == '__main__':
+    # 设置PRELOAD_HEAVY_MODULES=1时启动前预热，第一次分析请求不再承担导入开销
+    if os.environ.get('PRELOAD_HEAVY_MODULES') == '1':
+        preload()
     # 启动Flask应用
     app.run(debug=True, host='0.0.0.0', port=3000)
@@ -0,0 +1,460 @@
+"""命令行批处理：对多个数据集文件运行多个网络算法（不经过Flask服务）
+
+每个(数据集, 算法)组合是一个任务，由最多--jobs个子进程并行执行，每个任务在独立的
+子进程中运行：可以为单个任务设置内存上限（超出时该任务失败，不影响其他任务）和超时。
+同一文件的解析结果缓存在输出目录的.parsed_cache下，多个算法只解析一次。
+
+输出目录中每个数据集一个子目录，内容由--format决定：
+  - csv：邻接矩阵 <算法>_matrix.csv 和边列表 <算法>_edges.csv
+  - npz：邻接矩阵 <算法>_matrix.npz（二进制）和边列表 <算法>_edges.csv
+  - json：节点、边和矩阵写入同一个 <算法>.json
+默认不绘制网络图，需要时加--images（<算法>_network.png）。
+
+完成的任务逐条追加到输出目录的batch_manifest.jsonl。中断后用相同参数重新运行，
+已成功且输出文件仍在的任务会被跳过（--force重新运行全部任务）；数据文件被修改后对应任务重新运行。
+结束时输出吞吐量汇总，有任务失败时退出码为1。
+
+用法:
+    python batch.py ../data/*.csv --algorithms correlation aracne --output-dir ../batch_results
+    python batch.py ../data --recursive --jobs 4 --memory-limit 4G --timeout 1800 --format npz
+    python batch.py nightly/ --algorithms partial_correlation --significance permutation --summary summary.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+import warnings
+from collections import deque
+from multiprocessing.connection import wait
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from algorithms import Algorithms, ALGORITHM_METHODS, PAIRWISE_ALGORITHMS, SIGNIFICANCE_ALGORITHMS, get_result_matrix, \
+    preload as preload_algorithms
+from utils import FileUtils, ArtifactWriter
+
+
+DATA_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+OUTPUT_FORMATS = ('csv', 'npz', 'json')
+MANIFEST_NAME = 'batch_manifest.jsonl'
+
+
+def parse_size(value):
+    """解析内存大小，如 512M、4G、1.5g 或字节数"""
+    units = {'k': 2 ** 10, 'm': 2 ** 20, 'g': 2 ** 30, 't': 2 ** 40}
+    text = str(value).strip().lower().rstrip('b')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def collect_files(inputs, recursive=False):
+    """展开输入的文件、目录和通配符，返回去重后的数据文件列表（保持顺序）"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = sorted(glob.glob(pattern, recursive=recursive))
+        elif os.path.exists(item):
+            candidates = [item]
+        else:
+            candidates = sorted(glob.glob(item, recursive=True))
+        for path in candidates:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in DATA_EXTENSIONS:
+                files.append(os.path.abspath(path))
+    return list(dict.fromkeys(files))
+
+
+def dataset_labels(files):
+    """每个文件的输出子目录名：文件名（去掉扩展名），重名时附加路径哈希"""
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in files]
+    labels = []
+    for path, stem in zip(files, stems):
+        if stems.count(stem) > 1:
+            stem = f"{stem}_{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+        labels.append(stem)
+    return labels
+
+
+def job_key(job):
+    """任务标识：文件路径、文件版本（修改时间和大小）及影响结果的全部参数"""
+    stat = os.stat(job['path'])
+    raw = json.dumps([job['path'], stat.st_mtime_ns, stat.st_size, job['algorithm'],
+                      job['options']], sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def load_manifest(path):
+    """读取清单，返回 任务标识 -> 最后一条记录（忽略中断时写了一半的行）"""
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record['key']] = record
+    return records
+
+
+def append_manifest(path, record):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def is_complete(record):
+    return record is not None and record['status'] == 'ok' and \
+        all(os.path.exists(path) for path in record['outputs'])
+
+
+def write_atomic(path, payload):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def csv_field(value):
+    value = str(value)
+    if any(ch in value for ch in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def edges_csv(links, feature_names):
+    """边列表CSV：source,target,weight,correlation（置换检验时附加p_value,q_value）"""
+    extra = [name for name in ('p_value', 'q_value') if links and name in links[0]]
+    lines = [','.join(['source', 'target', 'weight', 'correlation'] + extra)]
+    for link in links:
+        fields = [csv_field(feature_names[link['source']]), csv_field(feature_names[link['target']]),
+                  '%.6f' % link['value'], '%.6f' % link['correlation']]
+        fields += ['%.6g' % link[name] for name in extra]
+        lines.append(','.join(fields))
+    return ('\r\n'.join(lines) + '\r\n').encode('utf-8-sig')
+
+
+def write_outputs(job, result, feature_names):
+    """按输出格式写入结果文件，返回文件路径列表"""
+    directory = job['directory']
+    os.makedirs(directory, exist_ok=True)
+    algorithm = job['algorithm']
+    fmt = job['options']['format']
+    matrix = get_result_matrix(result)
+    outputs = []
+
+    if fmt == 'json':
+        path = os.path.join(directory, f'{algorithm}.json')
+        payload = {'featureNames': feature_names, 'nodes': result['nodes'], 'links': result['links'],
+                   'matrix': matrix}
+        if 'significance' in result:
+            payload['significance'] = result['significance']
+        write_atomic(path, json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        outputs.append(path)
+    else:
+        writer = ArtifactWriter()
+        path = os.path.join(directory, f'{algorithm}_matrix.{fmt}')
+        write_atomic(path, writer.matrix_bytes(np.asarray(matrix, dtype=np.float64), feature_names, fmt))
+        outputs.append(path)
+        path = os.path.join(directory, f'{algorithm}_edges.csv')
+        write_atomic(path, edges_csv(result['links'], feature_names))
+        outputs.append(path)
+
+    if result.get('graph_base64'):
+        import base64
+        path = os.path.join(directory, f'{algorithm}_network.png')
+        write_atomic(path, base64.b64decode(result['graph_base64'].split(',')[-1]))
+        outputs.append(path)
+    return outputs
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+def is_memory_error(error):
+    """异常本身或其引发链中有MemoryError（如解析文件时的内存错误会被包装成普通异常）"""
+    while error is not None:
+        if isinstance(error, MemoryError):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def run_job(job):
+    """在当前进程中执行一个任务，返回结果记录（不抛出异常）"""
+    options = job['options']
+    record = {'key': job['key'], 'path': job['path'], 'algorithm': job['algorithm'], 'outputs': []}
+    start = time.perf_counter()
+    try:
+        file_utils = FileUtils(mmap_cache=True)
+        file_utils.UPLOAD_FOLDER = job['cache_dir']
+        missing = options['missing']
+        if missing == 'pairwise' and (job['algorithm'] not in PAIRWISE_ALGORITHMS or options['significance']):
+            missing = 'listwise'
+        parsed = file_utils.parse_file(job['path'], os.path.basename(job['path']), missing=missing,
+                                       dtype=options['precision'])
+        parse_seconds = time.perf_counter() - start
+
+        kwargs = {}
+        if options['significance']:
+            kwargs = {'significance': options['significance'], 'permutations': options['permutations'],
+                      'alpha': options['alpha'], 'seed': options['seed'], 'n_jobs': 1}
+        algos = Algorithms(render_graphs=options['images'])
+        feature_names = [str(name) for name in parsed['feature_names']]
+        method = getattr(algos, ALGORITHM_METHODS[job['algorithm']])
+        result = method(parsed['data'], feature_names, **kwargs)
+        compute_seconds = time.perf_counter() - start - parse_seconds
+
+        record['outputs'] = write_outputs(job, result, feature_names)
+        record.update({
+            'status': 'ok',
+            'rows': parsed['num_samples'],
+            'features': parsed['num_features'],
+            'edges': len(result['links']),
+            'parse_seconds': parse_seconds,
+            'compute_seconds': compute_seconds
+        })
+    except Exception as e:
+        if is_memory_error(e):
+            record.update({'status': 'failed', 'error': f"内存不足（上限 {options['memory_limit']} 字节）"})
+        else:
+            record.update({'status': 'failed', 'error': str(e) or type(e).__name__,
+                           'traceback': traceback.format_exc(limit=5)})
+    record['seconds'] = time.perf_counter() - start
+    record['peak_rss_mb'] = peak_rss_mb()
+    return record
+
+
+def job_process(job, conn, blas_threads):
+    """子进程入口：设置内存上限和BLAS线程数后执行任务，通过管道返回结果记录"""
+    memory_limit = job['options']['memory_limit']
+    if memory_limit:
+        try:
+            import resource
+            # 限制虚拟地址空间：超出时分配失败抛出MemoryError，而不是拖垮整台机器
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+        except (ImportError, ValueError, OSError) as e:
+            print(f"无法设置内存上限: {str(e)}", file=sys.stderr)
+    if blas_threads:
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(blas_threads)
+        except ImportError:
+            pass
+    # 绘图和算法库的提示性警告对批处理没有意义，失败原因记录在清单中
+    warnings.simplefilter('ignore')
+    conn.send(run_job(job))
+    conn.close()
+
+
+def run_jobs(jobs, n_jobs, timeout=None, on_done=None):
+    """最多n_jobs个子进程并行执行任务，每个任务一个进程
+
+    子进程异常退出（如被系统因内存不足终止）或超时被终止时，任务记为失败。
+    """
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    # 多个任务并行时每个进程只用一部分CPU做BLAS计算，避免超额占用
+    blas_threads = max(1, (os.cpu_count() or 1) // n_jobs) if n_jobs > 1 else None
+    pending = deque(jobs)
+    running = {}
+    records = []
+    try:
+        while pending or running:
+            while pending and len(running) < n_jobs:
+                job = pending.popleft()
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=job_process, args=(job, sender, blas_threads), daemon=True)
+                process.start()
+                sender.close()
+                running[process.sentinel] = (process, receiver, job, time.monotonic())
+
+            wait(list(running), timeout=1.0)
+            for sentinel in list(running):
+                process, receiver, job, started = running[sentinel]
+                record = None
+                if process.exitcode is None:
+                    if timeout is None or time.monotonic() - started < timeout:
+                        continue
+                    process.kill()
+                    process.join()
+                    record = {'status': 'failed', 'error': f'超时（{timeout}秒）'}
+                else:
+                    process.join()
+                    if receiver.poll():
+                        try:
+                            record = receiver.recv()
+                        except EOFError:
+                            record = None
+                    if record is None:
+                        record = {'status': 'failed', 'error': f'子进程异常退出（退出码{process.exitcode}）'}
+                receiver.close()
+                del running[sentinel]
+                record = dict({'key': job['key'], 'path': job['path'], 'algorithm': job['algorithm'],
+                               'outputs': [], 'seconds': time.monotonic() - started}, **record)
+                records.append(record)
+                if on_done is not None:
+                    on_done(record)
+    finally:
+        # 中断（如Ctrl-C）时结束仍在运行的任务，已完成的任务已记录在清单中
+        for process, receiver, _, _ in running.values():
+            process.kill()
+            process.join()
+            receiver.close()
+    return records
+
+
+def summarize(records, skipped, wall_seconds):
+    """汇总吞吐量：任务数、每秒处理的行数和任务数、各算法的耗时和内存"""
+    done = [record for record in records if record['status'] == 'ok']
+    rows = sum(record['rows'] for record in done)
+    summary = {
+        'jobs': len(records) + skipped,
+        'succeeded': len(done),
+        'failed': len(records) - len(done),
+        'skipped': skipped,
+        'wall_seconds': wall_seconds,
+        'jobs_per_minute': len(records) / wall_seconds * 60 if wall_seconds > 0 else 0.0,
+        'rows': rows,
+        'rows_per_second': rows / wall_seconds if wall_seconds > 0 else 0.0,
+        'algorithms': {}
+    }
+    for algorithm in dict.fromkeys(record['algorithm'] for record in records):
+        group = [record for record in records if record['algorithm'] == algorithm]
+        ok = [record for record in group if record['status'] == 'ok']
+        seconds = [record['seconds'] for record in ok]
+        peaks = [record['peak_rss_mb'] for record in group if record.get('peak_rss_mb') is not None]
+        summary['algorithms'][algorithm] = {
+            'jobs': len(group),
+            'failed': len(group) - len(ok),
+            'seconds_median': float(np.median(seconds)) if seconds else None,
+            'seconds_max': max(seconds) if seconds else None,
+            'seconds_total': sum(seconds),
+            'peak_rss_mb_max': max(peaks) if peaks else None
+        }
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n{'algorithm':<22}{'jobs':>6}{'failed':>8}{'median s':>11}{'max s':>10}{'peak MB':>10}")
+    for algorithm, item in summary['algorithms'].items():
+        median, longest, peak = (f'{value:.2f}' if value is not None else '-' for value in
+                                 (item['seconds_median'], item['seconds_max'], item['peak_rss_mb_max']))
+        print(f"{algorithm:<22}{item['jobs']:>6}{item['failed']:>8}{median:>11}{longest:>10}{peak:>10}")
+    print(f"\n{summary['succeeded']} succeeded, {summary['failed']} failed, {summary['skipped']} skipped (already done)"
+          f" in {summary['wall_seconds']:.1f}s: {summary['jobs_per_minute']:.1f} jobs/min,"
+          f" {summary['rows_per_second']:.0f} rows/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='对多个数据集批量运行网络算法')
+    parser.add_argument('inputs', nargs='+', help='数据文件、目录或通配符（csv/xlsx/xls）')
+    parser.add_argument('--algorithms', '-a', nargs='+', default=['correlation'], choices=list(ALGORITHM_METHODS))
+    parser.add_argument('--output-dir', '-o', default='batch_results', help='输出目录')
+    parser.add_argument('--format', default='csv', choices=OUTPUT_FORMATS, help='结果文件格式')
+    parser.add_argument('--images', action='store_true', help='同时绘制并保存网络图')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='并行任务数')
+    parser.add_argument('--memory-limit', type=parse_size, help='单个任务的内存上限（虚拟地址空间），如 4G')
+    parser.add_argument('--timeout', type=float, help='单个任务的超时秒数')
+    parser.add_argument('--recursive', action='store_true', help='递归查找目录中的数据文件')
+    parser.add_argument('--missing', default='listwise', choices=['listwise', 'pairwise'], help='缺失值处理方式')
+    parser.add_argument('--precision', default='float64', choices=['float64', 'float32'], help='计算精度')
+    parser.add_argument('--significance', choices=['permutation'],
+                        help='用置换检验选边（只用于correlation和partial_correlation）')
+    parser.add_argument('--permutations', type=int, default=10000)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--force', action='store_true', help='忽略清单，重新运行全部任务')
+    parser.add_argument('--summary', help='将吞吐量汇总写入JSON文件')
+    args = parser.parse_args(argv)
+
+    if args.significance and set(args.algorithms) - SIGNIFICANCE_ALGORITHMS:
+        parser.error('置换检验只支持correlation和partial_correlation')
+    if args.jobs < 1:
+        parser.error('--jobs 必须大于0')
+
+    files = collect_files(args.inputs, args.recursive)
+    if not files:
+        parser.error('没有找到数据文件')
+
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {} if args.force else load_manifest(manifest_path)
+
+    options = {
+        'format': args.format,
+        'images': args.images,
+        'missing': args.missing,
+        'precision': args.precision,
+        'significance': args.significance,
+        'permutations': args.permutations,
+        'alpha': args.alpha,
+        'seed': args.seed,
+        'memory_limit': args.memory_limit
+    }
+    result_options = {name: value for name, value in options.items() if name != 'memory_limit'}
+    jobs = []
+    skipped = 0
+    for path, label in zip(files, dataset_labels(files)):
+        for algorithm in args.algorithms:
+            job = {'path': path, 'algorithm': algorithm, 'options': options,
+                   'directory': os.path.join(output_dir, label), 'cache_dir': output_dir}
+            job['key'] = job_key(dict(job, options=result_options))
+            if is_complete(manifest.get(job['key'])):
+                skipped += 1
+                continue
+            jobs.append(job)
+
+    print(f"{len(files)} file(s) x {len(args.algorithms)} algorithm(s): {len(jobs)} job(s) to run, "
+          f"{skipped} already done, {min(args.jobs, max(len(jobs), 1))} parallel")
+    finished = [0]
+
+    def on_done(record):
+        finished[0] += 1
+        append_manifest(manifest_path, dict(record, finished_at=time.strftime('%Y-%m-%dT%H:%M:%S')))
+        detail = f"{record.get('rows', 0)}x{record.get('features', 0)} {record.get('edges', 0)} edges" \
+            if record['status'] == 'ok' else record['error']
+        peak = record.get('peak_rss_mb')
+        print(f"[{finished[0]}/{len(jobs)}] {record['status']:<6} {os.path.basename(record['path'])} "
+              f"{record['algorithm']} {record['seconds']:.2f}s"
+              f"{f' {peak:.0f}MB' if peak is not None else ''} {detail}", flush=True)
+
+    start = time.perf_counter()
+    if jobs:
+        # 在fork子进程之前导入算法用到的重量级库，各任务进程不必重复导入（约2秒）
+        preload_algorithms()
+    try:
+        records = run_jobs(jobs, min(args.jobs, max(len(jobs), 1)), args.timeout, on_done)
+    except KeyboardInterrupt:
+        print('\n已中断，重新运行相同命令将跳过已完成的任务', file=sys.stderr)
+        return 130
+    summary = summarize(records, skipped, time.perf_counter() - start)
+    print_summary(summary)
+
+    if args.summary:
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""网络结果响应编码基准
+
+对不同规模的网络结果比较各种编码选项（旧版JSON、舍入、按列存放的边、
+float32/npy二进制矩阵、省略矩阵）以及gzip/deflate压缩的序列化耗时和响应大小。
+
+用法:
+    python benchmarks/bench_encoding.py --features 200 1000 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import EncodingUtils
+
+
+CASES = [
+    ('legacy json', {}),
+    ('json round=4', {'round': 4}),
+    ('compact f32le', {'encoding': 'compact'}),
+    ('compact npy', {'encoding': 'compact', 'matrixFormat': 'npy'}),
+    ('compact round=4 no matrix', {'encoding': 'compact', 'matrixFormat': 'none', 'round': 4}),
+]
+
+
+def make_result(features, rows=200, seed=0):
+    """生成与correlation_algorithm输出结构相同的结果"""
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((rows, features))
+    corr_matrix = np.corrcoef(data, rowvar=False)
+    rows_idx, cols_idx = np.nonzero(np.triu(np.abs(corr_matrix) > 0.1, k=1))
+    values = corr_matrix[rows_idx, cols_idx].tolist()
+    links = [{'source': i, 'target': j, 'value': abs(v), 'correlation': v}
+             for i, j, v in zip(rows_idx.tolist(), cols_idx.tolist(), values)]
+    nodes = [{'id': i, 'name': f'F{i}', 'group': 1} for i in range(features)]
+    return {'nodes': nodes, 'links': links, 'correlation_matrix': corr_matrix.tolist()}
+
+
+def run_case(encoder, result, params):
+    """编码并序列化一次，返回(耗时, 字节串)"""
+    options = encoder.options_from_request(params)
+    start = time.perf_counter()
+    payload = {
+        'network': {
+            'nodes': encoder.encode_nodes(result['nodes'], options),
+            'links': encoder.encode_links(result['links'], options)
+        },
+        'correlationMatrix': encoder.encode_matrix(result['correlation_matrix'], options)
+    }
+    body = json.dumps(payload).encode('utf-8')
+    return time.perf_counter() - start, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='网络结果响应编码基准测试')
+    parser.add_argument('--features', type=int, nargs='+', default=[200, 1000, 2000])
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    args = parser.parse_args()
+    
+    encoder = EncodingUtils()
+    records = []
+    print(f"{'p':>6} {'links':>9}  {'case':<28}{'encode s':>10}{'raw MB':>10}"
+          f"{'gzip s':>9}{'gzip MB':>10}{'deflate s':>11}{'deflate MB':>12}")
+    for features in args.features:
+        result = make_result(features)
+        for name, params in CASES:
+            seconds, body = run_case(encoder, result, params)
+            record = {'features': features, 'links': len(result['links']), 'case': name,
+                      'encode_seconds': seconds, 'raw_bytes': len(body)}
+            for content_encoding in ('gzip', 'deflate'):
+                start = time.perf_counter()
+                compressed = encoder.compress(body, content_encoding)
+                record[f'{content_encoding}_seconds'] = time.perf_counter() - start
+                record[f'{content_encoding}_bytes'] = len(compressed)
+            records.append(record)
+            print(f"{features:>6} {len(result['links']):>9}  {name:<28}{seconds:>10.3f}"
+                  f"{len(body) / 2**20:>10.2f}{record['gzip_seconds']:>9.3f}{record['gzip_bytes'] / 2**20:>10.2f}"
+                  f"{record['deflate_seconds']:>11.3f}{record['deflate_bytes'] / 2**20:>12.2f}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
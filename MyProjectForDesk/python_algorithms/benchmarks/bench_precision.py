@@ -0,0 +1,141 @@
+"""float32 / float64 计算精度对比基准
+
+对相关系数类算法的完整路径（文件解析 -> 相关矩阵 -> 边提取 -> JSON序列化）
+分别以两种精度运行，报告各阶段耗时、吞吐量、峰值内存以及相对float64的最大误差。
+每个用例在独立子进程中运行，保证峰值内存互不干扰。
+
+用法:
+    python benchmarks/bench_precision.py --rows 100000 --features 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from algorithms import Algorithms
+from utils import FileUtils
+
+
+def _peak_rss_bytes():
+    """当前进程的峰值RSS（不支持resource模块的平台返回None）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def make_dataset(path, rows, features, seed=0):
+    """生成带相关结构的合成数据并写入CSV"""
+    rng = np.random.default_rng(seed)
+    latent = rng.standard_normal((rows, max(1, features // 10)))
+    loadings = rng.standard_normal((latent.shape[1], features))
+    data = latent @ loadings + rng.standard_normal((rows, features))
+    pd.DataFrame(data, columns=[f'F{i}' for i in range(features)]).to_csv(path, index=False)
+
+
+def run_case(path, precision, method):
+    """在当前进程中运行一个用例并返回测量结果"""
+    algos = Algorithms()
+    file_utils = FileUtils()
+    rss_before = _peak_rss_bytes()
+    tracemalloc.start()
+    timings = {}
+    
+    start = time.perf_counter()
+    parsed = file_utils.parse_file(path, os.path.basename(path), dtype=precision)
+    timings['parse'] = time.perf_counter() - start
+    data = parsed['data']
+    
+    start = time.perf_counter()
+    corr_matrix = algos._correlation_matrix(data, method)
+    timings['compute'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    links = algos._threshold_links(corr_matrix, 0.1)
+    timings['edges'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    payload = json.dumps({'links': links, 'correlation_matrix': algos._matrix_to_list(corr_matrix)})
+    timings['serialize'] = time.perf_counter() - start
+    
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = _peak_rss_bytes()
+    
+    np.save(path + f'.{precision}.npy', corr_matrix.astype(np.float64))
+    return {
+        'precision': precision,
+        'method': method,
+        'rows': int(data.shape[0]),
+        'features': int(data.shape[1]),
+        'timings': timings,
+        'total_seconds': sum(timings.values()),
+        'rows_per_second': data.shape[0] / sum(timings.values()),
+        'traced_peak_bytes': traced_peak,
+        'peak_rss_delta_bytes': (rss_after - rss_before) if rss_before is not None else None,
+        'payload_bytes': len(payload),
+        'num_links': len(links)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='float32/float64 精度模式基准测试')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--features', type=int, default=200)
+    parser.add_argument('--method', default='pearson', choices=['pearson', 'spearman'])
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    parser.add_argument('--case', nargs=2, metavar=('PATH', 'PRECISION'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.case:
+        # 子进程模式：运行单个用例并把结果输出到stdout
+        print(json.dumps(run_case(args.case[0], args.case[1], args.method)))
+        return
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.csv')
+        make_dataset(path, args.rows, args.features)
+        
+        results = {}
+        for precision in ('float64', 'float32'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--method', args.method, '--case', path, precision],
+                check=True, capture_output=True, text=True).stdout
+            results[precision] = json.loads(output.strip().splitlines()[-1])
+        
+        reference = np.load(path + '.float64.npy')
+        approx = np.load(path + '.float32.npy')
+        results['float32']['max_abs_error'] = float(np.nanmax(np.abs(reference - approx)))
+    
+    print(f"rows={args.rows} features={args.features} method={args.method}")
+    print(f"{'precision':<10}{'parse':>9}{'compute':>9}{'edges':>9}{'json':>9}{'rows/s':>12}"
+          f"{'traced MB':>11}{'RSS MB':>9}{'payload MB':>12}")
+    for precision in ('float64', 'float32'):
+        r = results[precision]
+        t = r['timings']
+        rss = r['peak_rss_delta_bytes']
+        print(f"{precision:<10}{t['parse']:>9.3f}{t['compute']:>9.3f}{t['edges']:>9.3f}{t['serialize']:>9.3f}"
+              f"{r['rows_per_second']:>12.0f}{r['traced_peak_bytes'] / 2**20:>11.1f}"
+              f"{(rss / 2**20 if rss is not None else float('nan')):>9.1f}{r['payload_bytes'] / 2**20:>12.2f}")
+    print(f"float32 max |r32 - r64| = {results['float32']['max_abs_error']:.2e}, "
+          f"links float64={results['float64']['num_links']} float32={results['float32']['num_links']}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
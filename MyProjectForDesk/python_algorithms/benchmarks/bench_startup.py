@@ -0,0 +1,144 @@
+"""服务启动耗时基准
+
+每个用例在全新的Python子进程中运行（模块缓存为空），测量：
+  - import app：导入Flask应用本身的耗时（重量级库延迟到首次使用时导入）
+  - preload：调用app.preload()预热的耗时
+  - 首次分析请求：未预热 / 已预热两种情况下第一次/api/analyze的耗时
+并用 -X importtime 列出导入开销最大的模块。给定--baseline时比较，
+超过(1 + tolerance)倍视为回退，以退出码1结束。
+
+用法:
+    python benchmarks/bench_startup.py --repeat 5 --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --tolerance 0.3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 在子进程中执行的代码，最后一行输出JSON格式的各阶段耗时
+CASE_SCRIPT = '''
+import io, json, os, sys, tempfile, time
+start = time.perf_counter()
+import app as appmod
+timings = {'import_app': time.perf_counter() - start}
+if PRELOAD:
+    start = time.perf_counter()
+    appmod.preload()
+    timings['preload'] = time.perf_counter() - start
+if ANALYZE:
+    from db import Database
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    appmod.db = Database(os.path.join(workdir, 'database.db'))
+    appmod.artifact_writer.catalog = appmod.db
+    appmod.file_utils.UPLOAD_FOLDER = workdir
+    path = os.path.join(workdir, 'startup.csv')
+    with open(path, 'w') as f:
+        f.write('a,b,c\\n' + '\\n'.join(f'{i},{i * i % 7},{i % 5}' for i in range(200)))
+    dataset_id = appmod.db.save_dataset('startup.csv', path)
+    client = appmod.app.test_client()
+    start = time.perf_counter()
+    response = client.post('/api/analyze', json={'datasetId': dataset_id, 'algorithm': 'correlation',
+                                                 'savePath': workdir})
+    timings['first_analyze'] = time.perf_counter() - start
+    assert response.status_code == 200, response.get_data(as_text=True)
+    appmod.artifact_writer.flush(10)
+print(json.dumps(timings))
+'''
+
+CASES = [
+    ('import app', {'PRELOAD': False, 'ANALYZE': False}),
+    ('import app + preload', {'PRELOAD': True, 'ANALYZE': False}),
+    ('first analyze (cold)', {'PRELOAD': False, 'ANALYZE': True}),
+    ('first analyze (preloaded)', {'PRELOAD': True, 'ANALYZE': True}),
+]
+
+
+def run_case(flags, extra_args=()):
+    script = ''.join(f'{name} = {value}\n' for name, value in flags.items()) + CASE_SCRIPT
+    completed = subprocess.run([sys.executable, *extra_args, '-c', script], cwd=APP_DIR,
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def import_profile(top=15):
+    """用 -X importtime 统计app直接导入的模块中累计耗时最多的几个"""
+    _, stderr = run_case({'PRELOAD': False, 'ANALYZE': False}, ['-X', 'importtime'])
+    modules = []
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # 输出按后序排列：子模块在父模块之前，缩进每层两个空格
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append({'module': name.strip(), 'cumulative_ms': int(cumulative) / 1000})
+        elif depth == 0:
+            if name.strip() == 'app':
+                modules = children
+            children = []
+    modules.sort(key=lambda item: item['cumulative_ms'], reverse=True)
+    return modules[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='服务启动耗时基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每个用例的子进程次数')
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    parser.add_argument('--baseline', help='与基线文件比较')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='允许的相对回退幅度')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'case':<30}{'stage':<16}{'median s':>10}{'min s':>10}")
+    for name, flags in CASES:
+        samples = {}
+        for _ in range(args.repeat):
+            timings, _ = run_case(flags)
+            for stage, seconds in timings.items():
+                samples.setdefault(stage, []).append(seconds)
+        for stage, values in samples.items():
+            record = {'case': name, 'stage': stage, 'seconds_median': float(np.median(values)),
+                      'seconds_min': float(min(values)), 'repeat': args.repeat}
+            results.append(record)
+            print(f"{name:<30}{stage:<16}{record['seconds_median']:>10.3f}{record['seconds_min']:>10.3f}")
+
+    modules = import_profile()
+    print(f"\n{'top-level import':<30}{'cumulative ms':>14}")
+    for item in modules:
+        print(f"{item['module']:<30}{item['cumulative_ms']:>14.1f}")
+
+    output = {'python': sys.version.split()[0], 'results': results, 'imports': modules}
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = {(r['case'], r['stage']): r for r in json.load(f)['results']}
+        regressions = []
+        print(f"\n{'case':<30}{'stage':<16}{'ratio':>8}")
+        for record in results:
+            base = baseline.get((record['case'], record['stage']))
+            if base is None:
+                continue
+            ratio = record['seconds_median'] / max(base['seconds_median'], 1e-9)
+            flag = ratio > 1 + args.tolerance and record['seconds_median'] - base['seconds_median'] > 0.02
+            print(f"{record['case']:<30}{record['stage']:<16}{ratio:>8.2f}  {'REGRESSION' if flag else ''}")
+            if flag:
+                regressions.append({'case': record['case'], 'stage': record['stage'], 'ratio': ratio})
+        output['regressions'] = regressions
+        exit_code = 1 if regressions else 0
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
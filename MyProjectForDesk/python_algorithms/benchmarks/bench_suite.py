@@ -0,0 +1,300 @@
+"""算法与API接口的基准测试套件
+
+用带已知网络结构的合成数据（见synthetic.py），在一组规模(样本数x特征数)上：
+  1. 直接调用Algorithms的每个网络算法；
+  2. 通过Flask测试客户端调用主要接口（上传、特征、统计、分析、读取结果、共识网络；
+     接口测试的数据集最后一个特征为常数，覆盖结果含NaN的情况）；
+记录耗时（多次运行取中位数和最小值）、峰值内存（tracemalloc，单独一次运行）
+以及算法输出相对真实图的边恢复情况，结果写入JSON。
+
+给定--baseline时与之前保存的结果逐项比较，耗时或峰值内存超过
+(1 + tolerance)倍视为性能回退，以退出码1结束，可直接用于CI。
+
+默认不绘制网络图（绘图耗时与数据规模关系不大且会掩盖算法本身的变化），
+需要时加--render。接口测试使用临时目录中的数据库和上传目录，不影响本地数据。
+
+用法:
+    python benchmarks/bench_suite.py --grid 500x20 2000x50 --output results.json
+    python benchmarks/bench_suite.py --save-baseline baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from algorithms import Algorithms, ALGORITHM_METHODS
+from synthetic import make_dataset, write_csv, edge_recovery
+
+
+# 用于接口测试的算法（其余算法的接口开销与之相同）
+ENDPOINT_ALGORITHMS = ('correlation', 'partial_correlation', 'aracne')
+
+
+def parse_grid(values):
+    """解析"样本数x特征数"形式的规模列表"""
+    grid = []
+    for value in values:
+        n_samples, n_features = value.lower().split('x')
+        grid.append((int(n_samples), int(n_features)))
+    return grid
+
+
+def measure(fn, repeat=3, setup=None):
+    """运行repeat次计时，再单独运行一次记录tracemalloc峰值（避免跟踪开销影响计时）"""
+    seconds = []
+    output = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        output = fn()
+        seconds.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return output, {
+        'seconds_median': float(np.median(seconds)),
+        'seconds_min': float(min(seconds)),
+        'peak_mb': peak / 2 ** 20,
+        'repeat': repeat
+    }
+
+
+def bench_algorithms(algorithms, grid, args):
+    """直接调用各算法方法"""
+    algos = Algorithms()
+    records = []
+    for n_samples, n_features in grid:
+        data, feature_names, adjacency = make_dataset(n_samples, n_features, args.sparsity, seed=args.seed)
+        for name in algorithms:
+            method = getattr(algos, ALGORITHM_METHODS[name])
+            result, timing = measure(lambda: method(data, feature_names), args.repeat)
+            record = {'kind': 'algorithm', 'name': name, 'n_samples': n_samples, 'n_features': n_features,
+                      'edges': len(result['links']), **timing,
+                      'recovery': edge_recovery(result['links'], adjacency)}
+            records.append(record)
+            print_record(record)
+    return records
+
+
+def bench_endpoints(grid, args):
+    """通过Flask测试客户端调用主要接口"""
+    import app as appmod
+    from db import Database
+
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    # 使用临时的数据库、上传目录和结果目录
+    appmod.db = Database(os.path.join(workdir, 'database.db'))
+    appmod.artifact_writer.catalog = appmod.db
+    appmod.file_utils.UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+    appmod.app.config['UPLOAD_FOLDER'] = appmod.file_utils.UPLOAD_FOLDER
+    os.makedirs(appmod.file_utils.UPLOAD_FOLDER)
+    save_path = os.path.join(workdir, 'results')
+    client = appmod.app.test_client()
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.status_code}: {response.get_data(as_text=True)[:500]}')
+        return response
+
+    def clear_caches():
+        appmod.statistics_cache.clear()
+        appmod.association_cache.clear()
+
+    records = []
+    try:
+        for n_samples, n_features in grid:
+            data, feature_names, _ = make_dataset(n_samples, n_features, args.sparsity, seed=args.seed)
+            # 最后一个特征取常数：其相关系数为NaN，覆盖结果中含非有限值时的保存、读取和共识网络
+            data[:, -1] = 1.0
+            buffer = io.StringIO()
+            write_csv(buffer, data, feature_names)
+            csv_bytes = buffer.getvalue().encode('utf-8')
+            uploaded = []
+
+            def upload():
+                # 每次使用不同的文件名，避免覆盖之前上传的文件
+                filename = f'bench_{n_samples}x{n_features}_{len(uploaded)}.csv'
+                response = check(client.post('/api/datasets/upload',
+                                             data={'dataFile': (io.BytesIO(csv_bytes), filename)},
+                                             content_type='multipart/form-data'))
+                uploaded.append(response.json['data']['id'])
+
+            cases = [('POST /api/datasets/upload', upload, None)]
+            results = []
+            for name, fn, setup in cases:
+                _, timing = measure(fn, args.repeat, setup)
+                results.append((name, timing))
+            dataset_id = uploaded.pop()
+            for extra_id in uploaded:
+                check(client.delete(f'/api/datasets/{extra_id}'))
+
+            cases = [
+                ('GET /api/datasets/<id>/features',
+                 lambda: check(client.get(f'/api/datasets/{dataset_id}/features')), None),
+                ('GET /api/datasets/<id>/statistics',
+                 lambda: check(client.get(f'/api/datasets/{dataset_id}/statistics')), clear_caches),
+            ]
+            for algorithm in ENDPOINT_ALGORITHMS:
+                body = {'datasetId': dataset_id, 'algorithm': algorithm, 'savePath': save_path}
+                cases.append((f'POST /api/analyze [{algorithm}]',
+                              lambda body=body: check(client.post('/api/analyze', json=body)), clear_caches))
+            cases.append(('GET /api/result/<id>/<algorithm>',
+                          lambda: check(client.get(f'/api/result/{dataset_id}/correlation')), None))
+            # 每次请求不同的minSupport，避免命中共识网络缓存
+            support = iter(range(10 ** 6))
+            cases.append(('GET /api/datasets/<id>/consensus',
+                          lambda: check(client.get(f'/api/datasets/{dataset_id}/consensus'
+                                                   f'?minSupport={next(support) % len(ENDPOINT_ALGORITHMS) + 1}')),
+                          None))
+            for name, fn, setup in cases:
+                _, timing = measure(fn, args.repeat, setup)
+                results.append((name, timing))
+
+            check(client.delete(f'/api/datasets/{dataset_id}'))
+            for name, timing in results:
+                record = {'kind': 'endpoint', 'name': name, 'n_samples': n_samples,
+                          'n_features': n_features, **timing}
+                records.append(record)
+                print_record(record)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return records
+
+
+def print_record(record):
+    recovery = record.get('recovery')
+    f1 = f"{recovery['f1']:>6.2f}" if recovery else f"{'':>6}"
+    print(f"{record['kind']:<10}{record['name']:<42}{record['n_samples']:>8}{record['n_features']:>6}"
+          f"{record['seconds_median']:>11.4f}{record['seconds_min']:>11.4f}{record['peak_mb']:>10.1f}{f1}")
+
+
+def record_key(record):
+    return (record['kind'], record['name'], record['n_samples'], record['n_features'])
+
+
+def compare(records, baseline, tolerance, min_seconds=0.005, min_mb=1.0):
+    """与基线逐项比较，返回回退项列表
+
+    绝对差很小（耗时不足min_seconds、内存不足min_mb）的变化视为噪声。
+    """
+    base_index = {record_key(record): record for record in baseline['results']}
+    regressions = []
+    print(f"\n{'benchmark':<52}{'n x p':>14}{'time ratio':>12}{'mem ratio':>11}")
+    for record in records:
+        base = base_index.get(record_key(record))
+        if base is None:
+            continue
+        time_ratio = record['seconds_median'] / max(base['seconds_median'], 1e-9)
+        mem_ratio = record['peak_mb'] / max(base['peak_mb'], 1e-9)
+        flags = []
+        if (time_ratio > 1 + tolerance
+                and record['seconds_median'] - base['seconds_median'] > min_seconds):
+            flags.append('time')
+        if mem_ratio > 1 + tolerance and record['peak_mb'] - base['peak_mb'] > min_mb:
+            flags.append('memory')
+        size = f"{record['n_samples']}x{record['n_features']}"
+        print(f"{record['kind'] + ' ' + record['name']:<52}{size:>14}{time_ratio:>12.2f}{mem_ratio:>11.2f}"
+              f"  {'REGRESSION: ' + ', '.join(flags) if flags else ''}")
+        if flags:
+            regressions.append({'key': list(record_key(record)), 'time_ratio': time_ratio,
+                                'memory_ratio': mem_ratio, 'flags': flags})
+    return regressions
+
+
+def environment_info():
+    import scipy
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='算法与API接口基准测试')
+    parser.add_argument('--grid', nargs='+', default=['500x20', '2000x50'],
+                        help='规模列表，格式为 样本数x特征数')
+    parser.add_argument('--algorithms', nargs='+', default=list(ALGORITHM_METHODS),
+                        choices=list(ALGORITHM_METHODS))
+    parser.add_argument('--sparsity', type=float, default=0.05, help='真实图的边密度')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='每项计时的运行次数')
+    parser.add_argument('--skip-algorithms', action='store_true', help='只测试接口')
+    parser.add_argument('--skip-endpoints', action='store_true', help='只测试算法')
+    parser.add_argument('--render', action='store_true', help='同时计入网络图绘制耗时')
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    parser.add_argument('--save-baseline', help='将结果保存为基线文件')
+    parser.add_argument('--baseline', help='与基线文件比较')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允许的相对回退幅度')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    if not args.render:
+        Algorithms._generate_graph = lambda self, *a, **k: None
+
+    grid = parse_grid(args.grid)
+    print(f"{'kind':<10}{'name':<42}{'n':>8}{'p':>6}{'median s':>11}{'min s':>11}{'peak MB':>10}{'F1':>6}")
+    records = []
+    if not args.skip_algorithms:
+        records += bench_algorithms(args.algorithms, grid, args)
+    if not args.skip_endpoints:
+        records += bench_endpoints(grid, args)
+
+    output = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'grid': args.grid,
+            'seed': args.seed,
+            'sparsity': args.sparsity,
+            'repeat': args.repeat,
+            'render': args.render,
+            'environment': environment_info()
+        },
+        'results': records
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(records, baseline, args.tolerance)
+        output['comparison'] = {'baseline': args.baseline, 'tolerance': args.tolerance,
+                                'regressions': regressions}
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+        exit_code = 1 if regressions else 0
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(output, f, indent=2)
+
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
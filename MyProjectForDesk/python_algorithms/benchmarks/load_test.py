@@ -0,0 +1,167 @@
+"""HTTP负载测试：对运行中的服务测量吞吐量（requests/sec）和延迟分位数
+
+先上传一个合成数据集（见synthetic.py），然后对每个接口分别用多个并发客户端
+持续请求一段时间，统计成功/失败次数、requests/sec 以及 p50/p95/p99 延迟：
+  - GET  /api/datasets                  数据集列表
+  - GET  /api/datasets/<id>/features    特征列表
+  - POST /api/analyze                   整个数据集的分析
+  - POST /api/analyze [subset]          特征子集分析（从缓存的整体关联矩阵切片）
+结束后删除上传的数据集。只依赖标准库和numpy，可对任何地址运行。
+
+用法（先在另一个终端启动服务）:
+    gunicorn -c gunicorn.conf.py app:app
+    python benchmarks/load_test.py --url http://localhost:3000 --concurrency 16 --duration 20
+    python benchmarks/load_test.py --size 5000x50 --algorithm spearman --output load.json
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import make_dataset, write_csv
+
+
+def request(url, method='GET', body=None, headers=None, timeout=600):
+    """发送请求，返回(状态码, 响应体)；连接错误时状态码为0"""
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, OSError) as e:
+        return 0, str(e).encode('utf-8')
+
+
+def post_json(url, payload):
+    return request(url, 'POST', json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'})
+
+
+def upload_dataset(base_url, csv_bytes, filename):
+    """以multipart/form-data上传数据集，返回数据集id"""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="dataFile"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode('utf-8') + csv_bytes + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    status, content = request(f'{base_url}/api/datasets/upload', 'POST', body,
+                              {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    if status != 200:
+        raise RuntimeError(f'上传失败 {status}: {content[:500]!r}')
+    return json.loads(content)['data']['id']
+
+
+def run_load(send, concurrency, duration, max_requests=None):
+    """concurrency个线程持续调用send()，直到duration秒或总请求数达到max_requests"""
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    remaining = [max_requests]
+
+    def client():
+        while time.perf_counter() < deadline:
+            with lock:
+                if remaining[0] is not None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            start = time.perf_counter()
+            status, content = send()
+            elapsed = time.perf_counter() - start
+            with lock:
+                if 200 <= status < 400:
+                    latencies.append(elapsed)
+                else:
+                    failures.append((status, content[:200]))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    summary = {'requests': len(latencies), 'errors': len(failures), 'seconds': wall,
+               'requests_per_sec': len(latencies) / wall if wall > 0 else 0.0}
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        summary.update({'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000,
+                        'max_ms': max(latencies) * 1000})
+    if failures:
+        summary['first_error'] = f'{failures[0][0]}: {failures[0][1]!r}'
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP负载测试（吞吐量与p99延迟）')
+    parser.add_argument('--url', default='http://localhost:3000', help='服务地址')
+    parser.add_argument('--size', default='2000x30', help='合成数据集规模，格式为 样本数x特征数')
+    parser.add_argument('--algorithm', default='correlation', help='分析接口使用的算法')
+    parser.add_argument('--subset', type=int, default=10, help='特征子集分析使用的特征数（0表示不测试）')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发客户端数')
+    parser.add_argument('--duration', type=float, default=10, help='每个接口的测试时长（秒）')
+    parser.add_argument('--max-requests', type=int, help='每个接口的最大请求数')
+    parser.add_argument('--warmup', type=int, default=2, help='正式计时前每个接口的预热请求数')
+    parser.add_argument('--artifact-format', default='none', choices=['none', 'csv', 'npz'],
+                        help='分析结果文件格式，默认不写文件（只测服务本身）')
+    parser.add_argument('--save-path', help='结果文件目录（服务端路径），默认系统临时目录')
+    parser.add_argument('--output', help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/')
+    n_samples, n_features = (int(value) for value in args.size.lower().split('x'))
+    data, feature_names, _ = make_dataset(n_samples, n_features, seed=0)
+    buffer = io.StringIO()
+    write_csv(buffer, data, feature_names)
+    dataset_id = upload_dataset(base_url, buffer.getvalue().encode('utf-8'),
+                                f'load_test_{n_samples}x{n_features}_{uuid.uuid4().hex[:8]}.csv')
+
+    analyze_body = {'datasetId': dataset_id, 'algorithm': args.algorithm,
+                    'savePath': args.save_path or tempfile.gettempdir(),
+                    'artifactFormat': args.artifact_format}
+    cases = [
+        ('GET /api/datasets', lambda: request(f'{base_url}/api/datasets')),
+        ('GET /api/datasets/<id>/features', lambda: request(f'{base_url}/api/datasets/{dataset_id}/features')),
+        (f'POST /api/analyze [{args.algorithm}]', lambda: post_json(f'{base_url}/api/analyze', analyze_body)),
+    ]
+    if args.subset:
+        subset_body = dict(analyze_body, features=feature_names[:args.subset])
+        cases.append((f'POST /api/analyze [{args.algorithm}, {args.subset} features]',
+                      lambda: post_json(f'{base_url}/api/analyze', subset_body)))
+
+    results = []
+    print(f"{'endpoint':<48}{'ok':>7}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    try:
+        for name, send in cases:
+            for _ in range(args.warmup):
+                send()
+            summary = run_load(send, args.concurrency, args.duration, args.max_requests)
+            results.append({'endpoint': name, **summary})
+            print(f"{name:<48}{summary['requests']:>7}{summary['errors']:>6}{summary['requests_per_sec']:>9.1f}"
+                  f"{summary.get('p50_ms', float('nan')):>9.1f}{summary.get('p95_ms', float('nan')):>9.1f}"
+                  f"{summary.get('p99_ms', float('nan')):>9.1f}")
+            if 'first_error' in summary:
+                print(f"    first error: {summary['first_error']}")
+    finally:
+        request(f'{base_url}/api/datasets/{dataset_id}', 'DELETE')
+
+    if args.output:
+        output = {'url': base_url, 'size': args.size, 'concurrency': args.concurrency,
+                  'duration': args.duration, 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,67 @@
 import sqlite3
 import json
 import os
+import time
+import threading
+import math
+from contextlib import contextmanager
+
+
+def _finite_or_none(value):
+    """递归地把NaN和±Infinity替换为None（常数列的相关系数为NaN）"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite_or_none(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite_or_none(item) for item in value]
+    return value
+
+
+def dumps_json(value):
+    """序列化为标准JSON：json.dumps默认输出的NaN不是合法JSON，SQLite的json_extract无法解析，
+    因此非有限值写为null（只在确实含有非有限值时才遍历一次）"""
+    try:
+        return json.dumps(value, allow_nan=False)
+    except ValueError:
+        return json.dumps(_finite_or_none(value), allow_nan=False)
+
 
 class Database:
-    def __init__(self):
-        self.db_path = os.path.join(os.path.dirname(__file__), '../data/database.db')
-        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.connection.row_factory = sqlite3.Row
-        self.create_tables()
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(os.path.dirname(__file__), '../data/database.db')
+        # 连接在第一次使用时才打开（导入app时不访问数据库，预派生的服务进程也不会继承父进程的连接）
+        self._connection = None
+        self._connect_lock = threading.Lock()
+        # 所有线程共用一个连接，多条语句的写操作必须整体提交：写事务之间互斥，
+        # 避免其他线程（如后台结果文件写入线程）的commit提交了另一个写操作的一半
+        self._write_lock = threading.RLock()
+    
+    @property
+    def connection(self):
+        if self._connection is None:
+            with self._connect_lock:
+                if self._connection is None:
+                    # 多个服务进程共用同一数据库文件：写锁冲突时等待而不是立即报错，
+                    # WAL模式下读操作不会被其他进程的写操作阻塞
+                    connection = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+                    connection.row_factory = sqlite3.Row
+                    connection.execute('PRAGMA journal_mode=WAL')
+                    self._connection = connection
+                    self.create_tables()
+        return self._connection
+    
+    @contextmanager
+    def transaction(self):
+        """写事务：持有写锁执行，正常结束时提交，出错时回滚"""
+        with self._write_lock:
+            cursor = self.connection.cursor()
+            try:
+                yield cursor
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
     
     def create_tables(self):
         cursor = self.connection.cursor()
@@ -23,11 +77,15 @@ class Database:
         ''')
         
         # 检查并添加缺少的列（如果表已存在但结构不同）
-        try:
-            cursor.execute("ALTER TABLE datasets ADD COLUMN upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-        except sqlite3.OperationalError:
-            # 列已存在，忽略错误
-            pass
+        for column_sql in ("upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+                           "sheet_name TEXT",
+                           "header_row INTEGER DEFAULT 0",
+                           "content_hash TEXT"):
+            try:
+                cursor.execute(f"ALTER TABLE datasets ADD COLUMN {column_sql}")
+            except sqlite3.OperationalError:
+                # 列已存在，忽略错误
+                pass
         
         # 创建特征表
         cursor.execute('''
@@ -50,6 +108,24 @@ class Database:
         )
         ''')
         
+        # 创建分类与特征的关联表
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classification_features (
+            classification_id INTEGER NOT NULL,
+            feature_id INTEGER NOT NULL,
+            PRIMARY KEY (classification_id, feature_id),
+            FOREIGN KEY (classification_id) REFERENCES classifications (id) ON DELETE CASCADE,
+            FOREIGN KEY (feature_id) REFERENCES features (id) ON DELETE CASCADE
+        )
+        ''')
+        
+        # 分类表增加名称列
+        try:
+            cursor.execute("ALTER TABLE classifications ADD COLUMN name TEXT")
+        except sqlite3.OperationalError:
+            # 列已存在，忽略错误
+            pass
+        
         # 创建分析结果表
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS analysis_results (
@@ -62,21 +138,72 @@ class Database:
         )
         ''')
         
+        # 创建结果文件目录表（邻接矩阵、网络图），按数据集和算法建索引
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS artifacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dataset_id INTEGER,
+            algorithm TEXT,
+            kind TEXT NOT NULL,
+            format TEXT NOT NULL,
+            directory TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            FOREIGN KEY (dataset_id) REFERENCES datasets (id) ON DELETE CASCADE
+        )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_dataset_algorithm "
+                       "ON artifacts (dataset_id, algorithm, kind, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_hash ON artifacts (directory, content_hash)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_filename ON artifacts (filename)")
+        
+        # 创建网络指标缓存表：每个分析结果（及计算选项）只计算一次
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS network_metrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            result_id INTEGER NOT NULL,
+            options TEXT NOT NULL,
+            metrics_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            UNIQUE (result_id, options),
+            FOREIGN KEY (result_id) REFERENCES analysis_results (id) ON DELETE CASCADE
+        )
+        ''')
+        
+        # 创建共识网络缓存表：按输入结果id的集合（及合并选项）缓存，结果重新计算后id变化，缓存自然失效
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS consensus_networks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            dataset_id INTEGER NOT NULL,
+            result_ids TEXT NOT NULL,
+            options TEXT NOT NULL,
+            consensus_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            UNIQUE (result_ids, options),
+            FOREIGN KEY (dataset_id) REFERENCES datasets (id) ON DELETE CASCADE
+        )
+        ''')
+        
         self.connection.commit()
     
     def save_analysis_result(self, dataset_id, algorithm, result_json):
-        cursor = self.connection.cursor()
+        with self.transaction() as cursor:
+            # 删除旧的分析结果及其网络指标缓存
+            cursor.execute("DELETE FROM network_metrics WHERE result_id IN "
+                           "(SELECT id FROM analysis_results WHERE dataset_id = ? AND algorithm = ?)",
+                           (dataset_id, algorithm))
+            cursor.execute("DELETE FROM analysis_results WHERE dataset_id = ? AND algorithm = ?", 
+                          (dataset_id, algorithm))
+            # 旧结果的id不会再被引用，包含它的共识网络缓存一并删除
+            cursor.execute("DELETE FROM consensus_networks WHERE dataset_id = ?", (dataset_id,))
         
-        # 删除旧的分析结果
-        cursor.execute("DELETE FROM analysis_results WHERE dataset_id = ? AND algorithm = ?", 
-                      (dataset_id, algorithm))
-        
-        # 插入新的分析结果
-        cursor.execute("INSERT INTO analysis_results (dataset_id, algorithm, result_json) VALUES (?, ?, ?)", 
-                      (dataset_id, algorithm, json.dumps(result_json)))
+            # 插入新的分析结果
+            cursor.execute("INSERT INTO analysis_results (dataset_id, algorithm, result_json) VALUES (?, ?, ?)", 
+                          (dataset_id, algorithm, dumps_json(result_json)))
         
-        self.connection.commit()
-        return cursor.lastrowid
+            return cursor.lastrowid
     
     def get_analysis_result(self, dataset_id, algorithm):
         cursor = self.connection.cursor()
@@ -93,11 +220,11 @@ class Database:
             }
         return None
     
-    def save_dataset(self, name, path):
-        cursor = self.connection.cursor()
-        cursor.execute("INSERT INTO datasets (name, path) VALUES (?, ?)", (name, path))
-        self.connection.commit()
-        return cursor.lastrowid
+    def save_dataset(self, name, path, sheet_name=None, header_row=0, content_hash=None):
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO datasets (name, path, sheet_name, header_row, content_hash) VALUES (?, ?, ?, ?, ?)",
+                          (name, path, sheet_name, header_row, content_hash))
+            return cursor.lastrowid
     
     def get_dataset(self, dataset_id):
         cursor = self.connection.cursor()
@@ -108,10 +235,107 @@ class Database:
                 'id': result['id'],
                 'name': result['name'],
                 'path': result['path'],
-                'upload_time': result['upload_time']
+                'upload_time': result['upload_time'],
+                'sheet_name': result['sheet_name'],
+                'header_row': result['header_row'] or 0,
+                'content_hash': result['content_hash']
+            }
+        return None
+    
+    def update_dataset_hash(self, dataset_id, content_hash):
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE datasets SET content_hash = ? WHERE id = ?", (content_hash, dataset_id))
+    
+    def get_dataset_versions(self):
+        """只读取元数据，用于生成数据集列表的ETag"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, name, path, upload_time, content_hash FROM datasets ORDER BY upload_time DESC")
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_analysis_result_by_id(self, result_id):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT * FROM analysis_results WHERE id = ?", (result_id,))
+        result = cursor.fetchone()
+        if result:
+            return {
+                'id': result['id'],
+                'dataset_id': result['dataset_id'],
+                'algorithm': result['algorithm'],
+                'result_json': json.loads(result['result_json']),
+                'timestamp': result['timestamp']
             }
         return None
     
+    def get_network_metrics(self, result_id, options):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT metrics_json FROM network_metrics WHERE result_id = ? AND options = ?",
+                      (result_id, options))
+        result = cursor.fetchone()
+        return json.loads(result['metrics_json']) if result else None
+    
+    def save_network_metrics(self, result_id, options, metrics):
+        with self.transaction() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO network_metrics (result_id, options, metrics_json, created_at) "
+                           "VALUES (?, ?, ?, ?)", (result_id, options, dumps_json(metrics), time.time()))
+    
+    def get_analysis_results_meta(self, dataset_id):
+        """数据集的全部分析结果的id、算法和时间戳（不加载result_json）"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, algorithm, timestamp FROM analysis_results WHERE dataset_id = ? ORDER BY id",
+                      (dataset_id,))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_result_networks(self, result_ids):
+        """只读取结果的节点和边：由SQLite的json_extract取出，不在Python中解析完整的矩阵
+        
+        较早保存的结果可能含有NaN（不是合法JSON，json_extract会报错），这些结果整体在Python中解析。
+        """
+        cursor = self.connection.cursor()
+        placeholders = ','.join('?' * len(result_ids))
+        cursor.execute("SELECT id, dataset_id, algorithm, json_valid(result_json) AS valid, "
+                       "CASE WHEN json_valid(result_json) THEN json_extract(result_json, '$.nodes') END AS nodes, "
+                       "CASE WHEN json_valid(result_json) THEN json_extract(result_json, '$.links') END AS links, "
+                       "CASE WHEN json_valid(result_json) THEN NULL ELSE result_json END AS raw_json "
+                       f"FROM analysis_results WHERE id IN ({placeholders})", list(result_ids))
+        networks = {}
+        for row in cursor.fetchall():
+            if row['valid']:
+                nodes, links = json.loads(row['nodes'] or '[]'), json.loads(row['links'] or '[]')
+            else:
+                result = json.loads(row['raw_json'])
+                nodes, links = result.get('nodes', []), result.get('links', [])
+            networks[row['id']] = {
+                'id': row['id'],
+                'dataset_id': row['dataset_id'],
+                'algorithm': row['algorithm'],
+                'nodes': nodes,
+                'links': links
+            }
+        return [networks[result_id] for result_id in result_ids if result_id in networks]
+    
+    def get_consensus(self, result_ids, options):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT consensus_json FROM consensus_networks WHERE result_ids = ? AND options = ?",
+                      (result_ids, options))
+        result = cursor.fetchone()
+        return json.loads(result['consensus_json']) if result else None
+    
+    def save_consensus(self, dataset_id, result_ids, options, consensus):
+        with self.transaction() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO consensus_networks "
+                           "(dataset_id, result_ids, options, consensus_json, created_at) VALUES (?, ?, ?, ?, ?)",
+                           (dataset_id, result_ids, options, dumps_json(consensus), time.time()))
+    
+    def get_analysis_result_meta(self, dataset_id, algorithm):
+        """只读取结果的id和时间戳，不加载result_json"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, timestamp FROM analysis_results WHERE dataset_id = ? AND algorithm = ?",
+                      (dataset_id, algorithm))
+        result = cursor.fetchone()
+        if result:
+            return {'id': result['id'], 'timestamp': result['timestamp']}
+        return None
+    
     def get_all_datasets(self):
         cursor = self.connection.cursor()
         cursor.execute("SELECT * FROM datasets ORDER BY upload_time DESC")
@@ -134,10 +358,150 @@ class Database:
         return datasets
     
     def delete_dataset(self, dataset_id):
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM network_metrics WHERE result_id IN "
+                           "(SELECT id FROM analysis_results WHERE dataset_id = ?)", (dataset_id,))
+            cursor.execute("DELETE FROM consensus_networks WHERE dataset_id = ?", (dataset_id,))
+            cursor.execute("DELETE FROM datasets WHERE id = ?", (dataset_id,))
+            return cursor.rowcount > 0
+    
+    def add_features(self, dataset_id, feature_names, feature_type='numeric'):
+        with self.transaction() as cursor:
+            cursor.executemany("INSERT INTO features (dataset_id, name, type) VALUES (?, ?, ?)",
+                               [(dataset_id, str(name), feature_type) for name in feature_names])
+            return cursor.rowcount
+    
+    def get_features_by_dataset_id(self, dataset_id):
         cursor = self.connection.cursor()
-        cursor.execute("DELETE FROM datasets WHERE id = ?", (dataset_id,))
-        self.connection.commit()
-        return cursor.rowcount > 0
+        cursor.execute("SELECT * FROM features WHERE dataset_id = ? ORDER BY id", (dataset_id,))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def add_classification(self, dataset_id, name, feature_ids):
+        with self.transaction() as cursor:
+            # 旧表结构中feature_name为必填列，这里同时写入分类名称
+            cursor.execute("INSERT INTO classifications (dataset_id, feature_name, name) VALUES (?, ?, ?)",
+                          (dataset_id, name, name))
+            classification_id = cursor.lastrowid
+            cursor.executemany("INSERT OR IGNORE INTO classification_features (classification_id, feature_id) VALUES (?, ?)",
+                               [(classification_id, feature_id) for feature_id in feature_ids])
+            return classification_id
+    
+    def get_classifications_by_dataset_id(self, dataset_id):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT * FROM classifications WHERE dataset_id = ? ORDER BY id", (dataset_id,))
+        classifications = []
+        for row in cursor.fetchall():
+            classifications.append({
+                'id': row['id'],
+                'dataset_id': row['dataset_id'],
+                'name': row['name'] or row['feature_name'],
+                'features': [feature['name'] for feature in self.get_features_by_classification_id(row['id'])]
+            })
+        return classifications
+    
+    def get_classification(self, classification_id):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT * FROM classifications WHERE id = ?", (classification_id,))
+        row = cursor.fetchone()
+        if row:
+            return {
+                'id': row['id'],
+                'dataset_id': row['dataset_id'],
+                'name': row['name'] or row['feature_name'],
+                'features': [feature['name'] for feature in self.get_features_by_classification_id(row['id'])]
+            }
+        return None
+    
+    def get_features_by_classification_id(self, classification_id):
+        cursor = self.connection.cursor()
+        cursor.execute('''
+            SELECT f.* FROM features f
+            JOIN classification_features cf ON f.id = cf.feature_id
+            WHERE cf.classification_id = ?
+            ORDER BY f.id
+        ''', (classification_id,))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def delete_classification(self, classification_id):
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM classification_features WHERE classification_id = ?", (classification_id,))
+            cursor.execute("DELETE FROM classifications WHERE id = ?", (classification_id,))
+            return cursor.rowcount > 0
+    
+    def add_artifact(self, dataset_id, algorithm, kind, fmt, directory, filename, content_hash, size_bytes):
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO artifacts (dataset_id, algorithm, kind, format, directory, filename, "
+                           "content_hash, size_bytes, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (dataset_id, algorithm, kind, fmt, directory, filename, content_hash, size_bytes, time.time()))
+            return cursor.lastrowid
+    
+    def find_artifact(self, directory, content_hash, dataset_id=None, algorithm=None):
+        """查找同一数据集、算法在该目录下内容相同的已写入文件"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT * FROM artifacts WHERE directory = ? AND content_hash = ? "
+                       "AND dataset_id IS ? AND algorithm IS ? ORDER BY id DESC LIMIT 1",
+                      (directory, content_hash, dataset_id, algorithm))
+        result = cursor.fetchone()
+        return dict(result) if result else None
+    
+    def touch_artifact(self, artifact_id):
+        """内容相同未重新写入时刷新时间，使其在保留策略中算作最新结果"""
+        with self.transaction() as cursor:
+            cursor.execute("UPDATE artifacts SET created_at = ? WHERE id = ?", (time.time(), artifact_id))
+    
+    def get_artifacts(self, dataset_id, algorithm=None, kind=None):
+        """按数据集（及算法、类型）列出结果文件，最新的在前"""
+        sql = "SELECT * FROM artifacts WHERE dataset_id = ?"
+        params = [dataset_id]
+        if algorithm is not None:
+            sql += " AND algorithm = ?"
+            params.append(algorithm)
+        if kind is not None:
+            sql += " AND kind = ?"
+            params.append(kind)
+        cursor = self.connection.cursor()
+        cursor.execute(sql + " ORDER BY created_at DESC, id DESC", params)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_artifact_by_filename(self, filename):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT * FROM artifacts WHERE filename = ? ORDER BY created_at DESC LIMIT 1", (filename,))
+        result = cursor.fetchone()
+        return dict(result) if result else None
+    
+    def get_expired_artifacts(self, keep_last):
+        """每个(数据集, 算法, 类型)只保留最新keep_last个，返回其余的文件"""
+        cursor = self.connection.cursor()
+        cursor.execute('''
+        SELECT * FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY dataset_id, algorithm, kind
+                                         ORDER BY created_at DESC, id DESC) AS rank
+            FROM artifacts
+        ) WHERE rank > ?
+        ''', (keep_last,))
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_artifacts_oldest_first(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT * FROM artifacts ORDER BY created_at ASC, id ASC")
+        return [dict(row) for row in cursor.fetchall()]
+    
+    def get_artifacts_total_bytes(self):
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM artifacts")
+        return cursor.fetchone()[0]
+    
+    def delete_artifacts(self, artifact_ids):
+        with self.transaction() as cursor:
+            cursor.executemany("DELETE FROM artifacts WHERE id = ?", [(artifact_id,) for artifact_id in artifact_ids])
+    
+    def reset_after_fork(self):
+        """在fork出的子进程中调用：丢弃从父进程继承的连接（SQLite连接不能跨进程使用）"""
+        self._connection = None
+        self._connect_lock = threading.Lock()
+        self._write_lock = threading.RLock()
     
     def close(self):
-        self.connection.close()
\ No newline at end of file
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
\ No newline at end of file
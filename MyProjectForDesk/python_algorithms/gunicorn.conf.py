@@ -0,0 +1,57 @@
+"""生产环境服务配置（gunicorn，预派生多进程）
+
+在python_algorithms目录下启动:
+    gunicorn -c gunicorn.conf.py app:app
+
+主进程导入应用并预热（导入算法、绘图库，加载字体缓存）后再fork出工作进程，
+工作进程共享这些已导入模块的内存页。各进程之间共享的数据：
+  - 解析后的数据集和整体关联矩阵以.npy文件缓存在uploads/.parsed_cache下，
+    各进程以只读内存映射方式读取，同一份数据在操作系统页缓存中只保留一份；
+  - 数据集、结果和结果文件目录保存在同一个SQLite数据库中（WAL模式）。
+
+仍为进程内状态：后台分析任务（/api/analyze/jobs）、内存中的LRU缓存和/metrics的指标。
+后台任务的状态与事件流只能由创建它的工作进程提供，多进程部署时应改用
+/api/analyze的事件流模式（Accept: text/event-stream），或在反向代理上按会话固定工作进程。
+
+可用环境变量调整：
+    WEB_BIND          监听地址，默认0.0.0.0:3000（与开发服务器及前端一致）
+    WEB_CONCURRENCY   工作进程数，默认CPU核数（上限8）
+    WEB_THREADS       每个工作进程的线程数，默认4（事件流长连接各占一个线程）
+    WEB_TIMEOUT       单个请求的超时秒数，默认600（大数据集的因果算法耗时较长）
+    WEB_MAX_REQUESTS  工作进程处理多少个请求后重启，默认10000（0表示不重启）
+    ANALYSIS_MEMORY_BUDGET  每个工作进程同时运行的分析的预估峰值内存上限（字节），
+                      默认把物理内存的60%平分给各工作进程；超出时排队、降级或拒绝（见app.py）
+    ANALYSIS_QUEUE_TIMEOUT  内存不足时排队等待的最长秒数，默认30，超时返回503
+"""
+import os
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:3000')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(os.cpu_count() or 1, 8)))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 600))
+graceful_timeout = 30
+keepalive = 5
+# 处理一定数量的请求后重启工作进程，释放算法计算中积累的内存碎片
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+# 分析的内存预算按工作进程平分（需在导入应用之前设置）
+if 'ANALYSIS_MEMORY_BUDGET' not in os.environ:
+    try:
+        physical = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        physical = 8 * 1024 ** 3
+    os.environ['ANALYSIS_MEMORY_BUDGET'] = str(int(physical * 0.6) // workers)
+preload_app = True
+accesslog = '-'
+
+
+def when_ready(server):
+    # preload_app时应用已在主进程中导入，这里在fork之前完成预热
+    import app
+    app.preload()
+
+
+def post_fork(server, worker):
+    import app
+    app.reset_after_fork()
@@ -1,12 +1,26 @@
 import os
-import pandas as pd
+import io
+import json
+import gzip
+import zlib
+import base64
+import hashlib
+import time
+import queue
+import atexit
+import threading
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
 import numpy as np
 from werkzeug.utils import secure_filename
 
 class FileUtils:
-    def __init__(self):
+    def __init__(self, mmap_cache=True):
         self.UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), '../uploads')
         self.ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
+        # 以只读内存映射方式读取磁盘缓存的矩阵：多个服务进程共享操作系统页缓存中的同一份数据
+        self.mmap_cache = mmap_cache
         
         # 确保上传目录存在
         if not os.path.exists(self.UPLOAD_FOLDER):
@@ -25,8 +39,24 @@ class FileUtils:
             return file_path, filename
         return None, None
     
-    def parse_file(self, file_path, filename):
-        """解析CSV或Excel文件"""
+    def parse_file(self, file_path, filename, missing='listwise', dtype='float64',
+                   sheet_name=None, header_row=0, progress=None):
+        """解析CSV或Excel文件
+        
+        解析得到的数值矩阵会缓存到磁盘（按文件修改时间、大小、工作表和表头行区分），
+        之后的请求直接读取缓存，不再重新打开原始文件。
+        
+        Args:
+            file_path: 文件路径
+            filename: 文件名（用于判断格式）
+            missing: 缺失值处理方式，'listwise'删除含缺失值的整行，
+                     'pairwise'保留缺失值(NaN)供成对完整的相关计算使用，
+                     'keep'不删除任何行（行号与原始文件一致，如需与read_column的结果对齐）
+            dtype: 输出数组的精度，'float64'（默认）或 'float32'（内存减半）
+            sheet_name: Excel工作表名称，默认第一个工作表
+            header_row: 表头所在行（从0开始），其上方的行被跳过
+            progress: 进度跟踪器（可选），用于区分读取与预处理阶段
+        """
         try:
             # 获取文件扩展名，处理文件名不包含'.'的情况
             if '.' in filename:
@@ -34,48 +64,333 @@ class FileUtils:
             else:
                 # 如果文件名没有扩展名，尝试根据文件内容判断或使用默认方式
                 file_ext = 'csv'  # 默认假设是CSV格式
-                
-            if file_ext == 'csv':
-                # 读取CSV文件
-                df = pd.read_csv(file_path, encoding='utf-8')
-            else:
-                # 读取Excel文件
-                df = pd.read_excel(file_path)
             
-            # 预处理数据
-            df = self._preprocess_data(df)
+            cache_key = self._parsed_cache_key(file_path, dtype, sheet_name, header_row)
+            cached = self._load_parsed_cache(file_path, cache_key)
+            if cached is not None:
+                data, feature_names = cached
+                source_bytes = int(data.nbytes)
+            elif file_ext == 'csv':
+                # 读取CSV文件；全数值文件直接按目标精度解析，避免先生成float64中间结果
+                # pandas只在需要解析原始文件时导入，命中解析缓存的请求不必加载
+                import pandas as pd
+                try:
+                    df = pd.read_csv(file_path, encoding='utf-8', header=header_row, dtype=dtype)
+                except ValueError:
+                    df = pd.read_csv(file_path, encoding='utf-8', header=header_row)
+                feature_names = df.columns.tolist()
+                source_bytes = int(df.memory_usage(index=False).sum())
+                data = self._to_numeric_array(df, dtype)
+                del df
+            elif file_ext == 'xlsx':
+                # 以只读流式方式读取Excel，按块转换为数值矩阵
+                data, feature_names = self._read_excel_streaming(file_path, sheet_name, header_row, dtype)
+                source_bytes = int(data.nbytes)
+            else:
+                # 旧版.xls格式不支持流式读取
+                import pandas as pd
+                df = pd.read_excel(file_path, sheet_name=sheet_name or 0, header=header_row)
+                feature_names = df.columns.tolist()
+                source_bytes = int(df.memory_usage(index=False).sum())
+                data = self._to_numeric_array(df, dtype)
+                del df
             
-            # 获取特征名
-            feature_names = df.columns.tolist()
+            if cached is None:
+                self._store_parsed_cache(file_path, cache_key, data, feature_names)
             
-            # 转换为numpy数组
-            data = df.values
+            # 按缺失值策略删除行
+            if progress is not None:
+                progress.stage('preprocess')
+            data, dropped_rows = self._preprocess_data(data, missing)
             
             return {
                 'data': data,
                 'feature_names': feature_names,
                 'num_samples': data.shape[0],
-                'num_features': data.shape[1]
+                'num_features': data.shape[1],
+                'memory_footprint': {
+                    'dtype': str(data.dtype),
+                    'data_bytes': int(data.nbytes),
+                    'source_bytes': source_bytes,
+                    'dropped_rows': dropped_rows,
+                    'cache_hit': cached is not None
+                }
             }
         except Exception as e:
             raise Exception(f"文件解析错误: {str(e)}")
     
-    def _preprocess_data(self, df):
-        """预处理数据"""
-        # 处理缺失值
-        df = df.dropna()
+    def _to_numeric_array(self, df, dtype='float64'):
+        """一次向量化的数值转换，最多产生一份数组拷贝"""
+        import pandas as pd
+        # 只转换非数值列，数值列保持原样，避免逐列赋值带来的重复拷贝
+        non_numeric = [col for col, col_dtype in df.dtypes.items()
+                       if not pd.api.types.is_numeric_dtype(col_dtype)]
+        if non_numeric:
+            df = df.copy(deep=False)
+            df[non_numeric] = df[non_numeric].apply(pd.to_numeric, errors='coerce')
+        
+        # 唯一一次拷贝：转换为目标精度的连续数组
+        return np.array(df, dtype=dtype)
+    
+    def _read_excel_streaming(self, file_path, sheet_name=None, header_row=0, dtype='float64',
+                              chunk_rows=10000):
+        """以只读模式流式读取xlsx工作表，每chunk_rows行转换一次数值数组"""
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            if sheet_name is None:
+                worksheet = workbook.worksheets[0]
+            elif sheet_name in workbook.sheetnames:
+                worksheet = workbook[sheet_name]
+            else:
+                raise ValueError(f"工作表不存在: {sheet_name}")
+            
+            rows = worksheet.iter_rows(min_row=header_row + 1, values_only=True)
+            header = next(rows, None)
+            if header is None:
+                raise ValueError('工作表为空')
+            
+            # 以最后一个非空表头单元格确定列数
+            width = max((i + 1 for i, value in enumerate(header) if value is not None), default=0)
+            if width == 0:
+                raise ValueError('表头为空')
+            feature_names = [str(value) if value is not None else f'Unnamed: {i}'
+                             for i, value in enumerate(header[:width])]
+            
+            chunks = []
+            buffer = []
+            for row in rows:
+                if len(row) < width:
+                    row = tuple(row) + (None,) * (width - len(row))
+                buffer.append(row[:width])
+                if len(buffer) >= chunk_rows:
+                    chunks.append(self._rows_to_array(buffer, width, dtype))
+                    buffer = []
+            if buffer:
+                chunks.append(self._rows_to_array(buffer, width, dtype))
+        finally:
+            workbook.close()
+        
+        if not chunks:
+            return np.empty((0, width), dtype=dtype), feature_names
+        data = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+        return data, feature_names
+    
+    def read_column(self, file_path, filename, column, sheet_name=None, header_row=0):
+        """按原始文本读取一列（如分组标签），与parse_file(missing='keep')的行一一对应
+        
+        Returns:
+            字符串数组（object类型），空单元格为None
+        """
+        file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'csv'
+        if file_ext == 'xlsx':
+            from openpyxl import load_workbook
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                worksheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+                rows = worksheet.iter_rows(min_row=header_row + 1, values_only=True)
+                header = [str(value) if value is not None else f'Unnamed: {i}'
+                          for i, value in enumerate(next(rows, None) or ())]
+                if str(column) not in header:
+                    raise ValueError(f"列不存在: {column}")
+                index = header.index(str(column))
+                values = [row[index] if index < len(row) else None for row in rows]
+            finally:
+                workbook.close()
+        else:
+            import pandas as pd
+            # 只读取这一列
+            usecols = lambda name: str(name) == str(column)
+            if file_ext == 'csv':
+                df = pd.read_csv(file_path, encoding='utf-8', header=header_row, dtype=str, usecols=usecols)
+            else:
+                df = pd.read_excel(file_path, sheet_name=sheet_name or 0, header=header_row, dtype=str,
+                                   usecols=usecols)
+            if df.shape[1] == 0:
+                raise ValueError(f"列不存在: {column}")
+            values = df.iloc[:, 0].tolist()
+        
+        labels = np.empty(len(values), dtype=object)
+        labels[:] = [None if value is None or (isinstance(value, float) and np.isnan(value)) or str(value).strip() == ''
+                     else str(value).strip() for value in values]
+        return labels
+    
+    def _rows_to_array(self, rows, width, dtype='float64'):
+        """将一块行元组转换为数值数组，空单元格和非数值单元格记为NaN"""
+        try:
+            # 纯数值块（None会被转换为NaN）直接转换
+            return np.array(rows, dtype=dtype)
+        except (ValueError, TypeError):
+            import pandas as pd
+            frame = pd.DataFrame(rows, columns=range(width))
+            return self._to_numeric_array(frame, dtype)
+    
+    def _parsed_cache_dir(self):
+        """解析结果缓存目录"""
+        cache_dir = os.path.join(self.UPLOAD_FOLDER, '.parsed_cache')
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        return cache_dir
+    
+    def _parsed_cache_key(self, file_path, dtype, sheet_name, header_row):
+        """根据文件状态和解析参数生成缓存键"""
+        stat = os.stat(file_path)
+        raw = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{dtype}|{sheet_name}|{header_row}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+    
+    def _parsed_cache_paths(self, file_path, cache_key):
+        base = os.path.join(self._parsed_cache_dir(), f"{os.path.basename(file_path)}.{cache_key}")
+        return base + '.npy', base + '.json'
+    
+    def _load_parsed_cache(self, file_path, cache_key):
+        """读取缓存的数值矩阵和特征名，不存在或损坏时返回None"""
+        cached = self._load_cached_array(*self._parsed_cache_paths(file_path, cache_key))
+        if cached is None:
+            return None
+        data, meta = cached
+        return data, meta['feature_names']
+    
+    def _store_parsed_cache(self, file_path, cache_key, data, feature_names):
+        """写入解析缓存"""
+        self._store_cached_array(*self._parsed_cache_paths(file_path, cache_key), data,
+                                 {'feature_names': [str(name) for name in feature_names]})
+    
+    def _load_cached_array(self, npy_path, meta_path):
+        """读取缓存的数组及其元数据，mmap_cache开启时返回只读的内存映射数组"""
+        if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            array = np.load(npy_path, mmap_mode='r' if self.mmap_cache else None)
+            # 转为普通ndarray视图（仍共享映射的内存），避免memmap子类传播到后续计算结果中
+            return np.asarray(array), meta
+        except Exception as e:
+            print(f"读取缓存失败 {npy_path}: {str(e)}")
+            return None
+    
+    def _store_cached_array(self, npy_path, meta_path, array, meta):
+        """写入缓存（先写临时文件再替换，避免并发读到半个文件）
         
-        # 确保所有数据都是数值型
-        for col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+        临时文件名带进程号和线程号，多个服务进程同时写同一缓存时互不覆盖；
+        已映射旧文件的进程在替换后仍读取旧文件的内容。
+        """
+        suffix = f'.{os.getpid()}-{threading.get_ident()}.tmp'
+        try:
+            with open(npy_path + suffix, 'wb') as f:
+                np.save(f, array)
+            os.replace(npy_path + suffix, npy_path)
+            with open(meta_path + suffix, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(meta_path + suffix, meta_path)
+        except Exception as e:
+            print(f"写入缓存失败 {npy_path}: {str(e)}")
+            for path in (npy_path + suffix, meta_path + suffix):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def _shared_matrix_paths(self, file_path, key):
+        # 与解析缓存使用相同的文件名前缀，删除数据集时由clear_parsed_cache一并清理
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        return self._parsed_cache_paths(file_path, f'matrix-{digest}')
+    
+    def load_shared_matrix(self, file_path, key):
+        """读取跨进程共享的派生矩阵（如整体关联矩阵），返回(matrix, feature_names)或None"""
+        cached = self._load_cached_array(*self._shared_matrix_paths(file_path, key))
+        if cached is None:
+            return None
+        matrix, meta = cached
+        if meta.get('key') != repr(key):
+            return None
+        return matrix, meta['feature_names']
+    
+    def store_shared_matrix(self, file_path, key, matrix, feature_names):
+        """保存派生矩阵，供其他服务进程（及重启后的进程）直接映射读取"""
+        self._store_cached_array(*self._shared_matrix_paths(file_path, key), matrix,
+                                 {'key': repr(key), 'feature_names': [str(name) for name in feature_names]})
+    
+    def file_content_hash(self, file_path, chunk_size=1024 * 1024):
+        """分块计算文件内容的SHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def parsed_shape(self, file_path, sheet_name=None, header_row=0):
+        """从解析缓存的.npy文件头读取(行数, 列数)（删除缺失值之前），不读取数据；没有缓存时返回None"""
+        for dtype in ('float64', 'float32'):
+            npy_path, _ = self._parsed_cache_paths(file_path, self._parsed_cache_key(file_path, dtype, sheet_name,
+                                                                                     header_row))
+            try:
+                with open(npy_path, 'rb') as f:
+                    major, _ = np.lib.format.read_magic(f)
+                    read_header = np.lib.format.read_array_header_1_0 if major == 1 \
+                        else np.lib.format.read_array_header_2_0
+                    shape, _, _ = read_header(f)
+                return shape
+            except (OSError, ValueError):
+                continue
+        return None
+    
+    def dataset_version(self, file_path):
+        """数据集版本标识：文件修改时间和大小，文件被替换后版本随之变化"""
+        stat = os.stat(file_path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    
+    def clear_parsed_cache(self, file_path):
+        """删除某个文件的全部解析缓存"""
+        prefix = os.path.basename(file_path) + '.'
+        cache_dir = self._parsed_cache_dir()
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    pass
+    
+    def _preprocess_data(self, data, missing='listwise'):
+        """预处理数据：按缺失值策略删除行
         
-        # 再次删除包含缺失值的行
-        df = df.dropna()
+        Returns:
+            (data, dropped_rows): 数值矩阵及被删除的行数
+        """
+        if missing == 'keep':
+            return data, 0
+        missing_cells = np.isnan(data)
+        if missing == 'pairwise':
+            # 成对完整模式：仅删除全部缺失的行
+            keep = ~missing_cells.all(axis=1)
+        else:
+            # 删除包含缺失值（含无法转换为数值的单元格）的行
+            keep = ~missing_cells.any(axis=1)
+        del missing_cells
         
-        # 重置索引
-        df = df.reset_index(drop=True)
+        dropped_rows = int(data.shape[0] - keep.sum())
+        if dropped_rows and not data.flags.writeable:
+            # 内存映射的缓存是只读的，不能就地前移，复制保留的行
+            data = data[keep]
+        elif dropped_rows:
+            data = self._compact_rows(data, keep)
         
-        return df
+        return data, dropped_rows
+    
+    def _compact_rows(self, data, keep, chunk_rows=65536):
+        """在原数组上就地前移保留的行，避免再复制整个矩阵"""
+        rows = np.flatnonzero(keep)
+        # 目标行号不大于源行号，按块顺序前移不会覆盖尚未读取的行
+        for start in range(0, len(rows), chunk_rows):
+            chunk = rows[start:start + chunk_rows]
+            data[start:start + len(chunk)] = data[chunk]
+        return data[:len(rows)]
+    
+    def drop_incomplete_rows(self, data):
+        """删除含缺失值(NaN)的行，供不支持成对完整计算的算法使用"""
+        complete = ~np.isnan(data).any(axis=1)
+        if complete.all():
+            return data
+        return data[complete]
     
     def normalize_data(self, data):
         """标准化数据"""
@@ -119,37 +434,973 @@ class DataUtils:
         
         return features, feature_names, target, target_name
     
-    def get_feature_statistics(self, data, feature_names):
-        """获取特征统计信息"""
+    def get_feature_statistics(self, data, feature_names, quantiles=(0.25, 0.5, 0.75), bins=10,
+                               approximate=False, block_rows=65536, sketch_size=256):
+        """获取特征统计信息（按列向量化计算）
+        
+        按行块扫描一次数据，用可合并的矩统计量同时得到所有列的计数、缺失数、均值、
+        标准差、偏度和极值。精确模式下分位数用np.nanquantile（基于partition，无需全排序）；
+        近似模式在同一次扫描中为每列维护可合并的加权分位数草图，分位数和直方图都从草图得到，
+        适合行数很多的数据。
+        
+        Args:
+            data: 数据矩阵，缺失值为NaN
+            feature_names: 特征名称列表
+            quantiles: 需要计算的分位点
+            bins: 直方图分箱数
+            approximate: 是否使用近似分位数草图
+            block_rows: 每次扫描的行数
+            sketch_size: 每列草图在每个行块中保留的分位点个数
+        """
+        probs = sorted(set(float(q) for q in quantiles) | {0.5})
+        summary = self._scan_columns(data, block_rows, sketch_size if approximate else None)
+        col_min, col_max = summary['min'], summary['max']
+        
+        if approximate:
+            values, weights = summary['sketch']
+            quantile_values = self._sketch_quantiles(values, weights, probs)
+            hist_counts = self._column_histograms(values, col_min, col_max, bins, weights)
+            hist_counts = np.rint(hist_counts).astype(np.int64)
+        else:
+            with warnings.catch_warnings():
+                # 全部缺失的列返回NaN，忽略对应的警告
+                warnings.simplefilter('ignore', RuntimeWarning)
+                quantile_values = np.nanquantile(data, probs, axis=0)
+            hist_counts = np.zeros((data.shape[1], bins), dtype=np.int64)
+            for start in range(0, data.shape[0], block_rows):
+                block = data[start:start + block_rows]
+                hist_counts += self._column_histograms(block, col_min, col_max, bins).astype(np.int64)
+        
+        median_index = probs.index(0.5)
         statistics = []
         for i, name in enumerate(feature_names):
-            feature_data = data[:, i]
-            stats = {
+            edges = np.linspace(col_min[i], col_max[i], bins + 1) if summary['count'][i] else []
+            statistics.append({
                 'feature_name': name,
-                'mean': float(np.mean(feature_data)),
-                'std': float(np.std(feature_data)),
-                'min': float(np.min(feature_data)),
-                'max': float(np.max(feature_data)),
-                'median': float(np.median(feature_data))
-            }
-            statistics.append(stats)
+                'count': int(summary['count'][i]),
+                'missing': int(summary['missing'][i]),
+                'mean': self._to_json_float(summary['mean'][i]),
+                'std': self._to_json_float(summary['std'][i]),
+                'min': self._to_json_float(col_min[i]),
+                'max': self._to_json_float(col_max[i]),
+                'median': self._to_json_float(quantile_values[median_index, i]),
+                'skew': self._to_json_float(summary['skew'][i]),
+                'quantiles': {str(q): self._to_json_float(quantile_values[k, i]) for k, q in enumerate(probs)},
+                'histogram': {
+                    'counts': hist_counts[i].tolist() if summary['count'][i] else [],
+                    'bin_edges': [float(edge) for edge in edges]
+                }
+            })
         return statistics
     
+    def _to_json_float(self, value):
+        """NaN/inf无法写入JSON，转换为None"""
+        value = float(value)
+        return value if np.isfinite(value) else None
+    
+    def _scan_columns(self, data, block_rows=65536, sketch_size=None):
+        """按行块单次扫描，合并各块的计数、均值、二阶/三阶中心矩和极值
+        
+        合并公式为Chan等人的成对更新算法，数值稳定且各块可以任意顺序合并。
+        sketch_size不为None时同时构建每列的加权分位数草图。
+        """
+        p = data.shape[1]
+        count = np.zeros(p)
+        mean = np.zeros(p)
+        m2 = np.zeros(p)
+        m3 = np.zeros(p)
+        col_min = np.full(p, np.inf)
+        col_max = np.full(p, -np.inf)
+        missing = np.zeros(p, dtype=np.int64)
+        sketch_values, sketch_weights = [], []
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for start in range(0, data.shape[0], block_rows):
+                block = np.asarray(data[start:start + block_rows], dtype=np.float64)
+                present = ~np.isnan(block)
+                n_b = present.sum(axis=0).astype(np.float64)
+                missing += block.shape[0] - n_b.astype(np.int64)
+                
+                mean_b = np.where(n_b > 0, np.nansum(block, axis=0) / np.maximum(n_b, 1), 0)
+                centered = np.where(present, block - mean_b, 0)
+                m2_b = (centered ** 2).sum(axis=0)
+                m3_b = (centered ** 3).sum(axis=0)
+                col_min = np.fmin(col_min, np.nanmin(block, axis=0))
+                col_max = np.fmax(col_max, np.nanmax(block, axis=0))
+                
+                # 合并到累计结果
+                total = count + n_b
+                safe_total = np.maximum(total, 1)
+                delta = mean_b - mean
+                m3 = (m3 + m3_b
+                      + delta ** 3 * count * n_b * (count - n_b) / safe_total ** 2
+                      + 3 * delta * (count * m2_b - n_b * m2) / safe_total)
+                m2 = m2 + m2_b + delta ** 2 * count * n_b / safe_total
+                mean = mean + delta * n_b / safe_total
+                count = total
+                
+                if sketch_size is not None:
+                    values, weights = self._block_sketch(block, n_b, sketch_size)
+                    sketch_values.append(values)
+                    sketch_weights.append(weights)
+                    if len(sketch_values) > 32:
+                        # 草图过大时压缩，保持内存有界
+                        merged = self._compress_sketch(np.concatenate(sketch_values),
+                                                       np.concatenate(sketch_weights), sketch_size * 8)
+                        sketch_values, sketch_weights = [merged[0]], [merged[1]]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.where(count > 0, m2 / np.maximum(count, 1), np.nan)
+            skew = np.where(m2 > 0, np.sqrt(count) * m3 / m2 ** 1.5, np.nan)
+        
+        summary = {
+            'count': count.astype(np.int64),
+            'missing': missing,
+            'mean': np.where(count > 0, mean, np.nan),
+            'std': np.sqrt(variance),
+            'skew': skew,
+            'min': np.where(count > 0, col_min, np.nan),
+            'max': np.where(count > 0, col_max, np.nan)
+        }
+        if sketch_size is not None:
+            if sketch_values:
+                summary['sketch'] = (np.concatenate(sketch_values), np.concatenate(sketch_weights))
+            else:
+                summary['sketch'] = (np.full((1, p), np.nan), np.zeros((1, p)))
+        return summary
+    
+    def _block_sketch(self, block, n_b, sketch_size):
+        """一个行块的草图：每列取sketch_size个等间隔分位点，每点权重为块内非缺失数/sketch_size"""
+        probs = (np.arange(sketch_size) + 0.5) / sketch_size
+        values = np.nanquantile(block, probs, axis=0)
+        weights = np.broadcast_to(n_b / sketch_size, values.shape).copy()
+        weights[np.isnan(values)] = 0
+        return values, weights
+    
+    def _compress_sketch(self, values, weights, size):
+        """将加权样本压缩为size个等权重的加权分位点（可重复合并）"""
+        probs = (np.arange(size) + 0.5) / size
+        compressed = self._sketch_quantiles(values, weights, probs)
+        new_weights = np.broadcast_to(weights.sum(axis=0) / size, compressed.shape).copy()
+        new_weights[np.isnan(compressed)] = 0
+        return compressed, new_weights
+    
+    def _sketch_quantiles(self, values, weights, probs):
+        """由加权样本计算每列的分位数"""
+        probs = np.asarray(probs, dtype=np.float64)
+        result = np.full((len(probs), values.shape[1]), np.nan)
+        order = np.argsort(np.where(np.isnan(values), np.inf, values), axis=0)
+        sorted_values = np.take_along_axis(values, order, axis=0)
+        sorted_weights = np.take_along_axis(weights, order, axis=0)
+        totals = sorted_weights.sum(axis=0)
+        # 每个样本代表其权重区间的中点
+        positions = (np.cumsum(sorted_weights, axis=0) - sorted_weights / 2) / np.where(totals > 0, totals, 1)
+        for j in np.flatnonzero(totals > 0):
+            valid = sorted_weights[:, j] > 0
+            result[:, j] = np.interp(probs, positions[valid, j], sorted_values[valid, j])
+        return result
+    
+    def _column_histograms(self, values, col_min, col_max, bins, weights=None):
+        """所有列的直方图一次性通过bincount计算，返回(p, bins)计数矩阵"""
+        p = values.shape[1]
+        width = np.where(col_max > col_min, col_max - col_min, 1)
+        with np.errstate(invalid='ignore'):
+            index = np.floor((values - col_min) / width * bins)
+        present = ~np.isnan(index)
+        index = np.clip(np.where(present, index, 0), 0, bins - 1).astype(np.int64)
+        flat = (index + np.arange(p) * bins)[present]
+        flat_weights = None if weights is None else weights[present]
+        return np.bincount(flat, weights=flat_weights, minlength=p * bins).reshape(p, bins)
+    
     def filter_features_by_correlation(self, data, feature_names, threshold=0.9):
         """根据相关系数过滤特征"""
-        corr_matrix = np.corrcoef(data, rowvar=False)
-        n = len(feature_names)
-        
-        # 找出高度相关的特征对
-        to_remove = set()
-        for i in range(n):
-            for j in range(i + 1, n):
-                if abs(corr_matrix[i, j]) > threshold:
-                    to_remove.add(j)
-        
-        # 保留不高度相关的特征
-        features_to_keep = [i for i in range(n) if i not in to_remove]
-        filtered_data = data[:, features_to_keep]
-        filtered_feature_names = [feature_names[i] for i in features_to_keep]
-        
-        return filtered_data, filtered_feature_names
\ No newline at end of file
+        filtered_data, filtered_feature_names, _ = self.reduce_redundant_features(data, feature_names, threshold)
+        return filtered_data, filtered_feature_names
+    
+    def reduce_redundant_features(self, data, feature_names, threshold=0.95, block_size=256):
+        """合并近似重复的特征，返回精简后的数据、特征名和合并映射
+        
+        按列顺序贪心处理：与某个已保留代表特征的|相关系数|超过阈值的特征被合并到相关性最强的代表。
+        候选列按块与已保留列做一次矩阵乘法得到相关系数，不构建完整的p×p矩阵；
+        块内只需O(块大小)次向量化比较。缺失值按列均值填补后参与计算。
+        
+        Returns:
+            (filtered_data, filtered_feature_names, merged)，merged形如
+            {代表特征名: [{'feature': 被合并特征名, 'correlation': r}, ...]}
+        """
+        n_samples, p = data.shape
+        # 标准化后相关系数即为内积/n
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mean = np.nanmean(data, axis=0)
+            std = np.nanstd(data, axis=0)
+        std = np.where((std > 0) & np.isfinite(std), std, np.inf)
+        dtype = np.float32 if data.dtype == np.float32 else np.float64
+        
+        kept = []                  # 已保留代表特征的列号
+        # 前len(kept)列为代表特征的标准化数据；容量按需加倍，内存与保留的特征数成正比
+        kept_z = np.empty((n_samples, min(block_size, p)), dtype=dtype)
+        merged_into = {}           # 被合并列号 -> (代表列号, 相关系数)
+        
+        for start in range(0, p, block_size):
+            cols = np.arange(start, min(start + block_size, p))
+            z = np.nan_to_num((data[:, cols] - mean[cols]) / std[cols]).astype(dtype, copy=False) / np.sqrt(n_samples)
+            active = np.ones(len(cols), dtype=bool)
+            
+            # 与已保留的代表特征比较
+            if kept:
+                corr = kept_z[:, :len(kept)].T @ z
+                best = np.abs(corr).argmax(axis=0)
+                best_corr = corr[best, np.arange(len(cols))]
+                for k in np.flatnonzero(np.abs(best_corr) > threshold):
+                    merged_into[int(cols[k])] = (kept[best[k]], float(best_corr[k]))
+                    active[k] = False
+            
+            # 块内按顺序贪心：保留的特征吸收块内后续与其高度相关的特征
+            inner = z.T @ z
+            for k in range(len(cols)):
+                if not active[k]:
+                    continue
+                later = np.flatnonzero(active[k + 1:] & (np.abs(inner[k, k + 1:]) > threshold)) + k + 1
+                for m in later:
+                    merged_into[int(cols[m])] = (int(cols[k]), float(inner[k, m]))
+                active[later] = False
+            
+            needed = len(kept) + int(active.sum())
+            if needed > kept_z.shape[1]:
+                grown = np.empty((n_samples, min(max(needed, 2 * kept_z.shape[1]), p)), dtype=dtype)
+                grown[:, :len(kept)] = kept_z[:, :len(kept)]
+                kept_z = grown
+            kept_z[:, len(kept):needed] = z[:, active]
+            kept.extend(int(c) for c in cols[active])
+        
+        merged = {}
+        for col, (rep, corr) in sorted(merged_into.items()):
+            merged.setdefault(feature_names[rep], []).append({'feature': feature_names[col], 'correlation': corr})
+        
+        filtered_data = data[:, kept]
+        filtered_feature_names = [feature_names[i] for i in kept]
+        return filtered_data, filtered_feature_names, merged
+
+
+class EncodingUtils:
+    """网络结果的响应编码（内容协商、紧凑编码与压缩）"""
+    COMPACT_MIME = 'application/x-network-compact+json'
+    MATRIX_FORMATS = {'json', 'f32le', 'npy', 'none'}
+    
+    def __init__(self, compress_level=6, compress_min_bytes=1024):
+        self.compress_level = compress_level
+        self.compress_min_bytes = compress_min_bytes
+    
+    def options_from_request(self, params, accept=''):
+        """从请求参数和Accept头解析编码选项
+        
+        Args:
+            params: 请求体或查询参数，支持 encoding ('json'/'compact')、matrixFormat
+                    ('json'/'f32le'/'npy'/'none')、includeImage、round（保留的小数位数）
+            accept: Accept请求头，包含COMPACT_MIME时默认使用紧凑编码
+        """
+        encoding = params.get('encoding') or ('compact' if self.COMPACT_MIME in (accept or '') else 'json')
+        if encoding not in ('json', 'compact'):
+            raise ValueError(f"不支持的编码: {encoding}")
+        
+        matrix_format = params.get('matrixFormat') or ('f32le' if encoding == 'compact' else 'json')
+        if matrix_format not in self.MATRIX_FORMATS:
+            raise ValueError(f"不支持的矩阵格式: {matrix_format}")
+        
+        include_image = params.get('includeImage', True)
+        if isinstance(include_image, str):
+            include_image = include_image.lower() not in ('0', 'false', 'no')
+        
+        digits = params.get('round')
+        digits = int(digits) if digits not in (None, '') else None
+        
+        return {
+            'encoding': encoding,
+            'matrix_format': matrix_format,
+            'include_image': bool(include_image),
+            'round': digits
+        }
+    
+    def is_default(self, options):
+        """是否为与旧接口完全一致的默认编码"""
+        return (options['encoding'] == 'json' and options['matrix_format'] == 'json'
+                and options['include_image'] and options['round'] is None)
+    
+    def encode_links(self, links, options):
+        """编码边列表：json为对象列表，compact为按列存放的数组"""
+        digits = options['round']
+        if options['encoding'] == 'compact':
+            columns = {
+                'source': [link['source'] for link in links],
+                'target': [link['target'] for link in links],
+                'value': [link['value'] for link in links],
+                'correlation': [link['correlation'] for link in links]
+            }
+            if digits is not None:
+                for key in ('value', 'correlation'):
+                    columns[key] = np.round(np.asarray(columns[key], dtype=np.float64), digits).tolist()
+            return columns
+        if digits is None:
+            return links
+        return [dict(link, value=round(float(link['value']), digits),
+                     correlation=round(float(link['correlation']), digits)) for link in links]
+    
+    def encode_nodes(self, nodes, options):
+        """编码节点列表：compact为按列存放的数组"""
+        if options['encoding'] != 'compact':
+            return nodes
+        return {
+            'id': [node['id'] for node in nodes],
+            'name': [node['name'] for node in nodes],
+            'group': [node['group'] for node in nodes]
+        }
+    
+    def encode_matrix(self, matrix, options):
+        """编码矩阵：json嵌套列表、little-endian float32原始缓冲区或npy（后两者base64编码）"""
+        matrix_format = options['matrix_format']
+        if matrix is None or matrix_format == 'none':
+            return None
+        if matrix_format == 'json':
+            if options['round'] is None:
+                return matrix if isinstance(matrix, list) else np.asarray(matrix).tolist()
+            return np.round(np.asarray(matrix, dtype=np.float64), options['round']).tolist()
+        
+        array = np.asarray(matrix, dtype='<f4')
+        if matrix_format == 'f32le':
+            payload = array.tobytes(order='C')
+        else:
+            buffer = io.BytesIO()
+            np.save(buffer, array)
+            payload = buffer.getvalue()
+        return {
+            'format': matrix_format,
+            'dtype': 'float32',
+            'byteorder': 'little',
+            'shape': list(array.shape),
+            'data': base64.b64encode(payload).decode('ascii')
+        }
+    
+    def choose_content_encoding(self, accept_encoding):
+        """根据Accept-Encoding选择压缩方式：q值最高的一种（相同时优先gzip），q=0表示明确拒绝"""
+        weights = {}
+        for item in (accept_encoding or '').split(','):
+            coding, *params = [part.strip() for part in item.split(';')]
+            if not coding:
+                continue
+            quality = 1.0
+            for param in params:
+                name, _, value = param.partition('=')
+                if name.strip().lower() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            weights[coding.lower()] = quality
+        # "*"适用于没有单独列出的压缩方式
+        candidates = [(weights.get(coding, weights.get('*', 0.0)), coding) for coding in ('gzip', 'deflate')]
+        quality, coding = max(candidates, key=lambda candidate: candidate[0])
+        return coding if quality > 0 else None
+    
+    def compress(self, body, content_encoding):
+        """按指定方式压缩响应体"""
+        if content_encoding == 'gzip':
+            return gzip.compress(body, compresslevel=self.compress_level)
+        if content_encoding == 'deflate':
+            return zlib.compress(body, self.compress_level)
+        return body
+
+
+class AnalysisCancelled(Exception):
+    """分析任务被客户端取消"""
+
+
+class ProgressTracker:
+    """记录一次分析任务的进度事件，供SSE推送；同时提供协作式取消检查点"""
+    
+    def __init__(self, job_id=None, step_interval=0.2):
+        self.job_id = job_id
+        self.step_interval = step_interval  # 迭代计数事件的最小间隔（秒），避免刷屏
+        self.events = []
+        self.finished = False
+        self.current_stage = None
+        self.stage_durations = {}  # 各阶段累计耗时（秒）
+        self.result = None  # 分析完成后的结果地址
+        self._stage_start = None
+        self._start = time.perf_counter()
+        self._last_step = 0.0
+        self._cancel_event = threading.Event()
+        self._condition = threading.Condition()
+    
+    def elapsed(self):
+        return round(time.perf_counter() - self._start, 3)
+    
+    def emit(self, event, **payload):
+        """追加一个事件并唤醒等待中的订阅者"""
+        payload['elapsed'] = self.elapsed()
+        if event in ('done', 'error', 'cancelled'):
+            self.close_stage()
+        with self._condition:
+            self.events.append({'event': event, 'data': payload})
+            if event in ('done', 'error', 'cancelled'):
+                self.finished = True
+            self._condition.notify_all()
+    
+    def stage(self, name, **info):
+        """进入新的阶段（解析、计算、绘图、保存等），同时是一个取消检查点"""
+        self.check()
+        self.close_stage()
+        self.current_stage = name
+        self._stage_start = time.perf_counter()
+        self.emit('stage', stage=name, **info)
+    
+    def close_stage(self):
+        """结束当前阶段计时"""
+        if self._stage_start is not None:
+            duration = time.perf_counter() - self._stage_start
+            self.stage_durations[self.current_stage] = self.stage_durations.get(self.current_stage, 0.0) + duration
+            self._stage_start = None
+    
+    def step(self, stage, current, total):
+        """迭代计数，按时间间隔节流；同时是一个取消检查点"""
+        self.check()
+        now = time.perf_counter()
+        if current < total and now - self._last_step < self.step_interval:
+            return
+        self._last_step = now
+        self.emit('progress', stage=stage, current=int(current), total=int(total))
+    
+    def cancel(self):
+        self._cancel_event.set()
+    
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+    
+    def check(self):
+        if self._cancel_event.is_set():
+            raise AnalysisCancelled('分析已取消')
+    
+    def iter_events(self, start=0, keepalive=15):
+        """按顺序产出事件（序号, 事件）；超时无新事件时产出None作为心跳，任务结束后停止"""
+        index = start
+        while True:
+            with self._condition:
+                if index >= len(self.events) and not self.finished:
+                    self._condition.wait(keepalive)
+                pending = self.events[index:]
+                finished = self.finished
+            if not pending and not finished:
+                yield None
+            for event in pending:
+                yield index, event
+                index += 1
+            if finished and index >= len(self.events):
+                return
+    
+    @staticmethod
+    def format_sse(index, event):
+        """格式化为text/event-stream的一条消息"""
+        return f"id: {index}\nevent: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+
+class MetricsRegistry:
+    """进程内的计数器和直方图，按Prometheus文本格式输出"""
+    
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._metrics = OrderedDict()  # 名称 -> {'type', 'help', 'series': {标签: 值}}
+        self._lock = threading.Lock()
+    
+    def counter(self, name, help_text):
+        self._metrics.setdefault(name, {'type': 'counter', 'help': help_text, 'series': {}})
+    
+    def histogram(self, name, help_text):
+        self._metrics.setdefault(name, {'type': 'histogram', 'help': help_text, 'series': {}})
+    
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._metrics[name]['series']
+            series[key] = series.get(key, 0) + amount
+    
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._metrics[name]['series']
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for k, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][k] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+    
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录代码块耗时到直方图"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+    
+    def _format_labels(self, labels, extra=()):
+        items = list(labels) + list(extra)
+        if not items:
+            return ''
+        escaped = [(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                   for key, value in items]
+        return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+    
+    def render(self):
+        """输出Prometheus文本格式（text/plain; version=0.0.4）"""
+        lines = []
+        with self._lock:
+            for name, metric in self._metrics.items():
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['type']}")
+                for labels, value in metric['series'].items():
+                    if metric['type'] == 'counter':
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+                        continue
+                    # 直方图的桶计数为累计值，observe时已按上界累计
+                    for bound, count in zip(self.buckets, value['buckets']):
+                        lines.append(f"{name}_bucket{self._format_labels(labels, [('le', repr(float(bound)))])} {count}")
+                    lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {value['count']}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {value['sum']}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def physical_memory_bytes(default=8 * 1024 ** 3):
+    """本机物理内存大小，无法获取时返回default"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return default
+
+
+class CostEstimator:
+    """在运行算法之前按(样本数, 特征数, 算法, 选项)估算单次分析的峰值内存和耗时
+    
+    峰值内存按同时存在的主要对象累加：数据的工作副本、算法的p×p中间矩阵、
+    结果矩阵的嵌套列表及其JSON字符串（写数据库和响应各一份）、边列表，以及绘图。
+    各常数在一台普通服务器上测得（见注释），偏保守；耗时只用于报告和可选的时限判断。
+    
+    输出方式（由贵到便宜）：
+      full      完整结果：矩阵、全部边和网络图
+      no_image  不绘制网络图
+      sparse    不输出矩阵，只保留|权重|最大的max_links条边，不绘制网络图
+      blocked   同sparse，Pearson/Spearman相关按列块计算，不构造p×p矩阵
+    """
+    
+    MODES = ('full', 'no_image', 'sparse', 'blocked')
+    BLOCKED_ALGORITHMS = {'correlation', 'spearman'}
+    # 在构造边列表之前就按max_links截取的算法（其余算法先构造全部边再截取）
+    LIMITED_LINK_ALGORITHMS = {'correlation', 'spearman', 'kendall', 'partial_correlation', 'aracne', 'clr'}
+    
+    # 预期边密度（边数 / 节点对数），因果算法的简化实现输出稠密的有向图
+    LINK_DENSITY = {
+        'correlation': 0.05, 'spearman': 0.05, 'kendall': 0.05, 'partial_correlation': 0.05,
+        'aracne': 0.05, 'clr': 0.05, 'ges': 0.75, 'mmhc': 0.05, 'interiamb': 0.6
+    }
+    
+    FLOPS = 2e10                    # BLAS矩阵乘法的有效浮点运算速度（实测单核约5e10）
+    BASE_BYTES = 64 * 1024 ** 2     # 请求本身及临时对象的固定开销
+    BLOCK_BYTES = 64 * 1024 ** 2    # 分块计算（互信息、置换检验、blocked模式）每块的大小
+    MATRIX_LIST_BYTES = 32          # tolist()后每个元素：8字节指针 + 24字节float对象
+    MATRIX_JSON_BYTES = 24          # 每个元素的JSON文本
+    MATRIX_LIST_SECONDS = 5e-8
+    MATRIX_JSON_SECONDS = 1.2e-6
+    LINK_BYTES = 300                # 每条边的字典
+    LINK_JSON_BYTES = 100
+    LINK_SECONDS = 1.5e-6
+    LINK_JSON_SECONDS = 5e-6
+    IMAGE_PAIR_BYTES = 24           # 弹簧布局的节点对数组
+    IMAGE_LINK_BYTES = 2000         # 每条边的绘图对象
+    IMAGE_PAIR_SECONDS = 5e-6
+    IMAGE_LINK_SECONDS = 2e-4
+    
+    def __init__(self, cpu_count=None, max_workers=None, **constants):
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        # 进程池的工作进程数（与Algorithms.max_workers一致）
+        self.max_workers = max_workers or self.cpu_count
+        for name, value in constants.items():
+            setattr(self, name, value)
+    
+    def modes_for(self, algorithm, precomputed=False, significance=None, missing='listwise'):
+        """该请求可用的输出方式（按由贵到便宜的顺序）"""
+        modes = ['full', 'no_image', 'sparse']
+        if algorithm in self.BLOCKED_ALGORITHMS and not precomputed and significance is None \
+                and missing == 'listwise':
+            modes.append('blocked')
+        return modes
+    
+    def estimate(self, n_samples, n_features, algorithm, mode='full', itemsize=8, precomputed=False,
+                 permutations=0, max_links=None, file_features=None):
+        """返回预估的峰值内存（字节）、耗时（秒）、边数及各部分的内存明细
+        
+        file_features为文件的总列数（分析特征子集时大于n_features），用于估算解析整个文件的内存；
+        precomputed为True时不解析文件。
+        """
+        n, p = n_samples, n_features
+        pairs = p * (p - 1) / 2
+        data_bytes = n * p * itemsize
+        # 解析：整个文件的数值矩阵（按float64读入，再按需转换精度、取出特征子集）
+        parse_bytes = 0 if precomputed else n * (file_features or p) * 8
+        matrix_bytes = p * p * 8
+        gemm_seconds = 2 * n * p * p / self.FLOPS
+        
+        # 算法本身的工作内存和耗时
+        if precomputed:
+            # 从缓存的整体矩阵切片
+            compute_bytes, compute_seconds = matrix_bytes, p * p * 1e-9
+        elif algorithm in ('correlation', 'spearman'):
+            if mode == 'blocked':
+                compute_bytes = data_bytes + self.BLOCK_BYTES
+            else:
+                compute_bytes = 2 * data_bytes + 2 * matrix_bytes
+            compute_seconds = gemm_seconds
+            if algorithm == 'spearman':
+                compute_bytes += data_bytes
+                compute_seconds += n * p * np.log2(max(n, 2)) * 1e-8
+        elif algorithm == 'kendall':
+            # 每对变量一次O(n log n)的scipy调用，分发到进程池，每个工作进程持有一份数据矩阵
+            workers = self.max_workers if self.max_workers > 1 and pairs > 64 else 0
+            compute_bytes = data_bytes + matrix_bytes + workers * data_bytes
+            compute_seconds = pairs * (2e-4 + 5e-7 * n) / min(max(workers, 1), self.cpu_count)
+        elif algorithm == 'partial_correlation':
+            compute_bytes = 2 * data_bytes + 4 * matrix_bytes
+            compute_seconds = gemm_seconds + 10 * p ** 3 / self.FLOPS
+        elif algorithm in ('aracne', 'clr'):
+            compute_bytes = n * p * 8 + self.BLOCK_BYTES + 3 * matrix_bytes
+            compute_seconds = 1e-8 * n * p * p
+        elif algorithm == 'mmhc':
+            compute_bytes = 2 * data_bytes + 4 * matrix_bytes
+            compute_seconds = 7e-7 * p ** 3 + 3e-6 * p * p
+        else:
+            # ges、interiamb：逐个节点对的Python循环
+            compute_bytes = 2 * matrix_bytes
+            compute_seconds = 3e-6 * p * p
+        if permutations:
+            compute_bytes += data_bytes + self.BLOCK_BYTES
+            if self.max_workers > 1:
+                # 每个工作进程持有一份得分矩阵，并各自按块计算置换统计量
+                compute_bytes += self.max_workers * (data_bytes + self.BLOCK_BYTES)
+            compute_seconds += permutations * gemm_seconds
+        
+        links = self.LINK_DENSITY.get(algorithm, 0.05) * pairs
+        if mode in ('sparse', 'blocked') and max_links is not None:
+            limited = min(links, max_links)
+            # 先构造全部边再截取的算法，边列表的峰值不变，只减少写库和响应的大小
+            link_bytes = (links if algorithm not in self.LIMITED_LINK_ALGORITHMS else limited) * self.LINK_BYTES
+            links = limited
+        else:
+            link_bytes = links * self.LINK_BYTES
+        link_bytes += links * self.LINK_JSON_BYTES * 2
+        link_seconds = links * (self.LINK_SECONDS + 2 * self.LINK_JSON_SECONDS)
+        
+        # 结果矩阵：嵌套列表，加上写数据库和响应的两份JSON文本
+        output_bytes, output_seconds = 0, 0.0
+        if mode in ('full', 'no_image'):
+            output_bytes = p * p * (self.MATRIX_LIST_BYTES + 2 * self.MATRIX_JSON_BYTES)
+            output_seconds = p * p * (self.MATRIX_LIST_SECONDS + 2 * self.MATRIX_JSON_SECONDS)
+        
+        image_bytes, image_seconds = 0, 0.0
+        if mode == 'full':
+            image_bytes = p * p * self.IMAGE_PAIR_BYTES + links * self.IMAGE_LINK_BYTES
+            image_seconds = p * p * self.IMAGE_PAIR_SECONDS + links * self.IMAGE_LINK_SECONDS
+        
+        breakdown = {
+            'base': self.BASE_BYTES,
+            'parse': parse_bytes,
+            'data': data_bytes,
+            'compute': compute_bytes,
+            'links': link_bytes,
+            'matrix_output': output_bytes,
+            'image': image_bytes
+        }
+        return {
+            'mode': mode,
+            'peak_bytes': int(sum(breakdown.values())),
+            'seconds': float(compute_seconds + link_seconds + output_seconds + image_seconds),
+            'links': int(links),
+            'breakdown': {name: int(value) for name, value in breakdown.items()}
+        }
+
+
+class AdmissionController:
+    """按预估峰值内存的准入控制
+    
+    同时运行的分析的预估内存之和不超过budget_bytes；放不下的请求按先来后到排队等待，
+    队首请求放不下时后面的请求也不会插队（避免大请求一直等不到）。
+    """
+    
+    def __init__(self, budget_bytes, queue_size=16):
+        self.budget_bytes = int(budget_bytes)
+        self.queue_size = queue_size
+        self.reset_after_fork()
+    
+    def reset_after_fork(self):
+        """在fork出的子进程中调用：重建锁并清空计数（预留量按进程计算）"""
+        self._condition = threading.Condition()
+        self._waiting = []
+        self.in_use = 0
+    
+    @property
+    def queued(self):
+        return len(self._waiting)
+    
+    def acquire(self, nbytes, timeout, check=None, poll_interval=0.5):
+        """预留nbytes，返回等待的秒数；队列已满或timeout秒内未轮到时返回None
+        
+        Args:
+            check: 等待期间定期调用（如进度跟踪器的check，任务被取消时抛出异常）
+        """
+        nbytes = min(int(nbytes), self.budget_bytes)
+        start = time.monotonic()
+        ticket = object()
+        with self._condition:
+            if not self._waiting and self.in_use + nbytes <= self.budget_bytes:
+                self.in_use += nbytes
+                return 0.0
+            if len(self._waiting) >= self.queue_size:
+                return None
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    if self._waiting[0] is ticket and self.in_use + nbytes <= self.budget_bytes:
+                        self.in_use += nbytes
+                        return time.monotonic() - start
+                    remaining = start + timeout - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(min(poll_interval, remaining))
+                    if check is not None:
+                        check()
+            finally:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+    
+    def release(self, nbytes):
+        nbytes = min(int(nbytes), self.budget_bytes)
+        with self._condition:
+            self.in_use = max(0, self.in_use - nbytes)
+            self._condition.notify_all()
+
+
+class ArtifactWriter:
+    """后台写入分析结果文件（邻接矩阵、网络图）
+    
+    任务放入有界队列，由单个后台线程依次写入；队列已满时在调用线程中直接写入，
+    避免内存无限增长。写入的文件登记到catalog（数据库的artifacts表），
+    同一数据集和算法在同一目录下内容哈希相同的文件不会重复写入。
+    
+    保留策略：每个(数据集, 算法, 类型)只保留最新keep_last个文件，所有文件总大小
+    不超过max_bytes（超出时从最旧的开始删除）。后台线程每隔gc_interval秒清理一次。
+    """
+    
+    MATRIX_FORMATS = ('csv', 'npz')
+    
+    def __init__(self, catalog=None, max_queue=16, put_timeout=0.5, metrics=None,
+                 keep_last=None, max_bytes=None, gc_interval=60):
+        self.catalog = catalog  # 提供add_artifact/find_artifact等方法的Database
+        self.put_timeout = put_timeout
+        self.metrics = metrics  # 可选的MetricsRegistry，需预先注册artifact_*指标
+        self.keep_last = keep_last
+        self.max_bytes = max_bytes
+        self.gc_interval = gc_interval
+        self._last_gc = 0.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._gc_lock = threading.Lock()
+        atexit.register(self.flush, 10)
+    
+    def reset_after_fork(self):
+        """在fork出的子进程中调用：父进程的后台线程不会被继承，队列和锁也需要重建"""
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._gc_lock = threading.Lock()
+        self._last_gc = 0.0
+    
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='artifact-writer', daemon=True)
+                self._thread.start()
+    
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            try:
+                self._run(task)
+                self._maybe_collect_garbage()
+            finally:
+                self._queue.task_done()
+    
+    def _run(self, task):
+        try:
+            task()
+        except Exception as e:
+            print(f"保存分析结果失败: {str(e)}")
+            if self.metrics is not None:
+                self.metrics.inc('artifacts_total', kind='unknown', result='failed')
+    
+    def submit(self, task):
+        """提交写入任务，返回是否进入了后台队列（False表示已在当前线程写完）"""
+        self._ensure_worker()
+        try:
+            self._queue.put(task, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self._run(task)
+            return False
+    
+    def pending(self):
+        return self._queue.unfinished_tasks
+    
+    def flush(self, timeout=None):
+        """等待队列中的任务写完（timeout秒后放弃），返回是否全部完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+    
+    def _atomic_write(self, path, payload):
+        """先写临时文件再改名，读取方不会看到写了一半的文件"""
+        tmp_path = f'{path}.tmp{threading.get_ident()}'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    
+    def _write_deduplicated(self, directory, filename, kind, fmt, digest, render, dataset_id=None, algorithm=None):
+        """内容哈希已登记且文件仍在时跳过写入，返回实际文件路径"""
+        start = time.perf_counter()
+        directory = os.path.abspath(directory)
+        os.makedirs(directory, exist_ok=True)
+        if self.catalog is not None:
+            existing = self.catalog.find_artifact(directory, digest, dataset_id, algorithm)
+            if existing and os.path.exists(os.path.join(directory, existing['filename'])):
+                self.catalog.touch_artifact(existing['id'])
+                if self.metrics is not None:
+                    self.metrics.inc('artifacts_total', kind=kind, result='skipped')
+                return os.path.join(directory, existing['filename'])
+        
+        path = os.path.join(directory, filename)
+        payload = render()
+        self._atomic_write(path, payload)
+        if self.catalog is not None:
+            self.catalog.add_artifact(dataset_id, algorithm, kind, fmt, directory, filename, digest, len(payload))
+        if self.metrics is not None:
+            self.metrics.inc('artifacts_total', kind=kind, result='written')
+            self.metrics.observe('artifact_write_seconds', time.perf_counter() - start, kind=kind)
+        return path
+    
+    def delete_artifacts(self, artifacts):
+        """删除文件并注销记录，返回释放的字节数"""
+        freed = 0
+        for artifact in artifacts:
+            path = os.path.join(artifact['directory'], artifact['filename'])
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除结果文件失败 {path}: {str(e)}")
+                continue
+            freed += artifact['size_bytes']
+        if artifacts and self.catalog is not None:
+            self.catalog.delete_artifacts([artifact['id'] for artifact in artifacts])
+        return freed
+    
+    def collect_garbage(self, keep_last=None, max_bytes=None):
+        """按保留策略清理结果文件，返回清理统计"""
+        keep_last = self.keep_last if keep_last is None else keep_last
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        stats = {'deleted': 0, 'freed_bytes': 0}
+        if self.catalog is None:
+            return stats
+        with self._gc_lock:
+            if keep_last is not None:
+                expired = self.catalog.get_expired_artifacts(keep_last)
+                stats['freed_bytes'] += self.delete_artifacts(expired)
+                stats['deleted'] += len(expired)
+            
+            if max_bytes is not None:
+                total = self.catalog.get_artifacts_total_bytes()
+                if total > max_bytes:
+                    victims = []
+                    for artifact in self.catalog.get_artifacts_oldest_first():
+                        if total <= max_bytes:
+                            break
+                        victims.append(artifact)
+                        total -= artifact['size_bytes']
+                    stats['freed_bytes'] += self.delete_artifacts(victims)
+                    stats['deleted'] += len(victims)
+            
+            stats['total_bytes'] = self.catalog.get_artifacts_total_bytes()
+            self._last_gc = time.monotonic()
+        if self.metrics is not None and stats['deleted']:
+            self.metrics.inc('artifacts_total', stats['deleted'], kind='any', result='collected')
+        return stats
+    
+    def _maybe_collect_garbage(self):
+        if self.keep_last is None and self.max_bytes is None:
+            return
+        if time.monotonic() - self._last_gc < self.gc_interval:
+            return
+        try:
+            self.collect_garbage()
+        except Exception as e:
+            print(f"清理结果文件失败: {str(e)}")
+    
+    def matrix_bytes(self, matrix, feature_names, fmt='csv'):
+        """把矩阵整体格式化为文件内容（csv：首行为特征名、首列为行名，保留6位小数；npz：二进制）"""
+        if fmt == 'csv':
+            # 每行只做一次%格式化（C实现），比逐个单元格round再写入快数倍
+            fields = [self._csv_field(name) for name in feature_names]
+            row_format = ','.join(['%.6f'] * len(fields))
+            lines = [',' + ','.join(fields)]
+            for field, row in zip(fields, np.asarray(matrix).tolist()):
+                lines.append(field + ',' + row_format % tuple(row))
+            return ('\r\n'.join(lines) + '\r\n').encode('utf-8-sig')
+        if fmt == 'npz':
+            buffer = io.BytesIO()
+            np.savez(buffer, matrix=matrix, feature_names=np.asarray(feature_names, dtype=str))
+            return buffer.getvalue()
+        raise ValueError(f"不支持的矩阵文件格式: {fmt}")
+    
+    def _csv_field(self, value):
+        value = str(value)
+        if any(ch in value for ch in ',"\r\n'):
+            return '"' + value.replace('"', '""') + '"'
+        return value
+    
+    def write_matrix(self, directory, basename, matrix, feature_names, fmt='csv', dataset_id=None, algorithm=None):
+        """写入邻接矩阵文件，内容相同时跳过"""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        digest = hashlib.sha256()
+        digest.update(fmt.encode('ascii'))
+        digest.update(json.dumps([str(name) for name in feature_names]).encode('utf-8'))
+        digest.update(np.ascontiguousarray(matrix).tobytes())
+        return self._write_deduplicated(directory, f'{basename}.{fmt}', 'adjacency_matrix', fmt, digest.hexdigest(),
+                                        lambda: self.matrix_bytes(matrix, feature_names, fmt),
+                                        dataset_id, algorithm)
+    
+    def write_png(self, directory, basename, graph_base64, dataset_id=None, algorithm=None):
+        """写入base64编码的PNG网络图，内容相同时跳过"""
+        if ',' in graph_base64:
+            graph_base64 = graph_base64.split(',')[1]
+        image_bytes = base64.b64decode(graph_base64)
+        digest = 'png:' + hashlib.sha256(image_bytes).hexdigest()
+        return self._write_deduplicated(directory, f'{basename}.png', 'network_graph', 'png', digest,
+                                        lambda: image_bytes, dataset_id, algorithm)